@@ -0,0 +1,242 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from seq_designer import SequenceDesign, SequenceDesignError, RawScaffoldSequence
+from scaffold_pool import ScaffoldPool
+from design_cache import DesignCache
+from instrumentation import Instrumentation
+from report_defaults import DEFAULT_K
+
+
+# Scaffold sequences already read by this (worker) process
+scaffoldCache = {}
+
+
+def ExpandPaths(patterns):
+    """
+    Returns sorted paths matching the given files or glob patterns,
+    directories are expanded to the json files they contain.
+    """
+
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "*.json"))
+        else:
+            matches = glob.glob(pattern)
+        if matches == []:
+            raise FileNotFoundError("No files found for " + pattern)
+        paths.extend(sorted(matches))
+
+    # Remove duplicates, keep order
+    return list(dict.fromkeys(paths))
+
+
+def RelativePaths(paths):
+    """
+    Returns the path of every file relative to the deepest directory holding
+    all of them, the file name if they are all in the same directory.
+    """
+
+    if paths == []:
+        return {}
+
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    return {path: os.path.relpath(os.path.abspath(path), root) for path in paths}
+
+
+def JobSeed(seed, designName, scaffoldName):
+    """
+    Returns seed for a single job, derived from the batch seed and the paths
+    of design and scaffold relative to their input roots (see
+    RelativePaths), so it doesn't depend on job order or worker count.
+    """
+
+    key = str(seed) + "\0" + designName.replace(os.sep, "/") + "\0" + scaffoldName.replace(os.sep, "/")
+    return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], 'big')
+
+
+def CreateJobs(designPaths, scaffoldPaths, seed, outputDirectory):
+    """
+    Returns a job for every design and scaffold combination. Outputs go to
+    a folder per scaffold, below the directories of the design relative to
+    the common input root, so designs of the same name don't collide.
+    """
+
+    designNames = RelativePaths(designPaths)
+    scaffoldNames = RelativePaths(scaffoldPaths)
+
+    jobs = []
+    for designPath, scaffoldPath in itertools.product(designPaths, scaffoldPaths):
+        jobs.append({
+            'design': designPath,
+            'scaffold': scaffoldPath,
+            'seed': JobSeed(seed, designNames[designPath], scaffoldNames[scaffoldPath]),
+            'output': os.path.join(outputDirectory, scaffoldNames[scaffoldPath],
+                                   os.path.dirname(designNames[designPath])),
+        })
+    return jobs
+
+
+def RunJob(job, compact=False, scaffoldPool=None, designCache=True, bundle=False, stats=False, kmerLength=None):
+    """
+    Sequences a single design and writes its output files, with a binary
+    result bundle if bundle is set and k-mer tables if kmerLength is given.
+    If stats is set, the stage records of the job (see instrumentation) are
+    added to its manifest record. Generated scaffolds are shared through
+    the scaffoldPool directory if given, parsed designs through the design
+    cache if designCache is set.
+    Returns the manifest record of the job.
+    """
+
+    record = dict(job)
+    timeStart = time.perf_counter()
+
+    try:
+        if job['scaffold'] not in scaffoldCache:
+            scaffoldCache[job['scaffold']] = RawScaffoldSequence(job['scaffold'])
+
+        pool = None
+        if scaffoldPool is not None:
+            pool = ScaffoldPool(scaffoldPool or None)
+
+        cache = DesignCache() if designCache else None
+
+        instrumentation = Instrumentation() if stats else None
+
+        engine = SequenceDesign(compact=compact, seed=job['seed'], scaffoldPool=pool, designCache=cache,
+                                instrumentation=instrumentation)
+        result = engine.Run(job['design'], scaffoldCache[job['scaffold']])
+        result.WriteFiles(job['output'], bundle=bundle, kmerLength=kmerLength)
+
+        if instrumentation is not None:
+            record['stages'] = instrumentation.records
+
+        record['status'] = 'ok'
+        record['scaffolds'] = len(result.scaffoldSequence)
+        record['staples'] = len(result.stapleSequence)
+        record['warnings'] = result.warnings
+
+    except SequenceDesignError as error:
+        record['status'] = 'error'
+        record['error'] = str(error)
+
+    # Any other failure of a job is recorded as well, so it doesn't stop the batch
+    except Exception as error:
+        record['status'] = 'error'
+        record['error'] = type(error).__name__ + ": " + str(error)
+
+    record['seconds'] = time.perf_counter() - timeStart
+
+    return record
+
+
+def RunBatch(jobs, workers=None, compact=False, scaffoldPool=None, designCache=True, bundle=False, stats=False,
+             kmerLength=None):
+    """
+    Runs jobs on a pool of worker processes (all cores if workers is None).
+    Yields manifest records in job order.
+    """
+
+    if workers == 1:
+        for job in jobs:
+            yield RunJob(job, compact, scaffoldPool, designCache, bundle, stats, kmerLength)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(RunJob, jobs, itertools.repeat(compact),
+                                itertools.repeat(scaffoldPool), itertools.repeat(designCache),
+                                itertools.repeat(bundle), itertools.repeat(stats),
+                                itertools.repeat(kmerLength))
+
+
+def ParseArguments(argv=None):
+    """
+    Parses command line arguments.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="batch.py", description="Sequence many cadnano designs with one or more scaffolds in parallel.")
+    parser.add_argument("designs", nargs="+",
+                        help="cadnano json files, glob patterns or directories")
+    parser.add_argument("-s", "--scaffold", action="append", required=True,
+                        help="scaffold sequence file or glob pattern, can be repeated")
+    parser.add_argument("-o", "--output", default="batch_output",
+                        help="output directory, one folder per scaffold (default: batch_output)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes (default: number of cores)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="batch seed, every job gets a seed derived from it (default: 0)")
+    parser.add_argument("--manifest", default=None,
+                        help="manifest file (default: <output>/manifest.json)")
+    parser.add_argument("--compact", action="store_true",
+                        help="load designs into compact NumPy arrays")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't use the design cache (~/.cache/seq_designer/designs)")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="clear the design cache before running")
+    parser.add_argument("--scaffold-pool", nargs="?", const="", default=None, metavar="DIR",
+                        help="share generated scaffolds between jobs and runs through DIR "
+                             "(default: ~/.cache/seq_designer/scaffolds)")
+    parser.add_argument("--bundle", action="store_true",
+                        help="also write a binary result bundle for every job")
+    parser.add_argument("--stats", action="store_true",
+                        help="record wall time, memory and counters of every stage in the manifest")
+    parser.add_argument("--kmer-report", nargs="?", type=int, const=DEFAULT_K, default=None, metavar="K",
+                        help="also write k-mer tables for every job (default K: " + str(DEFAULT_K) + ")")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs batch and writes manifest with status and timing of every job.
+    """
+
+    args = ParseArguments(argv)
+
+    try:
+        designPaths = ExpandPaths(args.designs)
+        scaffoldPaths = ExpandPaths(args.scaffold)
+    except FileNotFoundError as error:
+        sys.exit(str(error))
+
+    if args.clear_cache:
+        DesignCache().Clear()
+
+    jobs = CreateJobs(designPaths, scaffoldPaths, args.seed, args.output)
+    print("Running " + str(len(jobs)) + " jobs...")
+
+    timeStart = time.perf_counter()
+    records = []
+    for record in RunBatch(jobs, args.workers, args.compact, args.scaffold_pool,
+                           not args.no_cache, args.bundle, args.stats, args.kmer_report):
+        records.append(record)
+        print("{:<6}{:>8.3f}s  {} + {}".format(record['status'], record['seconds'],
+                                              record['design'], os.path.basename(record['scaffold'])))
+
+    manifest = {
+        'seed': args.seed,
+        'workers': args.workers or os.cpu_count(),
+        'seconds': time.perf_counter() - timeStart,
+        'jobs': records,
+    }
+
+    manifestPath = args.manifest or os.path.join(args.output, "manifest.json")
+    os.makedirs(os.path.dirname(manifestPath) or '.', exist_ok=True)
+    with open(manifestPath, 'w') as manifestFile:
+        json.dump(manifest, manifestFile, indent=2)
+
+    failed = sum(record['status'] != 'ok' for record in records)
+    print("Done! " + str(len(records) - failed) + " succeeded, " +
+          str(failed) + " failed. Manifest written to " + manifestPath)
+
+
+if __name__ == "__main__":
+    main()
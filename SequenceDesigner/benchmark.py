@@ -0,0 +1,375 @@
+import os
+import sys
+import glob
+import json
+import time
+import filecmp
+import subprocess
+import argparse
+import tempfile
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from seq_designer import SequenceDesign, SequenceDesignError, RawScaffoldSequence
+from design_cache import DesignCache
+from instrumentation import Instrumentation
+
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# Shipped designs and the scaffold they fit on
+DESIGNS = {
+    'Sphere': 'M13mp18',
+    'Cuboctahedron_1.5': 'M13mp18',
+    'octa_long_5_4_28_5': 'P8634',
+    'Triangular_BH_4_shorter_ply_6_1': 'P8634',
+    'squared_rod_4_1': 'P8634',
+}
+
+# Designs with golden outputs in the folder of the same name, sequenced with seed 0
+GOLDEN_DESIGNS = ('Sphere', 'Cuboctahedron_1.5')
+
+# Small shipped designs of the startup benchmark and the time a run should take
+STARTUP_DESIGNS = ('small_*.json', 'tube_*.json', 'test*.json')
+STARTUP_SECONDS = 0.1
+
+
+def SyntheticArrays(numHelices, lengthStrands, stapleDomain=16, skipInterval=0):
+    """
+    Returns scaffold and staple (numHelices, lengthStrands, 4) arrays and the
+    skip array of a synthetic design. A single scaffold runs through every
+    helix in turn, towards higher indices on even helices. Staples consist of
+    two domains of stapleDomain bases on neighbouring helices, joined by a
+    crossover. Every skipInterval-th base is a skip if skipInterval is set.
+    """
+
+    helix, index = np.meshgrid(np.arange(numHelices), np.arange(lengthStrands), indexing='ij')
+    even = helix % 2 == 0
+    last = lengthStrands - 1
+
+    scaffolds = np.empty((numHelices, lengthStrands, 4), dtype=np.int64)
+
+    # Scaffold enters every helix at the index the previous helix left it
+    scaffolds[..., 0] = np.where(even, np.where(index > 0, helix, helix - 1),
+                                 np.where(index < last, helix, helix - 1))
+    scaffolds[..., 1] = np.where(even, np.where(index > 0, index - 1, 0),
+                                 np.where(index < last, index + 1, last))
+    scaffolds[..., 2] = np.where(even, np.where(index < last, helix, helix + 1),
+                                 np.where(index > 0, helix, helix + 1))
+    scaffolds[..., 3] = np.where(even, np.where(index < last, index + 1, last),
+                                 np.where(index > 0, index - 1, 0))
+    scaffolds[scaffolds[..., 0] < 0, :2] = -1
+    scaffolds[scaffolds[..., 2] >= numHelices, 2:] = -1
+
+    # Staple domains, from start to end of every segment
+    start = index // stapleDomain * stapleDomain
+    end = np.minimum(start + stapleDomain, lengthStrands) - 1
+    paired = np.where(even, helix + 1 < numHelices, True)
+
+    staples = np.empty((numHelices, lengthStrands, 4), dtype=np.int64)
+
+    # Even helices run towards lower indices, then cross to the odd helix
+    staples[..., 0] = np.where(even, np.where(index < end, helix, -1),
+                               np.where(index > start, helix, helix - 1))
+    staples[..., 1] = np.where(even, np.where(index < end, index + 1, -1),
+                               np.where(index > start, index - 1, start))
+    staples[..., 2] = np.where(even, np.where(index > start, helix, np.where(paired, helix + 1, -1)),
+                               np.where(index < end, helix, -1))
+    staples[..., 3] = np.where(even, np.where(index > start, index - 1, np.where(paired, start, -1)),
+                               np.where(index < end, index + 1, -1))
+
+    skip = np.zeros((numHelices, lengthStrands), dtype=np.int64)
+    if skipInterval:
+        skip[:, skipInterval - 1::skipInterval] = -1
+
+    return scaffolds, staples, skip
+
+
+def SyntheticDesign(numHelices, lengthStrands, stapleDomain=16, skipInterval=0):
+    """
+    Returns synthetic cadnano design as decoded json data, see
+    SyntheticArrays.
+    """
+
+    scaffolds, staples, skip = SyntheticArrays(numHelices, lengthStrands, stapleDomain, skipInterval)
+    loop = [0] * lengthStrands
+
+    vstrands = []
+    for i in range(numHelices):
+        vstrands.append({
+            'row': i, 'col': 0, 'num': i,
+            'scaf': scaffolds[i].tolist(), 'stap': staples[i].tolist(),
+            'skip': skip[i].tolist(), 'loop': loop,
+            'scafLoop': [], 'stapLoop': [], 'stap_colors': [],
+        })
+
+    return {'name': "synthetic_" + str(numHelices) + "x" + str(lengthStrands) + ".json", 'vstrands': vstrands}
+
+
+def WriteSyntheticDesign(fileName, numHelices, lengthStrands, stapleDomain=16, skipInterval=0):
+    """
+    Writes synthetic design to a json file, helix by helix.
+    """
+
+    design = SyntheticDesign(numHelices, lengthStrands, stapleDomain, skipInterval)
+
+    with open(fileName, 'w') as file:
+        file.write('{"name": ' + json.dumps(design['name']) + ', "vstrands": [')
+        for i, vstrand in enumerate(design['vstrands']):
+            if i > 0:
+                file.write(',')
+            json.dump(vstrand, file, separators=(',', ':'))
+        file.write(']}')
+
+
+def ParseSize(text):
+    """
+    Parses HELICESxLENGTH size of a synthetic design, i.e. 100x5000.
+    """
+
+    try:
+        numHelices, lengthStrands = (int(x) for x in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected HELICESxLENGTH, got " + repr(text))
+    return numHelices, lengthStrands
+
+
+def FreshProcess(function, *args):
+    """
+    Runs function in a newly spawned process and returns its result. Spawned
+    processes don't inherit the memory of this one, as forked ones would.
+    """
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(function, *args).result()
+
+
+def RunCase(case):
+    """
+    Sequences a design repeat times and writes its outputs, in a fresh
+    process (see FreshProcess) so peak memory belongs to this case only.
+    Returns the benchmark
+    record: fastest total time, stages of the fastest run, throughput and
+    peak memory.
+    """
+
+    scaffoldSequence = RawScaffoldSequence(case['scaffold'])
+    if case.get('tileScaffold'):
+        scaffoldSequence = scaffoldSequence * -(-case['cells'] // len(scaffoldSequence))
+
+    record = {key: case[key] for key in ('name', 'cells', 'compact', 'cache')}
+    best = None
+
+    for _ in range(case['repeat']):
+        instrumentation = Instrumentation(traceMemory=case['traceMemory'])
+        cache = DesignCache(case['cacheDirectory']) if case['cache'] else None
+        engine = SequenceDesign(compact=case['compact'], seed=0, designCache=cache,
+                                instrumentation=instrumentation)
+
+        timeStart = time.perf_counter()
+        try:
+            result = engine.Run(case['design'], scaffoldSequence)
+            result.WriteFiles(case['output'])
+        except SequenceDesignError as error:
+            record['error'] = str(error)
+            return record
+        seconds = time.perf_counter() - timeStart
+
+        if best is None or seconds < best[0]:
+            best = (seconds, instrumentation.records, result)
+
+    seconds, stages, result = best
+    record['seconds'] = seconds
+    record['cellsPerSecond'] = case['cells'] / seconds
+    record['basesPerSecond'] = sum(len(sequence) for sequence in result.stapleSequence) / seconds
+    record['maxRssKb'] = stages[-1]['processPeakRssKb']
+    record['stages'] = [{key: stage[key] for key in stage if key != 'processPeakRssKb'} for stage in stages]
+
+    return record
+
+
+def StartupTime(command, workDirectory, repeat):
+    """
+    Runs command repeat times in a fresh interpreter, with a design cache in
+    workDirectory. Returns the fastest wall time and whether NumPy was
+    imported.
+    """
+
+    environment = dict(os.environ, SEQ_DESIGNER_CACHE=os.path.join(workDirectory, "cache"))
+    best = None
+
+    for _ in range(repeat):
+        timeStart = time.perf_counter()
+        subprocess.run(command, cwd=workDirectory, env=environment,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        seconds = time.perf_counter() - timeStart
+        best = seconds if best is None else min(best, seconds)
+
+    # Import log of one more run, only to see which modules were loaded
+    imports = subprocess.run([command[0], "-X", "importtime"] + command[1:], cwd=workDirectory, env=environment,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    numpy = any(line.rsplit("|", 1)[-1].strip() == "numpy" for line in imports.splitlines())
+
+    return best, numpy
+
+
+def StartupBenchmark(repeat, workDirectory):
+    """
+    Times complete seq_designer.py runs of the small shipped designs, start
+    of the interpreter included, against STARTUP_SECONDS. Returns records.
+    """
+
+    designs = sorted(path for pattern in STARTUP_DESIGNS
+                     for path in glob.glob(os.path.join(DIRECTORY, "json_files", pattern)))
+    scaffold = os.path.join(DIRECTORY, "scaffold_files", "M13mp18")
+
+    interpreter, _ = StartupTime([sys.executable, "-c", "pass"], workDirectory, repeat)
+    print("Interpreter start: {:.3f} s, target per design: {:.3f} s".format(interpreter, STARTUP_SECONDS))
+
+    records = []
+    print("{:<34}{:>10}{:>10}{:>8}".format("design", "bytes", "seconds", "numpy"))
+    for design in designs:
+        seconds, numpy = StartupTime([sys.executable, os.path.join(DIRECTORY, "seq_designer.py"), design, scaffold],
+                                     workDirectory, repeat)
+        records.append({'name': os.path.basename(design), 'bytes': os.path.getsize(design),
+                        'seconds': seconds, 'numpy': numpy, 'interpreterSeconds': interpreter})
+        print("{:<34}{:>10}{:>10.3f}{:>8}{}".format(records[-1]['name'], records[-1]['bytes'], seconds,
+                                                   "yes" if numpy else "no",
+                                                   "  over target" if seconds > STARTUP_SECONDS else ""))
+
+    return records
+
+
+def CheckGolden(name, outputDirectory):
+    """
+    Returns list of output files of design name that differ from the golden
+    outputs in the folder of the same name.
+    """
+
+    goldenDirectory = os.path.join(DIRECTORY, name)
+    files = ["scaffolds_" + name + ".txt", "staples_" + name + ".txt",
+             "visualized_sequence_" + name + ".txt"]
+    _, mismatch, errors = filecmp.cmpfiles(goldenDirectory, os.path.join(outputDirectory, name),
+                                           files, shallow=False)
+
+    return mismatch + errors
+
+
+def ParseArguments(argv=None):
+    """
+    Parses command line arguments.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="benchmark.py", description="Benchmark the sequence designer on the shipped and synthetic designs.")
+    parser.add_argument("--designs", nargs="*", default=list(DESIGNS),
+                        help="shipped designs to run (default: " + ", ".join(DESIGNS) + ")")
+    parser.add_argument("--synthetic", nargs="*", type=ParseSize, default=[], metavar="HxL",
+                        help="synthetic designs of H helices of length L, i.e. 100x5000 1000x10000")
+    parser.add_argument("--skip-interval", type=int, default=0,
+                        help="put a skip every N bases of synthetic designs (default: none)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per design, the fastest is reported (default: 3)")
+    parser.add_argument("--compact", action="store_true",
+                        help="load designs into compact NumPy arrays")
+    parser.add_argument("--cache", action="store_true",
+                        help="use a design cache, warmed up by the first run")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="trace peak memory of every stage with tracemalloc (slow)")
+    parser.add_argument("--output", default=None, metavar="FILE",
+                        help="write records of all designs to json FILE")
+    parser.add_argument("--startup", action="store_true",
+                        help="time complete seq_designer.py runs of the small designs instead, "
+                             "interpreter start included")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs every design in its own process, prints a summary table and checks
+    the designs with golden outputs.
+    """
+
+    args = ParseArguments(argv)
+
+    if args.startup:
+        with tempfile.TemporaryDirectory() as workDirectory:
+            records = StartupBenchmark(args.repeat, workDirectory)
+        if args.output is not None:
+            with open(args.output, 'w') as file:
+                json.dump(records, file, indent=2)
+        return
+
+    with tempfile.TemporaryDirectory() as workDirectory:
+        cases = []
+        for name in args.designs:
+            if name not in DESIGNS:
+                sys.exit("Unknown design " + name + ", choose from " + ", ".join(DESIGNS))
+            cases.append({
+                'name': name,
+                'design': os.path.join(DIRECTORY, "json_files", name + ".json"),
+                'scaffold': os.path.join(DIRECTORY, "scaffold_files", DESIGNS[name]),
+            })
+
+        for numHelices, lengthStrands in args.synthetic:
+            name = "synthetic_" + str(numHelices) + "x" + str(lengthStrands)
+            print("Generating " + name + "...")
+            designFile = os.path.join(workDirectory, name + ".json")
+            # Generated in a process of its own, its arrays would count towards the peak memory of later cases
+            FreshProcess(WriteSyntheticDesign, designFile, numHelices, lengthStrands, 16, args.skip_interval)
+            cases.append({
+                'name': name,
+                'design': designFile,
+                'scaffold': os.path.join(DIRECTORY, "scaffold_files", "M13mp18"),
+                'tileScaffold': True,
+                'cells': numHelices * lengthStrands,
+            })
+
+        for case in cases:
+            if 'cells' not in case:
+                with open(case['design'], 'rb') as file:
+                    vstrands = json.load(file)['vstrands']
+                case['cells'] = (max(vstrand['num'] for vstrand in vstrands) + 1) * len(vstrands[0]['scaf'])
+            case.update(repeat=args.repeat, compact=args.compact, cache=args.cache,
+                        traceMemory=args.trace_memory,
+                        cacheDirectory=os.path.join(workDirectory, "cache"),
+                        output=os.path.join(workDirectory, "output"))
+
+        records = []
+        print("{:<34}{:>10}{:>10}{:>14}{:>12}".format("design", "cells", "seconds", "cells/s", "max rss MB"))
+        for case in cases:
+            # Fresh process per design, so peak memory isn't shared between designs
+            record = FreshProcess(RunCase, case)
+
+            if case['name'] in GOLDEN_DESIGNS and 'error' not in record:
+                record['goldenMismatch'] = CheckGolden(case['name'], case['output'])
+
+            records.append(record)
+
+            if 'error' in record:
+                print("{:<34}{:>10}  error: {}".format(record['name'], record['cells'], record['error']))
+                continue
+
+            print("{:<34}{:>10}{:>10.3f}{:>14.0f}{:>12.1f}".format(
+                record['name'], record['cells'], record['seconds'], record['cellsPerSecond'],
+                (record['maxRssKb'] or 0) / 1024))
+            for stage in record['stages']:
+                print("    {:<30}{:>10.4f}s  {}".format(stage['stage'], stage['seconds'],
+                                                      json.dumps(stage['counters'])))
+
+    failed = [record['name'] for record in records if record.get('goldenMismatch')]
+    for record in records:
+        if record.get('goldenMismatch'):
+            print("Golden output mismatch in " + record['name'] + ": " + ", ".join(record['goldenMismatch']))
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(records, file, indent=2)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import re
+import codecs
+import json
+import importlib.util
+
+
+# Key of the helix number of a vstrand, found without decoding the json
+NUM_PATTERN = re.compile(rb'"num"\s*:\s*(\d+)')
+
+# Helices added at a time when compact arrays of unknown size grow
+GROW_STRANDS = 64
+
+
+def IterVstrandsStream(jsonFile, chunkSize=1 << 16):
+    """
+    Yields the vstrands of a cadnano json file one at a time, using only the
+    standard library. The file is read in chunks, so only a single vstrand is
+    held as python objects at any time. The file may be opened in text or
+    binary mode.
+    """
+
+    decoder = json.JSONDecoder()
+    textDecoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def ReadMore(buffer, pos, size):
+        chunk = jsonFile.read(size)
+        end = len(chunk) == 0
+        if isinstance(chunk, bytes):
+            chunk = textDecoder.decode(chunk, final=end)
+        return buffer[pos:] + chunk, 0, end
+
+    # Find start of the vstrands array
+    while True:
+        index = buffer.find('"vstrands"', pos)
+        if index != -1:
+            pos = index + len('"vstrands"')
+            break
+        if eof:
+            raise KeyError("vstrands")
+        # Keep the tail, the key might be split over two chunks
+        pos = max(len(buffer) - len('"vstrands"'), 0)
+        buffer, pos, eof = ReadMore(buffer, pos, chunkSize)
+
+    expected = ':['
+    while expected != '':
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of json file")
+            buffer, pos, eof = ReadMore(buffer, pos, chunkSize)
+            continue
+        if buffer[pos].isspace():
+            pos += 1
+        elif buffer[pos] == expected[0]:
+            expected = expected[1:]
+            pos += 1
+        else:
+            raise ValueError("vstrands is not a list")
+
+    # Decode vstrands one by one
+    readSize = chunkSize
+    while True:
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ','):
+            pos += 1
+
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of json file")
+            buffer, pos, eof = ReadMore(buffer, pos, readSize)
+            continue
+
+        if buffer[pos] == ']':
+            return
+
+        try:
+            vstrand, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Vstrand is split over chunks, read more (doubling to stay linear)
+            buffer, pos, eof = ReadMore(buffer, pos, readSize)
+            readSize *= 2
+            continue
+
+        readSize = chunkSize
+        pos = end
+        yield vstrand
+
+
+def IterVstrandsIjson(jsonFile):
+    """
+    Yields the vstrands of a cadnano json file one at a time using ijson.
+    """
+
+    import ijson
+
+    yield from ijson.items(jsonFile, 'vstrands.item', use_float=True)
+
+
+def IterVstrandsOrjson(jsonFile):
+    """
+    Yields the vstrands of a cadnano json file using orjson. The whole file is
+    parsed at once, which is fast but doesn't lower peak memory.
+    """
+
+    import orjson
+
+    yield from orjson.loads(jsonFile.read())['vstrands']
+
+
+def IterVstrandsJson(jsonFile):
+    """
+    Yields the vstrands of a cadnano json file using json.load.
+    """
+
+    yield from json.load(jsonFile)['vstrands']
+
+
+# Json backends by name, each takes a file opened in binary mode and yields
+# vstrand dicts
+JSON_BACKENDS = {
+    'stream': IterVstrandsStream,
+    'ijson': IterVstrandsIjson,
+    'orjson': IterVstrandsOrjson,
+    'json': IterVstrandsJson,
+}
+
+
+def RegisterJsonBackend(name, iterVstrands):
+    """
+    Registers a json backend, a function taking a cadnano json file opened in
+    binary mode and yielding its vstrands.
+    """
+
+    JSON_BACKENDS[name] = iterVstrands
+
+
+def DefaultJsonBackend():
+    """
+    Returns ijson if it is installed, otherwise the standard library stream.
+    """
+
+    if importlib.util.find_spec("ijson") is None:
+        return 'stream'
+    return 'ijson'
+
+
+def ScanNumStrands(jsonFile, chunkSize=1 << 20):
+    """
+    Returns the highest helix number of a cadnano json file (opened in binary
+    mode) plus one, found by scanning the raw bytes for the "num" keys, or
+    None if there are none. The file is read from its current position.
+    """
+
+    highest = -1
+    tail = b''
+    for chunk in iter(lambda: jsonFile.read(chunkSize), b''):
+        # Keys split over two chunks are found in the kept tail, finding a
+        # key twice doesn't change the maximum
+        data = tail + chunk
+        for match in NUM_PATTERN.finditer(data):
+            # A number at the end of the chunk might continue in the next one
+            if match.end() < len(data):
+                highest = max(highest, int(match.group(1)))
+        tail = data[-64:]
+
+    for match in NUM_PATTERN.finditer(tail):
+        highest = max(highest, int(match.group(1)))
+
+    return highest + 1 if highest >= 0 else None
+
+
+def LoadVstrands(vstrands, compact=False, numStrands=None):
+    """
+    Loads vstrands into per helix arrays, indexed by the helix number.
+    Returns number of strands, length of strands (number of bases), scaffolds,
+    staples, skip and loop data, in the format described in ParseJson.
+    numStrands (highest helix number + 1) lets compact arrays be allocated at
+    their final size, it is taken from vstrands if they are a list.
+    """
+
+    if compact:
+        if numStrands is None and isinstance(vstrands, list) and vstrands:
+            numStrands = max(vstrand['num'] for vstrand in vstrands) + 1
+        return LoadCompact(vstrands, numStrands)
+
+    strandData = {}
+    lengthStrands = None
+    for vstrand in vstrands:
+        if lengthStrands is None:
+            lengthStrands = len(vstrand['scaf'])
+        strandData[vstrand['num']] = vstrand
+
+    if lengthStrands is None:
+        raise ValueError("No vstrands found in json file")
+
+    numStrands = max(strandData)+1
+
+    # Initialize lists, plain lists so small designs are loaded without NumPy
+    scaffolds = [None] * numStrands
+    staples = [None] * numStrands
+    skip = [None] * numStrands
+    loop = [None] * numStrands
+
+    emptyStrand = []
+    for i in range(lengthStrands):
+        emptyStrand.append([-1, -1, -1, -1])
+
+    for i in range(numStrands):
+        # If strand exists, set strandData
+        if i in strandData:
+            scaffolds[i] = strandData[i]['scaf']
+            staples[i] = strandData[i]['stap']
+            skip[i] = strandData[i]['skip']
+            loop[i] = strandData[i]['loop']
+
+        # if strand doesn't exist
+        else:
+            scaffolds[i] = emptyStrand
+            staples[i] = emptyStrand
+            skip[i] = 0
+            loop[i] = 0
+
+    return numStrands, lengthStrands, scaffolds, staples, skip, loop
+
+
+def LoadCompact(vstrands, numStrands=None):
+    """
+    Copies each vstrand straight into preallocated compact arrays. If the
+    number of strands is known the arrays are allocated once at their final
+    size, otherwise they grow in steps of GROW_STRANDS helices whenever a
+    higher helix number is found. The arrays returned hold the helices found
+    only.
+    """
+
+    arrays = None
+    capacity = numStrands or 0
+    numStrands = 0
+    lengthStrands = None
+
+    for vstrand in vstrands:
+        num = vstrand['num']
+
+        if lengthStrands is None:
+            lengthStrands = len(vstrand['scaf'])
+            capacity = max(capacity, num+1)
+            arrays = GrowArrays(None, capacity, lengthStrands)
+
+        if num >= capacity:
+            capacity = num + 1 + GROW_STRANDS
+            arrays = GrowArrays(arrays, capacity, lengthStrands)
+
+        scaffolds, staples, skip, loop = arrays
+        scaffolds[num] = vstrand['scaf']
+        staples[num] = vstrand['stap']
+        skip[num] = vstrand['skip']
+        loop[num] = vstrand['loop']
+        numStrands = max(numStrands, num+1)
+
+    if lengthStrands is None:
+        raise ValueError("No vstrands found in json file")
+
+    # Views of the helices found, spare capacity is only left if the helix
+    # count given was too high or the arrays had to grow
+    scaffolds, staples, skip, loop = (array[:numStrands] for array in arrays)
+
+    return numStrands, lengthStrands, scaffolds, staples, skip, loop
+
+
+def GrowArrays(arrays, capacity, lengthStrands):
+    """
+    Returns empty compact arrays for capacity strands, containing the
+    strands of the given arrays.
+    """
+
+    import numpy as np
+
+    grown = (np.full((capacity, lengthStrands, 4), -1, dtype=np.int32),
+             np.full((capacity, lengthStrands, 4), -1, dtype=np.int32),
+             np.zeros((capacity, lengthStrands), dtype=np.int16),
+             np.zeros((capacity, lengthStrands), dtype=np.int16))
+
+    if arrays is not None:
+        for old, new in zip(arrays, grown):
+            new[:len(old)] = old
+
+    return grown
+
+
+def LoadJson(inputJson, compact=False, backend=None):
+    """
+    Loads a cadnano json file, streaming its vstrands with the given backend
+    (see JSON_BACKENDS). Uses DefaultJsonBackend if no backend is given.
+    """
+
+    if backend is None:
+        backend = DefaultJsonBackend()
+
+    if backend not in JSON_BACKENDS:
+        raise ValueError("Unknown json backend: " + str(backend))
+
+    with open(inputJson, 'rb') as jsonFile:
+        numStrands = None
+        if compact:
+            numStrands = ScanNumStrands(jsonFile)
+            jsonFile.seek(0)
+        return LoadVstrands(JSON_BACKENDS[backend](jsonFile), compact, numStrands)
@@ -0,0 +1,149 @@
+import os
+import json
+import struct
+import hashlib
+import tempfile
+import zipfile
+import numpy as np
+from scaffold_pool import DefaultCacheDirectory
+
+
+# Version of the cached data, increase when the stored arrays change
+FORMAT_VERSION = 1
+
+# Arrays stored for every design
+ARRAY_NAMES = ('scaffolds', 'staples', 'skip', 'loop',
+               'stapleStartBases', 'scaffoldStartBases', 'circularScaffolds')
+
+
+def DesignHash(design):
+    """
+    Returns SHA-256 of the content of a design, given as path to the json file,
+    its bytes or the decoded dict.
+    """
+
+    if isinstance(design, dict):
+        content = json.dumps(design, sort_keys=True, separators=(',', ':')).encode()
+    elif isinstance(design, (bytes, bytearray)):
+        content = design
+    else:
+        digest = hashlib.sha256()
+        with open(design, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    return hashlib.sha256(content).hexdigest()
+
+
+def MemoryMapNpz(path):
+    """
+    Returns the arrays of an uncompressed .npz file as read only memory maps.
+    """
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(info.filename + " is compressed")
+
+            # Data starts after the local file header, name and extra field
+            file.seek(info.header_offset)
+            header = file.read(30)
+            nameLength, extraLength = struct.unpack('<HH', header[26:30])
+            file.seek(info.header_offset + 30 + nameLength + extraLength)
+
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortranOrder, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortranOrder, dtype = np.lib.format.read_array_header_2_0(file)
+
+            name = os.path.splitext(info.filename)[0]
+            if 0 in shape:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                # Plain ndarray view of the map, indexing memmaps is slower
+                arrays[name] = np.asarray(np.memmap(path, dtype=dtype, mode='r', shape=shape,
+                                                    order='F' if fortranOrder else 'C', offset=file.tell()))
+
+    return arrays
+
+
+class DesignCache:
+    """
+    Cache of parsed designs, keyed by the SHA-256 of the json content.
+    Every design is stored as an uncompressed .npz file holding the compact
+    arrays of ParseJson and the start bases of all strands, and is memory
+    mapped when loaded. Files of other format versions are never read.
+    """
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = os.path.join(DefaultCacheDirectory(), "designs")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def Path(self, designHash):
+        return os.path.join(self.directory, designHash + "-v" + str(FORMAT_VERSION) + ".npz")
+
+    def Load(self, designHash):
+        """
+        Returns dict with arrays of cached design, or None if not cached.
+        """
+
+        path = self.Path(designHash)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            arrays = MemoryMapNpz(path)
+        except (OSError, ValueError, zipfile.BadZipFile):
+            return None
+
+        if any(name not in arrays for name in ARRAY_NAMES):
+            return None
+
+        return arrays
+
+    def Store(self, designHash, arrays):
+        """
+        Stores dict of arrays (see ARRAY_NAMES) of a design.
+        """
+
+        fd, temporaryPath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                np.savez(file, **{name: np.asarray(arrays[name]) for name in ARRAY_NAMES})
+            os.replace(temporaryPath, self.Path(designHash))
+        except BaseException:
+            os.unlink(temporaryPath)
+            raise
+
+    def Clear(self):
+        """
+        Removes all cached designs, of every format version.
+        """
+
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npz") or entry.name.endswith(".tmp"):
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+def StartBaseArray(startBases):
+    """
+    Returns list of [helix, index] start bases as (n, 2) int32 array.
+    """
+
+    return np.array([base[:2] for base in startBases], dtype=np.int32).reshape(-1, 2)
+
+
+def StartBaseList(array):
+    """
+    Returns (n, 2) array of start bases as list of [helix, index] lists.
+    """
+
+    return [[int(helix), int(index)] for helix, index in array]
@@ -0,0 +1,241 @@
+from collections import namedtuple
+
+
+# Contiguous part of a strand on a single helix, from start to end index
+# (inclusive) in 5' to 3' order. direction is 1 if the index increases along
+# the strand, -1 if it decreases. sequence holds the letters of the domain,
+# skips left out and loops included.
+Domain = namedtuple('Domain', ['helix', 'start', 'end', 'direction', 'sequence'])
+
+
+class Strand:
+    """
+    Scaffold or staple strand as ordered list of domains. len() is the number
+    of bases (cadnano positions, including skips), sequence the letters of
+    the whole strand.
+    """
+
+    __slots__ = ('domains', 'sequence', 'numBases')
+
+    def __init__(self, domains, sequence=None):
+        self.domains = domains
+        if sequence is None:
+            sequence = ''.join(domain.sequence for domain in domains)
+        self.sequence = sequence
+        self.numBases = sum(abs(domain.end - domain.start) + 1 for domain in domains)
+
+    def __len__(self):
+        return self.numBases
+
+    def __eq__(self, other):
+        return isinstance(other, Strand) and self.domains == other.domains
+
+    def __repr__(self):
+        return "Strand(" + repr(self.domains) + ")"
+
+    @property
+    def startBase(self):
+        return [self.domains[0].helix, self.domains[0].start]
+
+    @property
+    def endBase(self):
+        return [self.domains[-1].helix, self.domains[-1].end]
+
+    def Bases(self):
+        """
+        Yields [helix, index] of every base in 5' to 3' order.
+        """
+
+        for domain in self.domains:
+            for index in range(domain.start, domain.end + domain.direction, domain.direction):
+                yield [domain.helix, index]
+
+
+def DefaultDirection(helix, scaffold):
+    """
+    Direction of a single base domain: scaffolds run towards higher indices on
+    even helices, staples on odd helices.
+    """
+
+    return 1 if (helix % 2 == 0) == scaffold else -1
+
+
+class DomainBuilder:
+    """
+    Builds the domains of a strand while it is traversed, from bases added
+    one at a time in 5' to 3' order. A domain continues while the bases stay
+    on the same helix and step by one index in the same direction.
+    """
+
+    def __init__(self, scaffold):
+        self.scaffold = scaffold
+        self.domains = []
+        self.helix = None
+        self.start = None
+        self.end = None
+        self.step = 0
+        self.letters = []
+
+    def Add(self, helix, index, letters):
+        """
+        Adds the next base of the strand with its letters ('' for a skip).
+        """
+
+        step = index - self.end if helix == self.helix else 0
+        if abs(step) == 1 and (self.step == 0 or step == self.step):
+            self.step = step
+            self.end = index
+        else:
+            self.Close()
+            self.helix, self.start, self.end, self.step = helix, index, index, 0
+        self.letters.append(letters)
+
+    def Close(self):
+        """
+        Ends the current domain, if any.
+        """
+
+        if self.helix is not None:
+            direction = self.step or DefaultDirection(self.helix, self.scaffold)
+            self.domains.append(Domain(self.helix, self.start, self.end, direction, ''.join(self.letters)))
+            self.helix = None
+            self.letters = []
+
+    def Strand(self):
+        """
+        Returns the Strand of all bases added.
+        """
+
+        self.Close()
+
+        return Strand(self.domains)
+
+
+class DomainTable:
+    """
+    Domains of strands given as flat indices in path order (see
+    lattice.StrandPaths), as arrays with an entry per domain: strand, helix,
+    start and end index, direction, and position of the first and last base
+    in cells. Domains are found with vectorized comparisons of neighbouring
+    bases, so work in Python is O(domains). NumPy is only imported for
+    compact designs.
+    """
+
+    def __init__(self, cells, bounds, lengthStrands, scaffold):
+        import numpy as np
+
+        helix = cells // lengthStrands
+        index = cells % lengthStrands
+        numCells = len(cells)
+
+        strandStart = np.zeros(numCells, dtype=bool)
+        strandStart[bounds[:-1][bounds[:-1] < numCells]] = True
+
+        # New domain at every new strand, helix or jump in index
+        step = np.diff(index, prepend=0)
+        newDomain = strandStart | (np.diff(helix, prepend=-1) != 0) | (np.abs(step) != 1)
+
+        # ... or when the direction changes on the same helix
+        directionChange = np.zeros(numCells, dtype=bool)
+        directionChange[1:] = ~newDomain[:-1] & (step[1:] != step[:-1])
+        newDomain |= directionChange
+
+        self.first = np.flatnonzero(newDomain)
+        self.last = np.append(self.first[1:], numCells)[:len(self.first)] - 1
+
+        self.strand = np.searchsorted(bounds, self.first, side='right') - 1
+        self.numStrands = len(bounds) - 1
+        self.helix = helix[self.first]
+        self.start = index[self.first]
+        self.end = index[self.last]
+
+        self.direction = np.sign(self.end - self.start)
+        single = self.direction == 0
+        even = self.helix % 2 == 0
+        self.direction[single] = np.where(even[single] == scaffold, 1, -1)
+
+    def Lengths(self, prefix):
+        """
+        Returns number of letters of every domain, from the per helix prefix
+        sums of letters (see lattice.LetterPrefixSums).
+        """
+
+        import numpy as np
+
+        low = np.minimum(self.start, self.end)
+        high = np.maximum(self.start, self.end)
+
+        return prefix[self.helix, high + 1] - prefix[self.helix, low]
+
+    def StrandLengths(self, prefix):
+        """
+        Returns number of letters of every strand.
+        """
+
+        import numpy as np
+
+        return np.bincount(self.strand, weights=self.Lengths(prefix),
+                           minlength=self.numStrands).astype(np.int64)
+
+    def Offsets(self, prefix):
+        """
+        Returns where the letters of every domain start in the sequence of its
+        strand, and the number of letters of every domain.
+        """
+
+        import numpy as np
+
+        lengths = self.Lengths(prefix)
+        total = np.cumsum(lengths) - lengths
+
+        # Subtract the letters of the strands before
+        strandStart = np.zeros(self.numStrands, dtype=np.int64)
+        firstDomain = np.flatnonzero(np.diff(self.strand, prepend=-1) != 0)
+        strandStart[self.strand[firstDomain]] = total[firstDomain]
+
+        return total - strandStart[self.strand], lengths
+
+    def Strands(self, letterStart, letterEnd, texts):
+        """
+        Returns Strands with the letters of every domain sliced from the text
+        of its strand, from letterStart up to letterEnd (arrays per domain).
+        """
+
+        domains = [[] for _ in range(self.numStrands)]
+        for strand, h, s, e, d, ls, le in zip(self.strand.tolist(), self.helix.tolist(),
+                                              self.start.tolist(), self.end.tolist(),
+                                              self.direction.tolist(), letterStart.tolist(),
+                                              letterEnd.tolist()):
+            domains[strand].append(Domain(h, s, e, d, texts[strand][ls:le]))
+
+        return [Strand(strandDomains) for strandDomains in domains]
+
+
+def StrandsFromPaths(cells, bounds, lengthStrands, text, counts, scaffold):
+    """
+    Returns Strands of bases given as flat indices in path order, with the
+    letters of all bases concatenated in text and the number of letters of
+    every base in counts.
+    """
+
+    import numpy as np
+
+    table = DomainTable(cells, bounds, lengthStrands, scaffold)
+
+    letterEnd = np.cumsum(counts)
+    letterStart = letterEnd - counts
+
+    return table.Strands(letterStart[table.first], letterEnd[table.last],
+                         [text] * table.numStrands)
+
+
+def StrandsFromOffsets(table, prefix, sequences):
+    """
+    Returns Strands of a DomainTable, each strand taking the start of the
+    sequence with the same index. Letters of every domain are sliced using
+    the prefix sums of letters, without visiting single bases.
+    """
+
+    offsets, lengths = table.Offsets(prefix)
+
+    return table.Strands(offsets, offsets + lengths, sequences)
@@ -0,0 +1,195 @@
+import hashlib
+import logging
+import numpy as np
+from lattice import FlatPointers, NonEmpty, RankBases
+
+
+logger = logging.getLogger("seq_designer")
+
+CHANGE_COLUMNS = ('Change', 'OldStaple', 'NewStaple', 'Start', 'End', 'OldSequence', 'NewSequence')
+
+
+def ScaffoldKey(scaffoldSequence, seed, rotateScaffold, rotateReverse):
+    """
+    Returns key of everything besides the design that decides the scaffold
+    letters of a run: scaffold sequence, seed and rotation settings.
+    """
+
+    digest = hashlib.sha256(scaffoldSequence.encode('ascii'))
+    digest.update(repr((seed, bool(rotateScaffold), bool(rotateReverse))).encode('ascii'))
+    return digest.hexdigest()
+
+
+def DesignArrays(scaffolds, staples, skip, loop, scaffoldStartBases, scaffoldKey):
+    """
+    Returns the lattice of a compact design as stored in result bundles (see
+    result_bundle.DESIGN_ARRAYS), for a later incremental run.
+    """
+
+    return {
+        'designScaffolds': scaffolds, 'designStaples': staples,
+        'designSkip': skip, 'designLoop': loop,
+        'designScaffoldStartBases': np.array([base[:2] for base in scaffoldStartBases],
+                                             dtype=np.int32).reshape(-1, 2),
+        'scaffoldKey': np.frombuffer(scaffoldKey.encode('ascii'), dtype=np.uint8),
+    }
+
+
+def ScaffoldChange(previous, scaffolds, skip, loop, scaffoldKey):
+    """
+    Returns why the scaffolds of a design can't keep the letters of the
+    previous run (a ResultBundle), or None if they can: the previous run
+    needs a stored lattice of the same shape, the same scaffold key and the
+    same scaffold bases, skips and loops.
+    """
+
+    if not previous.HasDesign():
+        return "previous run has no stored lattice, it was not run with --compact"
+    if previous.designScaffolds.shape != scaffolds.shape:
+        return "design size changed"
+    if previous.scaffoldKey.tobytes().decode('ascii') != scaffoldKey:
+        return "scaffold sequence, seed or rotation changed"
+    if not np.array_equal(previous.designScaffolds, scaffolds):
+        return "scaffold routing changed"
+
+    scaffoldBases = NonEmpty(scaffolds)
+    skipLoop = ((previous.designSkip != skip) | (previous.designLoop != loop)).reshape(-1)
+    if np.any(skipLoop & scaffoldBases):
+        return "skips or loops on the scaffold changed"
+
+    return None
+
+
+def ChangedStaples(previous, staples, skip, loop, stapleStarts):
+    """
+    Returns for every staple (given by its start base) whether any of its
+    bases differs from the previous run: a different pointer, skip or loop.
+    Staples without a changed base have the same path as the staple starting
+    at the same base in the previous run.
+    """
+
+    lengthStrands = staples.shape[1]
+
+    changed = ((previous.designStaples != staples).any(axis=-1) |
+               (previous.designSkip != skip) | (previous.designLoop != loop)).reshape(-1)
+
+    _, prev = FlatPointers(staples)
+    nonEmpty = NonEmpty(staples)
+    root, _ = RankBases(prev, nonEmpty)
+
+    changedRoot = np.zeros(len(prev), dtype=bool)
+    changedRoot[root[changed & nonEmpty & (root >= 0)]] = True
+
+    return changedRoot[stapleStarts[:, 0] * lengthStrands + stapleStarts[:, 1]]
+
+
+def PreviousStapleIndex(previous, stapleStarts, lengthStrands):
+    """
+    Returns for every start base the number of the previous staple starting
+    there, -1 if there is none. lengthStrands is that of the previous run.
+    """
+
+    coordinates = np.asarray(previous.staplesCoordinates, dtype=np.int64)
+
+    indexOfCell = np.full(previous.numStrands * lengthStrands, -1, dtype=np.int64)
+    indexOfCell[coordinates[:, 0] * lengthStrands + coordinates[:, 1]] = np.arange(len(coordinates))
+
+    # Start bases outside the previous design didn't exist before
+    inside = (stapleStarts[:, 0] < previous.numStrands) & (stapleStarts[:, 1] < lengthStrands)
+    cells = np.where(inside, stapleStarts[:, 0] * lengthStrands + stapleStarts[:, 1], 0)
+
+    return np.where(inside, indexOfCell[cells], -1)
+
+
+def ReusedStapleCells(previous, indices, strands, letterLattice, lengthStrands):
+    """
+    Returns the bases (flat indices) of the previous staples at indices, in
+    5' to 3' order, their letters (the concatenated sequences of strands,
+    the same staples as Strands) and the number of letters of every base,
+    to fill the staple look up table without traversing them again.
+    """
+
+    table = np.asarray(previous.staplesDomains, dtype=np.int64)
+    selected = np.zeros(previous.Count('staples'), dtype=bool)
+    selected[indices] = True
+
+    # Domain rows are ordered by staple, indices are ascending
+    order = np.argsort(indices, kind='stable')
+    table = table[selected[table[:, 0]]]
+
+    lengths = np.abs(table[:, 3] - table[:, 2]) + 1
+    step = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    cells = (np.repeat(table[:, 1] * lengthStrands + table[:, 2], lengths) +
+             np.repeat(table[:, 4], lengths) * step)
+
+    # Bases without scaffold hold a single 'A', see ScaffoldLetterLattice.StapleLetterIndex
+    counts = np.where(letterLattice.offset[cells] < 0, 1, letterLattice.count[cells])
+    text = ''.join(strands[i].sequence for i in order.tolist())
+
+    return cells, text, counts
+
+
+def StapleChanges(previous, stapleSequence, reused=None):
+    """
+    Compares the staples of a run with those of the previous run, matched
+    by start base. Returns rows (see CHANGE_COLUMNS) of added, removed and
+    modified staples, and the number of unchanged ones. reused marks new
+    staples known to be unchanged.
+    """
+
+    lengthStrands = previous.lengthStrands
+    starts = np.array([strand.startBase for strand in stapleSequence], dtype=np.int64).reshape(-1, 2)
+    previousIndex = PreviousStapleIndex(previous, starts, lengthStrands)
+    if reused is None:
+        reused = np.zeros(len(stapleSequence), dtype=bool)
+
+    # Only staples that may differ are unpacked
+    compare = np.flatnonzero((previousIndex >= 0) & ~reused)
+    previousStrands = previous.Strands('staples', previousIndex[compare].tolist())
+
+    def Text(base):
+        return str(base[0]) + "[" + str(base[1]) + "]"
+
+    changes = []
+    for i, oldStrand in zip(compare.tolist(), previousStrands):
+        newStrand = stapleSequence[i]
+        if newStrand != oldStrand or newStrand.sequence != oldStrand.sequence:
+            changes.append(('modified', int(previousIndex[i]), i, Text(newStrand.startBase),
+                            Text(newStrand.endBase), oldStrand.sequence, newStrand.sequence))
+
+    for i in np.flatnonzero(previousIndex < 0).tolist():
+        newStrand = stapleSequence[i]
+        changes.append(('added', '', i, Text(newStrand.startBase), Text(newStrand.endBase),
+                        '', newStrand.sequence))
+
+    matched = np.zeros(previous.Count('staples'), dtype=bool)
+    matched[previousIndex[previousIndex >= 0]] = True
+    removed = np.flatnonzero(~matched).tolist()
+    coordinates = np.asarray(previous.staplesCoordinates).tolist()
+    for j, oldSequence in zip(removed, [previous.Sequence('staples', j) for j in removed]):
+        changes.append(('removed', j, '', Text(coordinates[j][:2]), Text(coordinates[j][2:]),
+                        oldSequence, ''))
+
+    unchanged = len(stapleSequence) - sum(1 for change in changes if change[0] != 'removed')
+
+    return changes, unchanged
+
+
+def LogChanges(changes, unchanged):
+    """
+    Logs the number of added, removed, modified and unchanged staples.
+    """
+
+    counts = {kind: sum(1 for change in changes if change[0] == kind) for kind in ('added', 'removed', 'modified')}
+    logger.info("Staples: " + str(counts['added']) + " added, " + str(counts['removed']) + " removed, " +
+                str(counts['modified']) + " modified, " + str(unchanged) + " unchanged")
+
+
+def WriteChangeReport(changes, fileName):
+    """
+    Writes the staple changes as csv table.
+    """
+
+    with open(fileName, 'w') as file:
+        file.write(",".join(CHANGE_COLUMNS) + "\n")
+        file.writelines(",".join(map(str, change)) + "\n" for change in changes)
@@ -0,0 +1,132 @@
+import sys
+import json
+import time
+import logging
+import cProfile
+import contextlib
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+logger = logging.getLogger("seq_designer")
+
+
+def MaxRss():
+    """
+    Returns peak resident memory of the process in kB, None if unknown.
+    ru_maxrss is given in kB on Linux, but in bytes on macOS.
+    """
+
+    if resource is None:
+        return None
+
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return maxRss // 1024
+    return maxRss
+
+
+def Count(counters, name, value):
+    """
+    Adds value to the counter name of a stage, if counters (see
+    Instrumentation.Stage) are given.
+    """
+
+    if counters is not None:
+        counters[name] = counters.get(name, 0) + value
+
+
+class Instrumentation:
+    """
+    Collects a record per pipeline stage with its wall time, memory and work
+    counters. processPeakRssKb is the peak resident memory of the process so
+    far, at the end of the stage, and peakRssGrowthKb how much the stage
+    raised it (0 if it stayed below an earlier peak). With traceMemory the
+    peak of memory allocated during the stage is traced with tracemalloc as
+    well (slow). Records are logged at debug level as json and can be
+    written to a json file.
+    """
+
+    def __init__(self, traceMemory=False):
+        self.traceMemory = traceMemory
+        self.records = []
+
+    @contextlib.contextmanager
+    def Stage(self, name):
+        """
+        Times the stage with given name. Yields dict of counters the stage
+        can fill in.
+        """
+
+        counters = {}
+        startedTracing = False
+        if self.traceMemory:
+            # Imported on demand, it slows down the start of every run
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                startedTracing = True
+            tracemalloc.reset_peak()
+
+        peakStart = MaxRss()
+        timeStart = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            peak = MaxRss()
+            record = {
+                'stage': name,
+                'seconds': time.perf_counter() - timeStart,
+                'processPeakRssKb': peak,
+                'peakRssGrowthKb': None if peak is None else peak - peakStart,
+            }
+            if self.traceMemory:
+                record['peakTracedBytes'] = tracemalloc.get_traced_memory()[1]
+                if startedTracing:
+                    tracemalloc.stop()
+            record['counters'] = counters
+
+            self.records.append(record)
+            logger.debug(json.dumps(record))
+
+    def WriteJson(self, fileName):
+        """
+        Writes all records to a json file.
+        """
+
+        with open(fileName, 'w') as file:
+            json.dump(self.records, file, indent=2)
+
+
+def Stage(instrumentation, name):
+    """
+    Returns instrumentation.Stage(name), or a context yielding a throwaway
+    dict of counters if instrumentation is None.
+    """
+
+    if instrumentation is None:
+        return contextlib.nullcontext({})
+    return instrumentation.Stage(name)
+
+
+@contextlib.contextmanager
+def Profile(fileName):
+    """
+    Profiles the enclosed code with cProfile and dumps the stats to fileName,
+    to be read with pstats. Does nothing if fileName is None.
+    """
+
+    if fileName is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(fileName)
@@ -0,0 +1,335 @@
+import os
+import logging
+import numpy as np
+from result_bundle import BASE_CODE, BASES
+from report_defaults import DEFAULT_K
+
+
+logger = logging.getLogger("seq_designer")
+
+# k-mers are packed into the low 32 bits of a key, the owning sequence into the high bits
+MAX_K = 16
+
+# Fewest unpaired bases between the two halves of a hairpin stem
+MIN_HAIRPIN_LOOP = 3
+
+# k-mers occurring at least this often over all scaffolds and staples are reported
+REPEAT_THRESHOLD = 4
+
+# Kinds of sequences in the index
+SCAFFOLD, STAPLE = 0, 1
+
+STAPLE_COLUMNS = ('Staple', 'Kmers', 'OffTargetKmers', 'MaxScaffoldSites', 'StapleMatchKmers',
+                  'PartnerStaple', 'HairpinStems', 'LongestStem')
+SCAFFOLD_COLUMNS = ('ScaffoldA', 'ScaffoldB', 'SharedKmers', 'ComplementaryKmers')
+REPEAT_COLUMNS = ('Kmer', 'Count', 'ScaffoldCount', 'StapleCount')
+
+
+def PackKmers(sequences, k):
+    """
+    Returns every k-mer of a list of sequences packed 2 bits per base
+    (uint64, first base in the highest bits), the packed reverse complement
+    of every k-mer, and the sequence and offset it starts at. k-mers
+    crossing into the next sequence or containing other letters than
+    A, C, G and T are left out.
+    """
+
+    if not 1 <= k <= MAX_K:
+        raise ValueError("k-mer length must be between 1 and " + str(MAX_K) + ", got " + str(k))
+
+    lengths = np.fromiter((len(sequence) for sequence in sequences), dtype=np.int64, count=len(sequences))
+    codes = BASE_CODE[np.frombuffer(''.join(sequences).encode('ascii'), dtype=np.uint8)]
+    numWindows = max(len(codes) - k + 1, 0)
+
+    invalid = codes == 255
+    codes = np.where(invalid, 0, codes).astype(np.uint64)
+    complement = np.uint64(3) - codes
+
+    # Shift in one base of every window at a time, the reverse complement from the other end
+    kmers = np.zeros(numWindows, dtype=np.uint64)
+    reverse = np.zeros(numWindows, dtype=np.uint64)
+    for j in range(k):
+        kmers = (kmers << np.uint64(2)) | codes[j:j + numWindows]
+        reverse = (reverse << np.uint64(2)) | complement[k - 1 - j:k - 1 - j + numWindows]
+
+    owner = np.repeat(np.arange(len(sequences)), lengths)
+    offset = np.arange(len(codes)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    invalidCount = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum(invalid, out=invalidCount[1:])
+    valid = ((owner[:numWindows] == owner[k - 1:k - 1 + numWindows]) &
+             (invalidCount[k:k + numWindows] == invalidCount[:numWindows]))
+
+    return kmers[valid], reverse[valid], owner[:numWindows][valid], offset[:numWindows][valid]
+
+
+def KmerText(kmers, k):
+    """
+    Returns packed k-mers as list of str.
+    """
+
+    shifts = np.arange(2 * (k - 1), -1, -2, dtype=np.uint64)
+    codes = (np.asarray(kmers, dtype=np.uint64)[:, None] >> shifts) & np.uint64(3)
+    letters = np.frombuffer(BASES, dtype=np.uint8)[codes.astype(np.int64)]
+
+    return [row.tobytes().decode('ascii') for row in letters]
+
+
+def CountIn(sortedKeys, queries):
+    """
+    Returns number of occurrences of every query in sorted keys, and the
+    first position of each.
+    """
+
+    first = np.searchsorted(sortedKeys, queries, side='left')
+    return np.searchsorted(sortedKeys, queries, side='right') - first, first
+
+
+class KmerIndex:
+    """
+    Sorted index of the packed k-mers of all scaffolds and staples of a
+    design. Lookups are binary searches over the sorted keys, so building
+    the index and every report is O(n log n) in the number of letters.
+    Keys are k-mer << 32 | sequence number, sorted by k-mer and then by
+    sequence, so occurrences in a single sequence can be counted as well.
+    """
+
+    def __init__(self, scaffolds, staples, k=DEFAULT_K):
+        self.k = k
+        self.numScaffolds = len(scaffolds)
+        self.numStaples = len(staples)
+
+        kmers, reverse, owner, offset = PackKmers(list(scaffolds) + list(staples), k)
+        self.kmers, self.reverse, self.owner, self.offset = kmers, reverse, owner, offset
+        self.kind = np.where(owner < self.numScaffolds, SCAFFOLD, STAPLE)
+
+        # Staples are numbered from 0 in their own keys
+        self.stapleNumber = owner - self.numScaffolds
+
+        scaffoldKmers = kmers[self.kind == SCAFFOLD]
+        self.scaffoldKeys = np.sort(scaffoldKmers)
+
+        staple = self.kind == STAPLE
+        stapleKeys = self.Key(kmers[staple], self.stapleNumber[staple])
+        order = np.argsort(stapleKeys, kind='stable')
+        self.stapleKeys = stapleKeys[order]
+        self.stapleKmers = self.stapleKeys >> np.uint64(32)
+        self.stapleOffsets = offset[staple][order]
+
+    @staticmethod
+    def Key(kmers, owner):
+        """
+        Returns k-mer << 32 | owner keys.
+        """
+
+        return (kmers << np.uint64(32)) | owner.astype(np.uint64)
+
+    def StapleWindows(self):
+        """
+        Returns k-mers, reverse complements, staple numbers and offsets of all
+        staple windows.
+        """
+
+        staple = self.kind == STAPLE
+        return self.kmers[staple], self.reverse[staple], self.stapleNumber[staple], self.offset[staple]
+
+
+def OffTargetMatches(index):
+    """
+    Returns per staple columns: number of k-mers, number of k-mers whose
+    reverse complement occurs more than once in the scaffolds (binding sites
+    besides the intended one), the most scaffold sites of any k-mer, number
+    of k-mers whose reverse complement occurs in another staple and the
+    lowest numbered such partner staple (-1 if none).
+    """
+
+    kmers, reverse, staple, _ = index.StapleWindows()
+    numStaples = index.numStaples
+
+    scaffoldSites, _ = CountIn(index.scaffoldKeys, reverse)
+
+    # Occurrences in all staples minus those in the staple itself
+    allStaples, first = CountIn(index.stapleKmers, reverse)
+    ownStaple, _ = CountIn(index.stapleKeys, index.Key(reverse, staple))
+    otherStaples = allStaples - ownStaple
+
+    # Staples of a k-mer are sorted, the lowest other one is at either end of its range
+    partner = np.full(len(kmers), numStaples, dtype=np.int64)
+    has = otherStaples > 0
+    if has.any():
+        owners = (index.stapleKeys & np.uint64(0xFFFFFFFF)).astype(np.int64)
+        lowest = owners[first[has]]
+        following = owners[np.minimum(first[has] + ownStaple[has], len(owners) - 1)]
+        partner[has] = np.where(lowest != staple[has], lowest, following)
+
+    partnerStaple = np.full(numStaples, numStaples, dtype=np.int64)
+    np.minimum.at(partnerStaple, staple, partner)
+    partnerStaple[partnerStaple == numStaples] = -1
+
+    maxSites = np.zeros(numStaples, dtype=np.int64)
+    np.maximum.at(maxSites, staple, scaffoldSites)
+
+    return {
+        'Kmers': np.bincount(staple, minlength=numStaples),
+        'OffTargetKmers': np.bincount(staple[scaffoldSites > 1], minlength=numStaples),
+        'MaxScaffoldSites': maxSites,
+        'StapleMatchKmers': np.bincount(staple[has], minlength=numStaples),
+        'PartnerStaple': partnerStaple,
+    }
+
+
+def HairpinStems(index, minLoop=MIN_HAIRPIN_LOOP):
+    """
+    Returns number of hairpin stems of every staple and the length of the
+    longest: a k-mer followed, at least minLoop bases later, by its reverse
+    complement in the same staple. Overlapping k-mer pairs on the same
+    stem are counted once, the stem length includes them all.
+    """
+
+    k = index.k
+    _, reverse, staple, offset = index.StapleWindows()
+    numStaples = index.numStaples
+
+    count, first = CountIn(index.stapleKeys, index.Key(reverse, staple))
+
+    # Every pair of a k-mer and a reverse complement in the same staple
+    pairs = np.repeat(np.arange(len(staple)), count)
+    matches = np.arange(len(pairs)) - np.repeat(np.cumsum(count) - count, count) + np.repeat(first, count)
+    a, b = offset[pairs], index.stapleOffsets[matches]
+    stem = b >= a + k + minLoop
+    owner, a, b = staple[pairs][stem], a[stem], b[stem]
+
+    # Pairs of one stem share a + b and have consecutive a
+    order = np.lexsort((a, a + b, owner))
+    owner, a, b = owner[order], a[order], b[order]
+    starts = np.ones(len(owner), dtype=bool)
+    starts[1:] = (owner[1:] != owner[:-1]) | (a[1:] + b[1:] != a[:-1] + b[:-1]) | (a[1:] != a[:-1] + 1)
+
+    startIndex = np.flatnonzero(starts)
+    runs = np.diff(np.append(startIndex, len(owner)))
+
+    longest = np.zeros(numStaples, dtype=np.int64)
+    np.maximum.at(longest, owner[startIndex], k + runs - 1)
+
+    return {
+        'HairpinStems': np.bincount(owner[startIndex], minlength=numStaples),
+        'LongestStem': longest,
+    }
+
+
+def ScaffoldOverlaps(index):
+    """
+    Returns one row per pair of scaffolds (including a scaffold with itself
+    for complementary k-mers): number of distinct k-mers they share and
+    number of k-mers of the first whose reverse complement is in the second.
+    Scaffold 0 is the main scaffold, the others are the secondary ones.
+    """
+
+    distinct = []
+    complementary = []
+    for i in range(index.numScaffolds):
+        mine = index.owner == i
+        distinct.append(np.unique(index.kmers[mine]))
+        complementary.append(np.unique(index.reverse[mine]))
+
+    rows = {column: [] for column in SCAFFOLD_COLUMNS}
+    for i in range(index.numScaffolds):
+        for j in range(i, index.numScaffolds):
+            rows['ScaffoldA'].append(i)
+            rows['ScaffoldB'].append(j)
+            rows['SharedKmers'].append(0 if i == j else
+                                       len(np.intersect1d(distinct[i], distinct[j], assume_unique=True)))
+            rows['ComplementaryKmers'].append(
+                len(np.intersect1d(distinct[i], complementary[j], assume_unique=True)))
+
+    return {column: np.array(values, dtype=np.int64) for column, values in rows.items()}
+
+
+def RepeatedKmers(index, threshold=REPEAT_THRESHOLD):
+    """
+    Returns k-mers occurring at least threshold times over all scaffolds and
+    staples, most frequent first, with their count in each.
+    """
+
+    order = np.argsort(index.kmers, kind='stable')
+    kmers, kind = index.kmers[order], index.kind[order]
+
+    unique, first, count = np.unique(kmers, return_index=True, return_counts=True)
+    repeated = count >= threshold
+    scaffoldCount = np.add.reduceat((kind == SCAFFOLD).astype(np.int64), first) if len(first) else first
+
+    order = np.lexsort((unique[repeated], -count[repeated]))
+    return {
+        'Kmer': np.array(KmerText(unique[repeated][order], index.k), dtype=object),
+        'Count': count[repeated][order],
+        'ScaffoldCount': scaffoldCount[repeated][order],
+        'StapleCount': (count - scaffoldCount)[repeated][order],
+    }
+
+
+def KmerReport(result, k=DEFAULT_K, repeatThreshold=REPEAT_THRESHOLD, minLoop=MIN_HAIRPIN_LOOP):
+    """
+    Builds the k-mer index of the scaffolds and staples of a DesignResult.
+    Returns dict of the staple, scaffold and repeat tables, each a dict of
+    column arrays (see STAPLE_COLUMNS, SCAFFOLD_COLUMNS, REPEAT_COLUMNS).
+    """
+
+    index = KmerIndex([strand.sequence for strand in result.scaffoldSequence],
+                      [strand.sequence for strand in result.stapleSequence], k)
+
+    staples = {'Staple': np.arange(index.numStaples)}
+    staples.update(OffTargetMatches(index))
+    staples.update(HairpinStems(index, minLoop))
+
+    return {
+        'staples': {column: staples[column] for column in STAPLE_COLUMNS},
+        'scaffolds': ScaffoldOverlaps(index),
+        'repeats': RepeatedKmers(index, repeatThreshold),
+    }
+
+
+def LogKmerReport(report, k):
+    """
+    Logs a summary of a k-mer report.
+    """
+
+    staples = report['staples']
+    scaffolds = report['scaffolds']
+    others = scaffolds['ScaffoldA'] != scaffolds['ScaffoldB']
+
+    logger.info(str(k) + "-mers: " + str(int(np.count_nonzero(staples['OffTargetKmers']))) +
+                " staples with off-target scaffold sites, " +
+                str(int(np.count_nonzero(staples['StapleMatchKmers']))) + " complementary to another staple, " +
+                str(int(np.count_nonzero(staples['HairpinStems']))) + " with hairpin stems, " +
+                str(len(report['repeats']['Kmer'])) + " repeated k-mers")
+    if others.any():
+        logger.info(str(k) + "-mers shared between scaffolds: " + str(int(scaffolds['SharedKmers'][others].sum())) +
+                    ", complementary: " + str(int(scaffolds['ComplementaryKmers'][others].sum())))
+
+
+def WriteTableCsv(table, fileName):
+    """
+    Writes a dict of column arrays as csv table.
+    """
+
+    columns = list(table)
+    rows = [table[column].tolist() for column in columns]
+
+    with open(fileName, 'w') as file:
+        file.write(",".join(columns) + "\n")
+        file.writelines(",".join(map(str, row)) + "\n" for row in zip(*rows))
+
+
+def WriteKmerReport(report, outputDirectory, name):
+    """
+    Writes the tables of a k-mer report as kmer_<table>_<name>.csv into
+    outputDirectory. Returns the file names.
+    """
+
+    fileNames = []
+    for table in ('staples', 'scaffolds', 'repeats'):
+        fileName = os.path.join(outputDirectory, "kmer_" + table + "_" + name + ".csv")
+        WriteTableCsv(report[table], fileName)
+        fileNames.append(fileName)
+
+    return fileNames
@@ -0,0 +1,309 @@
+import numpy as np
+
+
+# Complement of every ascii code, X (skip) stays X, everything else maps to 0
+COMPLEMENT = np.zeros(256, dtype=np.uint8)
+for base, complement in zip(b"ACGTX", b"TGCAX"):
+    COMPLEMENT[base] = complement
+
+
+class LatticeError(ValueError):
+    """
+    Raised when the arrays of a compact lattice are inconsistent.
+    """
+
+
+def FlatPointers(strand):
+    """
+    Returns next and previous base of every base of a compact strand array as
+    flat indices (helix * lengthStrands + index), -1 if there is none.
+    """
+
+    numStrands, lengthStrands = strand.shape[:2]
+    flat = strand.reshape(-1, 4).astype(np.int64)
+
+    prev = np.where(flat[:, 0] >= 0, flat[:, 0] * lengthStrands + flat[:, 1], -1)
+    next = np.where(flat[:, 2] >= 0, flat[:, 2] * lengthStrands + flat[:, 3], -1)
+
+    return next, prev
+
+
+def NonEmpty(strand):
+    """
+    Returns flat mask of bases that are part of a strand.
+    """
+
+    return (strand.reshape(-1, 4) != -1).any(axis=1)
+
+
+def RankBases(prev, nonEmpty):
+    """
+    Finds the 5' end and the distance to it of every base, by pointer jumping
+    over the previous base pointers, in O(log(length)) vectorized steps.
+    Returns root and distance, root is -1 for empty bases and bases of
+    circular strands.
+    """
+
+    index = np.arange(len(prev))
+    jump = np.where(prev >= 0, prev, index)
+    distance = (prev >= 0).astype(np.int64)
+
+    # Doubling the jump length, strands can't be longer than all bases
+    for _ in range(max(int(len(prev)).bit_length(), 1) + 1):
+        nextJump = jump[jump]
+        if np.array_equal(nextJump, jump):
+            break
+        distance = distance + distance[jump]
+        jump = nextJump
+
+    # Only bases reaching a 5' end belong to a linear strand
+    isRoot = nonEmpty & (prev < 0)
+    root = np.where(nonEmpty & isRoot[jump] & (jump[jump] == jump), jump, -1)
+
+    return root, distance
+
+
+def StrandPaths(strand, startBases):
+    """
+    Returns the bases of the strands starting at startBases as flat indices in
+    5' to 3' order, all strands concatenated in the order of startBases, and
+    the bounds of every strand in that array (length number of strands + 1).
+    """
+
+    lengthStrands = strand.shape[1]
+    next, prev = FlatPointers(strand)
+    root, distance = RankBases(prev, NonEmpty(strand))
+
+    # Position in startBases of every 5' end
+    strandOfRoot = np.full(len(prev), -1, dtype=np.int64)
+    starts = np.array([[base[0], base[1]] for base in startBases], dtype=np.int64).reshape(-1, 2)
+    strandOfRoot[starts[:, 0] * lengthStrands + starts[:, 1]] = np.arange(len(starts))
+
+    bases = np.flatnonzero(root >= 0)
+    strandOfBase = strandOfRoot[root[bases]]
+    bases = bases[strandOfBase >= 0]
+    strandOfBase = strandOfBase[strandOfBase >= 0]
+
+    # Sort by strand, then by distance to the 5' end
+    order = np.lexsort((distance[bases], strandOfBase))
+    cells = bases[order]
+
+    bounds = np.zeros(len(starts) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(strandOfBase, minlength=len(starts)), out=bounds[1:])
+
+    return cells, bounds
+
+
+def StrandStarts(strand):
+    """
+    Returns the start bases (5' ends) of all linear strands of a compact
+    strand array as (n, 2) array, in the order FindStrands finds them: by
+    the first base of every strand when scanning helix by helix. Also
+    returns the first base of every circular strand, in the same order.
+    """
+
+    lengthStrands = strand.shape[1]
+    _, prev = FlatPointers(strand)
+    nonEmpty = NonEmpty(strand)
+    root, _ = RankBases(prev, nonEmpty)
+
+    # First base of every strand in scan order, found at its 5' end
+    bases = np.flatnonzero(root >= 0)
+    first = np.full(len(prev), len(prev), dtype=np.int64)
+    np.minimum.at(first, root[bases], bases)
+
+    roots = np.flatnonzero(first < len(prev))
+    roots = roots[np.argsort(first[roots], kind='stable')]
+
+    # Bases of circular strands, labelled with the lowest base of their
+    # strand by pointer jumping around the circle
+    circular = np.flatnonzero(nonEmpty & (root < 0))
+    if len(circular) > 0:
+        position = np.full(len(prev), -1, dtype=np.int64)
+        position[circular] = np.arange(len(circular))
+        jump = position[prev[circular]]
+        label = circular.copy()
+        for _ in range(max(len(circular).bit_length(), 1) + 1):
+            label = np.minimum(label, label[jump])
+            jump = jump[jump]
+        circular = np.unique(label)
+
+    return (np.stack([roots // lengthStrands, roots % lengthStrands], axis=1),
+            np.stack([circular // lengthStrands, circular % lengthStrands], axis=1))
+
+
+def BaseCounts(cells, skip, loop):
+    """
+    Returns number of letters of every base: 0 for a skip (-1), 1 + loop
+    otherwise. Raises LatticeError for any other skip value.
+    """
+
+    skipCells = skip.reshape(-1)[cells]
+    loopCells = loop.reshape(-1)[cells].astype(np.int64)
+
+    if np.any((skipCells != 0) & (skipCells != -1)):
+        raise LatticeError("There is a skip and loop in the same index!\n"
+                           "Not a valid skip/loop array in json file!")
+
+    return np.where(skipCells == -1, 0, 1 + np.maximum(loopCells, 0))
+
+
+def LetterPrefixSums(skip, loop):
+    """
+    Returns (numStrands, lengthStrands + 1) array with the number of letters
+    of every helix up to (not including) every index: skips (-1) have no
+    letter, other bases 1 + loop. Letters of index range [a, b] of helix h are
+    prefix[h, b + 1] - prefix[h, a].
+    """
+
+    letters = np.where(skip == -1, 0, 1 + np.maximum(loop.astype(np.int64), 0))
+    letters[(skip != 0) & (skip != -1)] = 0
+
+    prefix = np.zeros((letters.shape[0], letters.shape[1] + 1), dtype=np.int64)
+    np.cumsum(letters, axis=1, out=prefix[:, 1:])
+
+    return prefix
+
+
+class ScaffoldLetterLattice:
+    """
+    Scaffold letters of every base of a design, stored as uint8 ascii codes in
+    a single buffer. offset and count give for every base (flat index) where
+    its letters start in the buffer and how many there are (0 for a skip,
+    1 + loop for loops). offset is -1 for bases without scaffold.
+    The buffer ends with a T, the complement of the A assigned to staple bases
+    without scaffold. cells, bounds and counts hold the scaffold bases in path
+    order (see StrandPaths) and their number of letters, the letters of
+    scaffold i are buffer[sequenceStart[i]:sequenceStart[i + 1]]. The paths
+    can be passed if already known.
+    """
+
+    def __init__(self, scaffolds, skip, loop, scaffoldStartBases, sequences, paths=None):
+        if paths is None:
+            paths = StrandPaths(scaffolds, scaffoldStartBases)
+        cells, bounds = paths
+        counts = BaseCounts(cells, skip, loop)
+
+        # Letters used by every scaffold, each scaffold uses the start of its sequence
+        starts = np.concatenate(([0], np.cumsum(counts)))
+        used = starts[bounds[1:]] - starts[bounds[:-1]]
+        for i, sequence in enumerate(sequences):
+            if used[i] > len(sequence):
+                raise LatticeError("Scaffold sequence given is not long enough.\nScaffold input length: "
+                                   + str(len(sequence)) + "\nScaffold in json: " + str(used[i]))
+
+        self.buffer = np.frombuffer(
+            b''.join(sequence[:used[i]].encode('ascii') for i, sequence in enumerate(sequences)) + b'T',
+            dtype=np.uint8)
+
+        size = scaffolds.shape[0] * scaffolds.shape[1]
+        self.offset = np.full(size, -1, dtype=np.int64)
+        self.count = np.zeros(size, dtype=np.int64)
+        self.offset[cells] = starts[:-1]
+        self.count[cells] = counts
+
+        self.cells = cells
+        self.bounds = bounds
+        self.counts = counts
+        self.sequenceStart = starts[bounds]
+
+    def StapleLetterIndex(self, cells):
+        """
+        Returns for every staple letter opposite to the given bases the index
+        of its scaffold letter in the buffer, each base taking the letters of
+        its scaffold base from last to first, and the number of letters of
+        every base.
+        """
+
+        offset = self.offset[cells]
+        count = self.count[cells]
+
+        # Bases without scaffold get the T at the end of the buffer
+        unpaired = offset < 0
+        offset = np.where(unpaired, len(self.buffer) - 1, offset)
+        count = np.where(unpaired, 1, count)
+
+        # Gather letters of every base from last to first
+        total = int(count.sum())
+        baseStart = np.cumsum(count) - count
+        index = np.repeat(offset + count - 1, count) - (np.arange(total) - np.repeat(baseStart, count))
+
+        return index, count
+
+    def StapleLetters(self, cells):
+        """
+        Returns the staple letters opposite to the given bases, each base the
+        reverse complement of its scaffold letters ('A' without scaffold), and
+        the number of letters of every base.
+        """
+
+        index, count = self.StapleLetterIndex(cells)
+
+        return COMPLEMENT[self.buffer[index]], count
+
+
+class LookUpTable:
+    """
+    Look up table of a compact design: the letters of every base as offset
+    into text and count, instead of a string per base. Indexing a helix
+    returns its row as in the list look up table of seq_designer, the
+    letters of every base, 'X' for skips and '' for empty bases. Rows are
+    only built when indexed, i.e. by the visualizer.
+    """
+
+    def __init__(self, numStrands, lengthStrands, text='', offset=None, count=None):
+        size = numStrands * lengthStrands
+        self.lengthStrands = lengthStrands
+        self.text = text
+        self.offset = np.full(size, -1, dtype=np.int64) if offset is None else offset
+        self.count = np.zeros(size, dtype=np.int64) if count is None else count
+
+    def Fill(self, cells, text, counts):
+        """
+        Sets the letters of the given bases (flat indices), text holds the
+        letters of all of them in order and counts their number per base.
+        """
+
+        counts = np.asarray(counts, dtype=np.int64)
+        self.offset[cells] = len(self.text) + np.cumsum(counts) - counts
+        self.count[cells] = counts
+        self.text += text
+
+    def __len__(self):
+        return len(self.offset) // self.lengthStrands
+
+    def __getitem__(self, helix):
+        start = helix * self.lengthStrands
+        offset = self.offset[start:start + self.lengthStrands].tolist()
+        count = self.count[start:start + self.lengthStrands].tolist()
+        text = self.text
+
+        return [(text[o:o + c] or 'X') if o >= 0 else '' for o, c in zip(offset, count)]
+
+
+def ScaffoldLookUpTable(letterLattice, numStrands, lengthStrands):
+    """
+    Returns the LookUpTable of the scaffold letters of a ScaffoldLetterLattice,
+    sharing its offsets.
+    """
+
+    text = letterLattice.buffer[:-1].tobytes().decode('ascii')
+
+    return LookUpTable(numStrands, lengthStrands, text, letterLattice.offset, letterLattice.count)
+
+
+def StapleSequenceBytes(staples, stapleStartBases, letterLattice):
+    """
+    Returns the sequence of every staple as bytes (skips left out), together
+    with the bases of all staples (see StrandPaths), their bounds, the staple
+    letters of all bases and the number of letters of every base.
+    """
+
+    cells, bounds = StrandPaths(staples, stapleStartBases)
+    letters, count = letterLattice.StapleLetters(cells)
+
+    letterBounds = np.concatenate(([0], np.cumsum(count)))[bounds]
+    data = letters.tobytes()
+    sequences = [data[letterBounds[i]:letterBounds[i + 1]] for i in range(len(bounds) - 1)]
+
+    return sequences, cells, bounds, letters, count
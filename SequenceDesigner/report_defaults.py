@@ -0,0 +1,16 @@
+from collections import namedtuple
+
+
+# Defaults of the optional reports, kept free of NumPy so the command line is
+# parsed without importing it (see kmer_index and thermodynamics)
+
+# Default k-mer length of the report
+DEFAULT_K = 8
+
+# Buffer and strand concentrations in mol/l, temperature of the free energies in °C.
+# The default is a typical folding buffer with 12.5 mM MgCl2 and 100 nM of every staple.
+Conditions = namedtuple('Conditions', ['sodium', 'magnesium', 'concentration', 'temperature'],
+                        defaults=(0.0, 0.0125, 100e-9, 37.0))
+
+# Staples without a binding domain melting at this temperature (°C) or higher have a weak anchor
+MIN_ANCHOR_TM = 45.0
@@ -0,0 +1,227 @@
+import os
+import tempfile
+import numpy as np
+from design_cache import MemoryMapNpz
+from domains import Domain, Strand
+
+
+# Version of the bundle layout, increase when the stored arrays change
+BUNDLE_VERSION = 1
+
+BASES = b"ACGT"
+
+# 2-bit code of every ascii code, 255 for letters that can't be packed
+BASE_CODE = np.full(256, 255, dtype=np.uint8)
+for code, base in enumerate(BASES):
+    BASE_CODE[base] = code
+
+KINDS = ('scaffolds', 'staples')
+
+# Lattice of the design stored with compact results, for incremental runs (see incremental)
+DESIGN_ARRAYS = ('designScaffolds', 'designStaples', 'designSkip', 'designLoop',
+                 'designScaffoldStartBases', 'scaffoldKey')
+
+
+def PackSequence(letters):
+    """
+    Packs ascii letters (bytes or uint8 array) into 2 bits per base, 4 bases
+    per byte with the first base in the highest bits. Raises ValueError for
+    letters other than A, C, G and T.
+    """
+
+    codes = BASE_CODE[np.frombuffer(bytes(letters), dtype=np.uint8)]
+    if np.any(codes == 255):
+        invalid = bytes(letters)[int(np.argmax(codes == 255))]
+        raise ValueError(chr(invalid) + " is not a valid base")
+
+    padded = np.zeros(-(-len(codes) // 4) * 4, dtype=np.uint8)
+    padded[:len(codes)] = codes
+    padded = padded.reshape(-1, 4)
+
+    return (padded[:, 0] << 6) | (padded[:, 1] << 4) | (padded[:, 2] << 2) | padded[:, 3]
+
+
+def UnpackSequence(packed, start, stop):
+    """
+    Returns letters start up to stop of a packed sequence as str.
+    """
+
+    first, last = start // 4, -(-stop // 4)
+    block = np.asarray(packed[first:last])
+    codes = np.stack([block >> 6, (block >> 4) & 3, (block >> 2) & 3, block & 3], axis=1).reshape(-1)
+    codes = codes[start - first * 4:stop - first * 4]
+
+    return np.frombuffer(BASES, dtype=np.uint8)[codes].tobytes().decode('ascii')
+
+
+def StrandArrays(kind, strands):
+    """
+    Returns the bundle arrays of a list of Strands: domain table (strand,
+    helix, start, end, direction per domain), domain and letter bounds of
+    every strand, letter offset of every domain, start/end coordinates and
+    packed sequences.
+    """
+
+    domainTable = np.array([(i, domain.helix, domain.start, domain.end, domain.direction)
+                            for i, strand in enumerate(strands) for domain in strand.domains],
+                           dtype=np.int32).reshape(-1, 5)
+
+    domainCounts = [len(strand.domains) for strand in strands]
+    domainBounds = np.zeros(len(strands) + 1, dtype=np.int64)
+    np.cumsum(domainCounts, out=domainBounds[1:])
+
+    domainLengths = [len(domain.sequence) for strand in strands for domain in strand.domains]
+    domainOffsets = np.zeros(len(domainLengths) + 1, dtype=np.int64)
+    np.cumsum(domainLengths, out=domainOffsets[1:])
+
+    letterBounds = domainOffsets[domainBounds]
+
+    coordinates = np.array([strand.startBase + strand.endBase for strand in strands],
+                           dtype=np.int32).reshape(-1, 4)
+
+    packed = PackSequence(''.join(strand.sequence for strand in strands).encode('ascii'))
+
+    return {
+        kind + 'Domains': domainTable,
+        kind + 'DomainBounds': domainBounds,
+        kind + 'DomainOffsets': domainOffsets,
+        kind + 'LetterBounds': letterBounds,
+        kind + 'Coordinates': coordinates,
+        kind + 'Packed': packed,
+    }
+
+
+def WriteBundle(result, path):
+    """
+    Writes the scaffolds and staples of a DesignResult to an uncompressed
+    .npz bundle at path, which can be memory mapped by LoadBundle. The
+    lattice of compact designs (result.design) is stored as well.
+    """
+
+    arrays = {
+        'version': np.array([BUNDLE_VERSION], dtype=np.int32),
+        'shape': np.array([result.numStrands, result.lengthStrands], dtype=np.int64),
+    }
+    arrays.update(StrandArrays('scaffolds', result.scaffoldSequence))
+    arrays.update(StrandArrays('staples', result.stapleSequence))
+    if result.design is not None:
+        arrays.update({name: np.asarray(result.design[name]) for name in DESIGN_ARRAYS})
+
+    directory = os.path.dirname(path) or '.'
+    fd, temporaryPath = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(temporaryPath, path)
+    except BaseException:
+        os.unlink(temporaryPath)
+        raise
+
+
+class ResultBundle:
+    """
+    Memory mapped result bundle written by WriteBundle. Arrays are available
+    as attributes, i.e. staplesCoordinates holds (start helix, start index,
+    end helix, end index) of every staple and staplesDomains the domain table.
+    Sequences are unpacked on request.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.arrays = MemoryMapNpz(path)
+
+        if int(self.arrays['version'][0]) != BUNDLE_VERSION:
+            raise ValueError(path + " has bundle version " + str(int(self.arrays['version'][0])) +
+                             ", expected " + str(BUNDLE_VERSION))
+
+        self.numStrands, self.lengthStrands = (int(x) for x in self.arrays['shape'])
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['arrays'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def Count(self, kind):
+        """
+        Returns number of scaffolds or staples (kind).
+        """
+
+        return len(self.arrays[kind + 'Coordinates'])
+
+    def Sequence(self, kind, i):
+        """
+        Returns sequence of scaffold or staple i.
+        """
+
+        bounds = self.arrays[kind + 'LetterBounds']
+        return UnpackSequence(self.arrays[kind + 'Packed'], int(bounds[i]), int(bounds[i + 1]))
+
+    def Sequences(self, kind):
+        """
+        Returns sequences of all scaffolds or staples.
+        """
+
+        bounds = self.arrays[kind + 'LetterBounds']
+        letters = UnpackSequence(self.arrays[kind + 'Packed'], 0, int(bounds[-1]))
+        bounds = bounds.tolist()
+
+        return [letters[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+    def HasDesign(self):
+        """
+        Returns whether the lattice of the design is stored in the bundle.
+        """
+
+        return all(name in self.arrays for name in DESIGN_ARRAYS)
+
+    def Strands(self, kind, indices=None):
+        """
+        Returns scaffolds or staples (all, or those at indices) as Strands,
+        unpacking all letters at once.
+        """
+
+        domainBounds = self.arrays[kind + 'DomainBounds'].tolist()
+        offsets = self.arrays[kind + 'DomainOffsets'].tolist()
+        table = self.arrays[kind + 'Domains'].tolist()
+        letters = UnpackSequence(self.arrays[kind + 'Packed'], 0, offsets[-1])
+
+        if indices is None:
+            indices = range(len(domainBounds) - 1)
+
+        strands = []
+        for i in indices:
+            first, stop = domainBounds[i], domainBounds[i + 1]
+            domains = [Domain(helix, start, end, direction, letters[offsets[j]:offsets[j + 1]])
+                       for j, (_, helix, start, end, direction) in zip(range(first, stop), table[first:stop])]
+            strands.append(Strand(domains, letters[offsets[first]:offsets[stop]]))
+
+        return strands
+
+    def Strand(self, kind, i):
+        """
+        Returns scaffold or staple i as Strand.
+        """
+
+        domainBounds = self.arrays[kind + 'DomainBounds']
+        first, stop = int(domainBounds[i]), int(domainBounds[i + 1])
+        offsets = self.arrays[kind + 'DomainOffsets']
+
+        letterStart = int(offsets[first])
+        letters = UnpackSequence(self.arrays[kind + 'Packed'], letterStart, int(offsets[stop]))
+
+        domains = []
+        for j in range(first, stop):
+            _, helix, start, end, direction = (int(x) for x in self.arrays[kind + 'Domains'][j])
+            domains.append(Domain(helix, start, end, direction,
+                                  letters[int(offsets[j]) - letterStart:int(offsets[j + 1]) - letterStart]))
+
+        return Strand(domains, letters)
+
+
+def LoadBundle(path):
+    """
+    Opens a result bundle, see ResultBundle.
+    """
+
+    return ResultBundle(path)
@@ -0,0 +1,157 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from lattice import COMPLEMENT, StrandPaths
+from seq_stats import run_lengths
+
+
+# Staples with a GC fraction outside this range are penalized
+GC_RANGE = (0.4, 0.6)
+
+# Penalty per 1.0 GC fraction outside GC_RANGE, i.e. 1 per 0.01
+GC_WEIGHT = 100
+
+# Homopolymers longer than this are penalized by 1 per extra base
+MAX_HOMOPOLYMER = 4
+
+# Letters scored per vectorized step, offsets are scored in chunks of this size
+CHUNK_LETTERS = 1 << 22
+
+
+class RotationIndex:
+    """
+    Position of every staple letter in the scaffold sequence it pairs with,
+    so staples can be scored for any circular offset of that sequence with
+    a single gather. position is -1 for letters that don't pair with the
+    rotated scaffold (other scaffolds or unpaired bases), those keep the
+    letter in fixed. bounds gives the letters of every staple.
+    """
+
+    def __init__(self, letterLattice, staples, stapleStartBases, scaffoldIndex):
+        cells, bounds = StrandPaths(staples, stapleStartBases)
+        index, count = letterLattice.StapleLetterIndex(cells)
+
+        first = letterLattice.sequenceStart[scaffoldIndex]
+        stop = letterLattice.sequenceStart[scaffoldIndex + 1]
+        rotated = (index >= first) & (index < stop)
+
+        self.position = np.where(rotated, index - first, -1)
+        self.fixed = COMPLEMENT[letterLattice.buffer[index]]
+
+        letterBounds = np.zeros(len(count) + 1, dtype=np.int64)
+        np.cumsum(count, out=letterBounds[1:])
+        self.bounds = letterBounds[bounds]
+
+    def Letters(self, sequence, offsets):
+        """
+        Returns (len(offsets), number of letters) array with the staple letters
+        for the scaffold sequence (uint8 array) rotated by every offset, the
+        rotated sequence starting at sequence[offset].
+        """
+
+        letters = np.repeat(self.fixed[None, :], len(offsets), axis=0)
+        rotated = np.flatnonzero(self.position >= 0)
+        positions = (self.position[rotated][None, :] + np.asarray(offsets)[:, None]) % len(sequence)
+        letters[:, rotated] = COMPLEMENT[sequence[positions]]
+
+        return letters
+
+
+def StapleScores(letters, bounds):
+    """
+    Returns GC and homopolymer penalty of every row of staple letters, see
+    GC_RANGE and MAX_HOMOPOLYMER. bounds gives the letters of every staple.
+    """
+
+    starts, ends = bounds[:-1], bounds[1:]
+    lengths = ends - starts
+
+    # GC count of every staple from cumulative sums
+    isGC = (letters == ord('G')) | (letters == ord('C'))
+    gcCount = np.zeros((len(letters), letters.shape[1] + 1), dtype=np.int64)
+    np.cumsum(isGC, axis=1, out=gcCount[:, 1:])
+    gc = (gcCount[:, ends] - gcCount[:, starts]) / np.maximum(lengths, 1)
+    gcPenalty = np.maximum(GC_RANGE[0] - gc, 0) + np.maximum(gc - GC_RANGE[1], 0)
+
+    # Equal neighbours within a staple, a run of k equal pairs is a homopolymer of k + 1
+    same = letters[:, 1:] == letters[:, :-1]
+    same[:, starts[1:][starts[1:] > 0] - 1] = False
+    runs = np.zeros((len(letters), letters.shape[1]), dtype=np.int64)
+    runs[:, :-1] = run_lengths(same)
+
+    longest = np.maximum.reduceat(runs, np.minimum(starts, letters.shape[1] - 1), axis=1) + 1
+    longest[:, lengths == 0] = 0
+    runPenalty = np.maximum(longest - MAX_HOMOPOLYMER, 0)
+
+    return GC_WEIGHT * gcPenalty.sum(axis=1) + runPenalty.sum(axis=1)
+
+
+def ScoreOffsets(index, sequence, offsets):
+    """
+    Returns penalty of the staples for every offset of sequence, lower is
+    better.
+    """
+
+    chunk = max(1, CHUNK_LETTERS // max(len(index.fixed), 1))
+    scores = np.empty(len(offsets), dtype=np.float64)
+
+    if len(index.fixed) == 0:
+        scores[:] = 0
+        return scores
+
+    for i in range(0, len(offsets), chunk):
+        scores[i:i + chunk] = StapleScores(index.Letters(sequence, offsets[i:i + chunk]), index.bounds)
+
+    return scores
+
+
+def ReverseComplement(sequence):
+    """
+    Returns reverse complement of a sequence.
+    """
+
+    return COMPLEMENT[np.frombuffer(sequence.encode('ascii'), dtype=np.uint8)[::-1]].tobytes().decode('ascii')
+
+
+def RotateSequence(sequence, offset, reverse=False):
+    """
+    Returns the circular sequence (or its reverse complement) starting at
+    offset.
+    """
+
+    if reverse:
+        sequence = ReverseComplement(sequence)
+    return sequence[offset:] + sequence[:offset]
+
+
+def BestRotation(index, sequence, reverse=False, workers=None):
+    """
+    Scores every circular offset of the scaffold sequence, and of its reverse
+    complement if reverse is set, on worker processes (all cores if workers is
+    None). Returns best offset, whether it is reverse complemented, its score
+    and the score of the unrotated sequence.
+    """
+
+    candidates = [(False, np.frombuffer(sequence.encode('ascii'), dtype=np.uint8))]
+    if reverse:
+        candidates.append((True, np.frombuffer(ReverseComplement(sequence).encode('ascii'), dtype=np.uint8)))
+
+    workers = workers or os.cpu_count() or 1
+    offsets = np.arange(len(sequence))
+    parts = np.array_split(offsets, workers * 4) if workers > 1 else [offsets]
+
+    scores = []
+    if workers == 1:
+        for _, letters in candidates:
+            scores.append(ScoreOffsets(index, letters, offsets))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for _, letters in candidates:
+                futures = [executor.submit(ScoreOffsets, index, letters, part) for part in parts]
+                scores.append(np.concatenate([future.result() for future in futures]))
+
+    # First best offset, the unrotated sequence wins ties
+    best = min(range(len(candidates)), key=lambda i: scores[i].min())
+    offset = int(np.argmin(scores[best]))
+
+    return offset, candidates[best][0], float(scores[best][offset]), float(scores[0][0])
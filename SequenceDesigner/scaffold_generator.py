@@ -1,16 +1,30 @@
 import random
-import itertools
-from openpyxl import Workbook
-from pathlib import Path
 
+# The helpers built on seq_stats import NumPy when called, generating
+# sequences only needs the standard library
 
-def random_seq_creator(length):
+
+# Base letters as ascii codes
+A, C, G, T = (ord(base) for base in "ACGT")
+
+# Constraints of generated sequences, the longest G or C run and GC percentage
+MAX_RUN = 4
+MAX_GC = 44
+
+# Expected GC fraction, same as the weights (29, 21, 21, 29) of random_seq_creator
+GC_FRACTION = 0.42
+
+# Version of constrained_seq_creator, increase when its output for a seed changes
+GENERATOR_VERSION = 3
+
+
+def random_seq_creator(length, rng=random):
 
     bases = ["A", "C", "G", "T"]
     sequence = []
 
     for _ in range(length):
-        base = random.choices(bases, weights=(29, 21, 21, 29), k=1)
+        base = rng.choices(bases, weights=(29, 21, 21, 29), k=1)
         sequence = sequence + (base)
 
     sequence = ''.join(sequence)
@@ -19,63 +33,104 @@ def random_seq_creator(length):
 
 def consecutive_g_count(sequence):
 
-    consecutive_G = 0
+    from seq_stats import encode_sequences, longest_run
 
-    counter = ([[k, len(list(g))] for k, g in itertools.groupby(sequence)])
-    #G_counter = [char for char in counter if counter [0]=="G"]
-    for char in counter:
-        if char[0] == "G":
-            G_count = char[1]
-            if G_count >= consecutive_G:
-                consecutive_G = G_count
+    batch, _ = encode_sequences([sequence])
 
-    return consecutive_G
+    return int(longest_run(batch, "G")[0])
 
 
 def consecutive_c_count(sequence):
 
-    consecutive_C = 0
+    from seq_stats import encode_sequences, longest_run
 
-    counter = ([[k, len(list(g))] for k, g in itertools.groupby(sequence)])
-    #C_counter = [char for char in counter if counter [0]=="G"]
-    for char in counter:
-        if char[0] == "C":
-            C_count = char[1]
-            if C_count >= consecutive_C:
-                consecutive_C = C_count
+    batch, _ = encode_sequences([sequence])
 
-    return consecutive_C
+    return int(longest_run(batch, "C")[0])
 
 
 def gc_content(sequence, length):
 
-    GC_count = 0
+    import numpy as np
+    from seq_stats import encode_sequences, gc_fraction
+
+    batch, _ = encode_sequences([sequence])
+
+    # Fraction of given length, not the length of the sequence
+    GC_percentage = gc_fraction(batch, np.array([length]))[0] * 100
+
+    return float(GC_percentage)
+
+
+def binomial(rng, n, p):
+    """
+    Returns a draw of the binomial distribution, the number of successes of
+    n trials with probability p each.
+    """
+
+    return sum(rng.random() < p for _ in range(n))
+
+
+def constrained_seq_creator(length, rng=None, max_run=MAX_RUN, max_gc=MAX_GC):
+    """
+    Returns random sequence of given length without G or C runs longer than
+    max_run and with at most max_gc percent GC, satisfying both by
+    construction. rng is a random.Random instance or a seed.
+
+    The number of GC bases is drawn from the same binomial distribution as
+    random_seq_creator, conditioned on at most max_gc percent by drawing
+    again, and placed at random positions.
+    The G/C letters of those positions, read in order, are built from
+    alternating G and C runs of 1 to max_run bases, so no run in the final
+    sequence can be longer. Runs in linear time.
+    """
+
+    if not isinstance(rng, random.Random):
+        rng = random.Random(rng)
 
-    for base in sequence:
-        if base == 'G' or base == 'C':
-            GC_count = GC_count + 1
+    max_gc_count = int(length * max_gc / 100)
+    # Redraw instead of clamping, which would pile every draw above the
+    # limit onto max_gc_count. At least a third of the draws are accepted.
+    gc_count = binomial(rng, length, GC_FRACTION)
+    while gc_count > max_gc_count:
+        gc_count = binomial(rng, length, GC_FRACTION)
 
-    GC_percentage = GC_count/length * 100
+    # A or T everywhere, then overwrite the GC positions
+    sequence = bytearray(rng.choices((A, T), k=length))
+    gc_positions = sorted(rng.sample(range(length), gc_count))
 
-    return GC_percentage
+    if gc_count > 0:
+        # Run lengths 1..max_run with probabilities halving for every extra base
+        run_lengths = range(1, max_run + 1)
+        runs = rng.choices(run_lengths, weights=[0.5 ** run for run in run_lengths], k=gc_count)
 
+        # Every run is at least one base, so gc_count runs always suffice
+        letters = bytearray()
+        letter = rng.randrange(2)
+        for run in runs:
+            if len(letters) >= gc_count:
+                break
+            letters += bytes(((G, C)[letter],)) * run
+            letter ^= 1
 
-def sequence_creator(length):
+        for position, base in zip(gc_positions, letters):
+            sequence[position] = base
 
-    should_restart = True
+    return sequence.decode('ascii'), gc_count
 
-    while should_restart == True:
 
-        should_restart = False
-        sequence = random_seq_creator(length)
-        consecutive_G = consecutive_g_count(sequence)
-        consecutive_C = consecutive_c_count(sequence)
-        gc_percentage = gc_content(sequence, length)
+def sequence_creator(length, rng=random):
+    """
+    Returns random sequence of given length satisfying the MAX_RUN and MAX_GC
+    constraints and its GC percentage. The seed of the generator is drawn from
+    rng (the random module or a random.Random instance), an int seed can be
+    given as well.
+    """
 
-        if consecutive_C > 4 or consecutive_G > 4 or gc_percentage > 44:
-            should_restart = True
-            continue
+    if isinstance(rng, random.Random) or rng is random:
+        rng = rng.getrandbits(64)
 
-    #print ('Finished,', "Consecutive C = ", consecutive_C, "Consecutive G = ", consecutive_G)
+    sequence, gc_count = constrained_seq_creator(length, rng)
+    gc_percentage = gc_count/length * 100 if length > 0 else 0
 
     return sequence, gc_percentage
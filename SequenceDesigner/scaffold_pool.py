@@ -0,0 +1,199 @@
+import os
+import hashlib
+import tempfile
+from scaffold_generator import sequence_creator, GENERATOR_VERSION, MAX_RUN, MAX_GC
+from seq_stats import encode_sequences, gc_fraction, longest_runs
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Default size of the pool, 64 MB
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def DefaultCacheDirectory():
+    """
+    Returns the cache directory of the sequence designer, $SEQ_DESIGNER_CACHE
+    or ~/.cache/seq_designer.
+    """
+
+    directory = os.environ.get("SEQ_DESIGNER_CACHE")
+    if directory is None:
+        directory = os.path.join(os.path.expanduser("~"), ".cache", "seq_designer")
+    return directory
+
+
+def SatisfiesConstraints(sequence, maxRun=MAX_RUN, maxGc=MAX_GC):
+    """
+    Returns true if sequence only contains A, C, G and T, has no G or C run
+    longer than maxRun and at most maxGc percent GC.
+    """
+
+    if sequence.strip("ACGT") != "":
+        return False
+    if sequence == "":
+        return True
+
+    batch, lengths = encode_sequences([sequence])
+    runs = longest_runs(batch, "GC")[0]
+
+    return runs.max() <= maxRun and gc_fraction(batch, lengths)[0] * 100 <= maxGc
+
+
+class ScaffoldPool:
+    """
+    On disk pool of generated scaffold sequences, one file per sequence keyed
+    by length, constraints, seed and generator version. Sequences are
+    validated before they are stored.
+
+    Files are written to a temporary file and renamed, so readers never see
+    partial files and several processes can share a pool. When the pool grows
+    beyond maxBytes, the least recently used sequences are removed, under a
+    lock so only one process evicts at a time. Every pool keeps a running
+    size, from its last scan of the directory plus the sequences it stored
+    since, and only scans the directory again once that is over maxBytes.
+    Sequences stored by other processes in the meantime are counted by the
+    next scan.
+    """
+
+    def __init__(self, directory=None, maxBytes=DEFAULT_MAX_BYTES):
+        if directory is None:
+            directory = os.path.join(DefaultCacheDirectory(), "scaffolds")
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.runningBytes = None
+        os.makedirs(directory, exist_ok=True)
+
+    def Key(self, length, seed, maxRun=MAX_RUN, maxGc=MAX_GC):
+        """
+        Returns key of a sequence, a hash of everything that determines it.
+        """
+
+        name = "v{}-length{}-run{}-gc{}-seed{}".format(
+            GENERATOR_VERSION, length, maxRun, maxGc, seed)
+        return hashlib.sha256(name.encode()).hexdigest()
+
+    def Path(self, key):
+        return os.path.join(self.directory, key + ".seq")
+
+    def Get(self, length, seed):
+        """
+        Returns stored sequence, or None if it isn't in the pool.
+        """
+
+        path = self.Path(self.Key(length, seed))
+        try:
+            with open(path, 'r') as file:
+                sequence = file.read()
+            # Mark as recently used
+            os.utime(path)
+        except OSError:
+            return None
+
+        # Ignore damaged files, they are overwritten by Put
+        if len(sequence) != length:
+            return None
+
+        return sequence
+
+    def Put(self, length, seed, sequence):
+        """
+        Validates and stores sequence, then evicts old sequences if needed.
+        """
+
+        if len(sequence) != length or not SatisfiesConstraints(sequence):
+            raise ValueError("Sequence doesn't satisfy the scaffold constraints")
+
+        fd, temporaryPath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as file:
+                file.write(sequence)
+            os.replace(temporaryPath, self.Path(self.Key(length, seed)))
+        except BaseException:
+            os.unlink(temporaryPath)
+            raise
+
+        if self.runningBytes is None:
+            self.runningBytes, _ = self.Size()
+        else:
+            self.runningBytes += len(sequence)
+
+        if self.runningBytes > self.maxBytes:
+            self.Evict()
+
+    def Sequence(self, length, seed):
+        """
+        Returns sequence of given length for seed and its GC percentage, from
+        the pool if stored, otherwise generated and stored.
+        """
+
+        sequence = self.Get(length, seed)
+        if sequence is None:
+            sequence, _ = sequence_creator(length, seed)
+            self.Put(length, seed, sequence)
+
+        gcCount = sequence.count('G') + sequence.count('C')
+        gcPercentage = gcCount/length * 100 if length > 0 else 0
+
+        return sequence, gcPercentage
+
+    def Size(self):
+        """
+        Returns total size in bytes and (mtime, size, path) of all sequences.
+        """
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".seq"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        return sum(entry[1] for entry in entries), entries
+
+    def Evict(self):
+        """
+        Removes least recently used sequences until the pool is below 90% of
+        maxBytes, if it is over maxBytes. Resets the running size.
+        """
+
+        total, entries = self.Size()
+        self.runningBytes = total
+        if total <= self.maxBytes:
+            return
+
+        with open(os.path.join(self.directory, ".lock"), 'w') as lockFile:
+            if fcntl is not None:
+                fcntl.flock(lockFile, fcntl.LOCK_EX)
+
+            # Another process might have evicted while waiting for the lock
+            total, entries = self.Size()
+            for mtime, size, path in sorted(entries):
+                if total <= 0.9 * self.maxBytes:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+        self.runningBytes = total
+
+    def Clear(self):
+        """
+        Removes all sequences of the pool.
+        """
+
+        for mtime, size, path in self.Size()[1]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+        self.runningBytes = 0
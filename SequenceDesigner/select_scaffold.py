@@ -0,0 +1,257 @@
+import os
+import sys
+import logging
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from seq_designer import SequenceDesign, SequenceDesignError, RawScaffoldSequence, FindLength
+from design_cache import DesignCache
+from rotation import GC_RANGE, MAX_HOMOPOLYMER, StapleScores
+from seq_stats import encode_sequences, gc_fraction, longest_runs
+from thermodynamics import ThermoReport
+
+
+logger = logging.getLogger("seq_designer")
+
+# Columns of the comparison table
+COLUMNS = ("Rank", "Scaffold", "Length", "Status", "Warnings", "WeakAnchors", "Penalty",
+           "GCOutside", "LongHomopolymers", "LongestHomopolymer")
+
+# Design and engine of this (worker) process, set once by SetDesign
+workerState = {}
+
+
+def ScaffoldPaths(paths):
+    """
+    Returns sorted scaffold files in the given files and directories.
+    """
+
+    scaffoldPaths = []
+    for path in paths:
+        if os.path.isdir(path):
+            scaffoldPaths.extend(sorted(entry.path for entry in os.scandir(path)
+                                        if entry.is_file() and not entry.name.startswith('.')))
+        else:
+            scaffoldPaths.append(path)
+    return scaffoldPaths
+
+
+def StapleQuality(stapleSequence):
+    """
+    Returns staple quality metrics of a list of staple Strands: total penalty
+    (see rotation.StapleScores), number of staples with GC fraction outside
+    GC_RANGE, number of staples with homopolymers longer than MAX_HOMOPOLYMER
+    and the longest homopolymer.
+    """
+
+    sequences = [staple.sequence for staple in stapleSequence]
+    if sequences == []:
+        return {'penalty': 0.0, 'gcOutside': 0, 'longHomopolymers': 0, 'longestHomopolymer': 0}
+
+    batch, lengths = encode_sequences(sequences)
+    gc = gc_fraction(batch, lengths)
+    runs = longest_runs(batch).max(axis=1)
+
+    letters = np.frombuffer(''.join(sequences).encode('ascii'), dtype=np.uint8)[None, :]
+    bounds = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=bounds[1:])
+
+    return {
+        'penalty': float(StapleScores(letters, bounds)[0]),
+        'gcOutside': int(np.count_nonzero((gc < GC_RANGE[0]) | (gc > GC_RANGE[1]))),
+        'longHomopolymers': int(np.count_nonzero(runs > MAX_HOMOPOLYMER)),
+        'longestHomopolymer': int(runs.max()),
+    }
+
+
+def SetDesign(engine, loadedDesign):
+    """
+    Stores engine and loaded design in the worker process, so they are sent
+    once per worker instead of once per scaffold.
+    """
+
+    workerState['engine'] = engine
+    workerState['design'] = loadedDesign
+
+
+def EvaluateScaffold(scaffoldPath):
+    """
+    Sequences the design of this process with a scaffold file. Returns its
+    record for the comparison table.
+    """
+
+    engine, loadedDesign = workerState['engine'], workerState['design']
+    record = {'scaffold': scaffoldPath}
+
+    try:
+        scaffoldSequence = RawScaffoldSequence(scaffoldPath)
+        record['length'] = len(scaffoldSequence)
+        result = engine.Sequence(loadedDesign, scaffoldSequence)
+    except SequenceDesignError as error:
+        record['status'] = 'error'
+        record['error'] = str(error).splitlines()[0]
+        return record
+
+    record['status'] = 'ok'
+    record['warnings'] = len(result.warnings)
+    record['weakAnchors'] = int(ThermoReport(result)['staples']['WeakAnchor'].sum())
+    record.update(StapleQuality(result.stapleSequence))
+    if result.scaffoldRotation is not None:
+        record['rotation'] = result.scaffoldRotation
+
+    return record
+
+
+def RankScaffolds(records):
+    """
+    Returns records sorted from best to worst, by VerifyStaples warnings,
+    then staples with a weak anchor domain (see thermodynamics), then staple
+    penalty, then scaffold length. Failed scaffolds come last.
+    """
+
+    def Key(record):
+        if record['status'] != 'ok':
+            return (1, 0, 0, 0.0, 0)
+        return (0, record['warnings'], record['weakAnchors'], record['penalty'], record['length'])
+
+    return sorted(records, key=Key)
+
+
+def SelectScaffold(design, scaffoldPaths, engine, workers=None):
+    """
+    Parses design once and sequences it with every scaffold that is long
+    enough, on worker processes (all cores if workers is None). Returns the
+    ranked records of all scaffolds and the loaded design.
+    """
+
+    loadedDesign = engine.LoadDesign(design)
+
+    # Scaffolds shorter than the longest scaffold of the design are rejected without a run
+    numStrands, lengthStrands, scaffolds, staples, name, skip, loop, stapleStartBases, scaffoldStartBase = loadedDesign
+    longest = max(FindLength(scaffolds, scaffoldStartBase, skip, loop), default=0)
+
+    records = []
+    candidates = []
+    for scaffoldPath in scaffoldPaths:
+        try:
+            length = len(RawScaffoldSequence(scaffoldPath))
+        except SequenceDesignError as error:
+            records.append({'scaffold': scaffoldPath, 'status': 'error', 'error': str(error)})
+            continue
+        if length < longest:
+            records.append({'scaffold': scaffoldPath, 'length': length, 'status': 'too short',
+                            'error': "needs " + str(longest) + " bases"})
+        else:
+            candidates.append(scaffoldPath)
+
+    if workers == 1 or len(candidates) <= 1:
+        SetDesign(engine, loadedDesign)
+        records.extend(EvaluateScaffold(path) for path in candidates)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=SetDesign,
+                                 initargs=(engine, loadedDesign)) as executor:
+            records.extend(executor.map(EvaluateScaffold, candidates))
+
+    return RankScaffolds(records), loadedDesign
+
+
+def WriteComparison(records, fileName):
+    """
+    Writes the ranked records as csv table.
+    """
+
+    with open(fileName, 'w') as file:
+        file.write(",".join(COLUMNS) + "\n")
+        for rank, record in enumerate(records, 1):
+            ok = record['status'] == 'ok'
+            row = [str(rank) if ok else "", os.path.basename(record['scaffold']),
+                   str(record.get('length', '')), record['status'],
+                   str(record['warnings']) if ok else "",
+                   str(record['weakAnchors']) if ok else "",
+                   "{:.3f}".format(record['penalty']) if ok else "",
+                   str(record['gcOutside']) if ok else "",
+                   str(record['longHomopolymers']) if ok else "",
+                   str(record['longestHomopolymer']) if ok else ""]
+            file.write(",".join(row) + "\n")
+
+
+def ParseArguments(argv=None):
+    """
+    Parses command line arguments.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="select_scaffold.py",
+        description="Sequence a cadnano design with every scaffold in a library and keep the best.")
+    parser.add_argument("json", help="cadnano json file")
+    parser.add_argument("scaffolds", nargs="+", help="scaffold files or directories, i.e. scaffold_files")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes (default: number of cores)")
+    parser.add_argument("-o", "--output", default="",
+                        help="output directory (default: current directory)")
+    parser.add_argument("--compact", action="store_true",
+                        help="load design into compact NumPy arrays")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't use the design cache (~/.cache/seq_designer/designs)")
+    parser.add_argument("--rotate", action="store_true",
+                        help="also search the best rotation of every scaffold")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Ranks all scaffolds, writes the outputs of the best one and the
+    comparison table.
+    """
+
+    args = ParseArguments(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+
+    scaffoldPaths = ScaffoldPaths(args.scaffolds)
+    if scaffoldPaths == []:
+        sys.exit("No scaffold files found")
+
+    designCache = None if args.no_cache else DesignCache()
+
+    # Scaffolds are scored in parallel already, rotations are scored serially
+    engine = SequenceDesign(args.compact, seed=0, designCache=designCache,
+                            rotateScaffold=args.rotate, workers=1)
+
+    try:
+        records, loadedDesign = SelectScaffold(args.json, scaffoldPaths, engine, args.workers)
+
+        if records[0]['status'] != 'ok':
+            sys.exit("No scaffold could be used:\n" + "\n".join(
+                os.path.basename(record['scaffold']) + ": " + record['error'] for record in records))
+
+        # Sequence again with the best scaffold to write its outputs
+        best = records[0]
+        logger.info("Best scaffold: " + os.path.basename(best['scaffold']))
+        result = engine.Sequence(loadedDesign, RawScaffoldSequence(best['scaffold']))
+        result.WriteFiles(args.output)
+
+    except SequenceDesignError as error:
+        sys.exit(str(error))
+
+    comparisonFileName = os.path.join(args.output, result.fileName,
+                                      "scaffold_selection_" + result.fileName + ".csv")
+    WriteComparison(records, comparisonFileName)
+
+    logger.info("{:<6}{:<12}{:>8}  {:<10}{:>9}{:>12}{:>10}{:>11}".format(
+        "Rank", "Scaffold", "Length", "Status", "Warnings", "WeakAnchors", "Penalty", "GCOutside"))
+    for rank, record in enumerate(records, 1):
+        if record['status'] == 'ok':
+            logger.info("{:<6}{:<12}{:>8}  {:<10}{:>9}{:>12}{:>10.1f}{:>11}".format(
+                rank, os.path.basename(record['scaffold']), record['length'], record['status'],
+                record['warnings'], record['weakAnchors'], record['penalty'], record['gcOutside']))
+        else:
+            logger.info("{:<6}{:<12}{:>8}  {:<10}{}".format(
+                "-", os.path.basename(record['scaffold']), record.get('length', ''), record['status'],
+                record['error']))
+    logger.info("Comparison written to " + comparisonFileName)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+import base64
+import logging
+import urllib.error
+import urllib.request
+from seq_designer import ArgumentParser, DesignName
+
+
+logger = logging.getLogger("seq_designer")
+
+# Address of seq_service.py, see there
+DEFAULT_SERVICE = "127.0.0.1:8765"
+
+
+def ParseArguments(argv=None):
+    """
+    Parses command line arguments, those of seq_designer.py and the service.
+    """
+
+    parser = ArgumentParser("seq_client.py", "Sequence a cadnano design on a running seq_service.py.")
+    parser.add_argument("--service", default=os.environ.get("SEQ_DESIGNER_SERVICE", DEFAULT_SERVICE),
+                        metavar="HOST:PORT",
+                        help="address of seq_service.py (default: $SEQ_DESIGNER_SERVICE or %(default)s)")
+
+    return parser.parse_args(argv)
+
+
+def CreateRequest(args):
+    """
+    Returns the request of a seq_designer.py run: the json sent in-band and
+    the arguments, with local paths made absolute for the service.
+    """
+
+    try:
+        with open(args.json, 'rb') as file:
+            design = file.read().decode()
+    except (OSError, UnicodeDecodeError) as error:
+        raise ValueError("Not a valid cadnano json file: " + str(error)) from error
+
+    name = DesignName(args.json)
+    arguments = {key: value for key, value in vars(args).items() if key != 'service'}
+
+    # Scaffolds that aren't local files are looked up by name in the scaffold directory of the service
+    if os.path.exists(args.scaffold):
+        arguments['scaffold'] = os.path.abspath(args.scaffold)
+    if args.scaffold_pool:
+        arguments['scaffold_pool'] = os.path.abspath(args.scaffold_pool)
+
+    request = {'design': design, 'name': name, 'args': arguments}
+
+    # Previous bundle of incremental runs
+    if args.incremental is not None:
+        bundlePath = args.incremental or os.path.join(name, "result_" + name + ".npz")
+        if os.path.exists(bundlePath):
+            with open(bundlePath, 'rb') as file:
+                request['bundle'] = base64.b64encode(file.read()).decode('ascii')
+
+    return request
+
+
+def Send(request, service=DEFAULT_SERVICE):
+    """
+    Sends a request to seq_service.py at service (HOST:PORT). Returns the
+    response, see seq_service.SequenceRequest.
+    """
+
+    httpRequest = urllib.request.Request(
+        "http://" + service + "/sequence", data=json.dumps(request).encode(),
+        headers={"Content-Type": "application/json"})
+
+    try:
+        with urllib.request.urlopen(httpRequest) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as error:
+        raise ConnectionError("Service at " + service + " failed: " + error.read().decode()) from error
+    except urllib.error.URLError as error:
+        raise ConnectionError("Can't reach service at " + service + ": " + str(error.reason)) from error
+
+
+def WriteResponse(response, args, outputDirectory=''):
+    """
+    Writes the files of a response into outputDirectory, and stats and
+    profile to the files given in args.
+    """
+
+    for path, data in response['files'].items():
+        path = os.path.join(outputDirectory, path)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(base64.b64decode(data))
+
+    for key, fileName in (('stats', args.stats), ('profile', args.profile)):
+        if key in response and fileName is not None:
+            with open(fileName, 'wb') as file:
+                file.write(base64.b64decode(response[key]))
+
+
+def main(argv=None):
+    """
+    Sequences a design on the service and writes the same files as
+    seq_designer.py.
+    """
+
+    args = ParseArguments(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+
+    try:
+        response = Send(CreateRequest(args), args.service)
+    except (ValueError, ConnectionError) as error:
+        sys.exit(str(error))
+
+    # Log of the worker, as seq_designer.py would print it
+    for level, message in response['log']:
+        logger.log(level, message)
+
+    if 'error' in response:
+        sys.exit(response['error'])
+
+    WriteResponse(response, args)
+
+    logger.info("Done!")
+
+
+if __name__ == "__main__":
+    main()
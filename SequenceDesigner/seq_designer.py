@@ -1,82 +1,90 @@
+import io
 import os
-import json
 import sys
-import numpy as np
+import argparse
+import logging
 import random
-from scaffold_generator import sequence_creator
+from instrumentation import Count, Instrumentation, Profile, Stage
+from validation import ValidateDesign, ValidateLists
+from report_defaults import DEFAULT_K, MIN_ANCHOR_TM, Conditions
+from domains import DomainBuilder, DomainTable, StrandsFromOffsets, StrandsFromPaths
+from cadnano_loader import LoadJson, LoadVstrands, IterVstrandsStream, ScanNumStrands
 import time
 
+# NumPy and the modules built on it (scaffold generation, design cache, compact
+# lattice, reports) are imported where they are first needed, so small designs
+# are sequenced without them, see SMALL_DESIGN_BYTES
 
-def ParseJson():
-    """
-    Parse cadnano json file given by as command line argument.
-    Returns number of strands, length of strands (number of bases),
-    scaffolds and staple data.
-    """
 
-    print("Parsing json file...")
+logger = logging.getLogger("seq_designer")
+logger.addHandler(logging.NullHandler())
 
-    # Find json file location from argument input
-    if len(sys.argv) < 3:
-        sys.exit(
-            "Not enough files provided.\nPlease use \"Python3 seq_designer.py <filename.json> <scaffoldseq.txt>\" ")
-    elif len(sys.argv) > 3:
-        sys.exit(
-            "Too many files provided provided.\nPlease use \"Python3 seq_designer.py <filename.json> <scaffoldseq.txt>\" ")
-    else:
-        inputJson = sys.argv[1]
+# Json files smaller than this are sequenced with the list model by default,
+# which skips the design cache and starts faster than importing NumPy
+SMALL_DESIGN_BYTES = 1 << 16
 
-    # Load cadnano data
-    with open(inputJson, 'r') as json_data:
-        cadnanoData = json.load(json_data)
 
-    strandData = cadnanoData['vstrands']
+class SequenceDesignError(Exception):
+    """
+    Raised when a design can't be sequenced, e.g. a strand without a
+    breakpoint or a scaffold sequence that is too short.
+    """
 
-    # Find filename without extension
-    if os.path.exists(sys.argv[1]):
-        fileName = os.path.basename(sys.argv[1])
-        fileName = os.path.splitext(fileName)[0]
 
-    # Numbers contained in strands
-    nums = []
-    for i in range(len(strandData)):
-        currNum = strandData[i]['num']
-        nums.append(currNum)
+def ParseJson(design, compact=False, backend=None):
+    """
+    Parse cadnano design, given as path to the json file, its content in bytes
+    or the decoded json data as dict.
+    Returns number of strands, length of strands (number of bases),
+    scaffolds and staple data.
+    Json files are streamed helix by helix, see cadnano_loader.
+    If compact is set, scaffolds and staples are returned as a single
+    (numStrands, lengthStrands, 4) int32 array each, and skip and loop as
+    (numStrands, lengthStrands) int16 arrays. Otherwise all of them are lists
+    with an entry per helix, holding the lists of the json file.
+    """
 
-    maxNum = max(nums)+1
+    logger.info("Parsing json file...")
 
-    numStrands = maxNum
-    lengthStrands = len(strandData[0]['scaf'])
+    fileName = DesignName(design)
 
-    # Initialize arrays
-    scaffolds = np.empty(numStrands, dtype=object)
-    staples = np.empty(numStrands, dtype=object)
-    skip = np.empty(numStrands, dtype=object)
-    loop = np.empty(numStrands, dtype=object)
+    try:
+        # Decoded json data
+        if isinstance(design, dict):
+            numStrands, lengthStrands, scaffolds, staples, skip, loop = LoadVstrands(
+                design['vstrands'], compact)
 
-    emptyStrand = []
-    for i in range(lengthStrands):
-        emptyStrand.append([-1, -1, -1, -1])
+        # Content of json file
+        elif isinstance(design, (bytes, bytearray)):
+            numStrands, lengthStrands, scaffolds, staples, skip, loop = LoadVstrands(
+                IterVstrandsStream(io.BytesIO(design)), compact,
+                ScanNumStrands(io.BytesIO(design)) if compact else None)
 
-    # Load data of scaffolds and staples
-    for i in range(numStrands):
-        # If i exist in nums, set strandData
-        if i in nums:
-            scaffolds[i] = strandData[nums.index(i)]['scaf']
-            staples[i] = strandData[nums.index(i)]['stap']
-            skip[i] = strandData[nums.index(i)]['skip']
-            loop[i] = strandData[nums.index(i)]['loop']
-
-        # if strand doesn't exist
+        # Path to json file
         else:
-            scaffolds[i] = emptyStrand
-            staples[i] = emptyStrand
-            skip[i] = 0
-            loop[i] = 0
+            numStrands, lengthStrands, scaffolds, staples, skip, loop = LoadJson(
+                design, compact, backend)
+
+    except (OSError, KeyError, ValueError) as error:
+        raise SequenceDesignError("Not a valid cadnano json file: " + str(error)) from error
 
     return numStrands, lengthStrands, scaffolds, staples, fileName, skip, loop
 
 
+def DesignName(design):
+    """
+    Returns name of design: the filename without extension for json files,
+    the name stored in decoded json data, or 'design' for json bytes.
+    """
+
+    if isinstance(design, dict):
+        return os.path.splitext(design.get('name', 'design'))[0]
+    elif isinstance(design, (bytes, bytearray)):
+        return 'design'
+    else:
+        return os.path.splitext(os.path.basename(design))[0]
+
+
 def CreateLookUpTable(numStrands, lengthStrands):
     """
     Returns a look up table for the scaffold in string formatm
@@ -87,27 +95,40 @@ def CreateLookUpTable(numStrands, lengthStrands):
     return lookUpScaffold
 
 
-def RawScaffoldSequence():
+def RawScaffoldSequence(inputScaffold):
     """
     Returns raw scaffold sequence from input file
     """
 
-    print("Parsing scaffold sequence...")
-
-    # Find scaffold sequence file location from argument input
-    if len(sys.argv) < 3:
-        sys.exit(
-            "Not enough files provided.\nPlease use \"Python3 seq_designer.py <filename.json> <scaffoldseq.txt>\" ")
-    else:
-        inputScaffold = sys.argv[2]
+    logger.info("Parsing scaffold sequence...")
 
     # Load scaffold sequence data
-    with open(inputScaffold, 'r') as file:
-        scaffold_seq = file.read().replace('\n', '')
+    try:
+        with open(inputScaffold, 'r') as file:
+            scaffold_seq = file.read().replace('\n', '')
+    except OSError as error:
+        raise SequenceDesignError("Can't read scaffold file: " + str(error)) from error
 
     return scaffold_seq
 
 
+def IsCompact(strand):
+    """
+    Returns true if strand is a compact (numStrands, lengthStrands, 4) array.
+    """
+
+    return getattr(strand, 'ndim', 0) == 3
+
+
+def IsEmptyBlock(block):
+    """
+    Returns true if block has no adjacent bases, i.e. [-1,-1,-1,-1].
+    Works for both lists and rows of compact arrays.
+    """
+
+    return block[0] == -1 and block[1] == -1 and block[2] == -1 and block[3] == -1
+
+
 def ForwardTraverse(strand, startBase):
     """
     Traverse scaffold/staple strand forward by a single base.
@@ -117,7 +138,7 @@ def ForwardTraverse(strand, startBase):
     currentBase = startBase
     currentBlock = strand[currentBase[0]][currentBase[1]]
 
-    nextBase = [currentBlock[2], currentBlock[3]]
+    nextBase = [int(currentBlock[2]), int(currentBlock[3])]
     nextBlock = strand[nextBase[0]][nextBase[1]]
 
     return nextBase, nextBlock
@@ -132,7 +153,7 @@ def ReverseTraverse(strand, startBase):
     currentBase = startBase
     currentBlock = strand[currentBase[0]][currentBase[1]]
 
-    prevBase = [currentBlock[0], currentBlock[1]]
+    prevBase = [int(currentBlock[0]), int(currentBlock[1])]
     prevBlock = strand[prevBase[0]][prevBase[1]]
 
     return prevBase, prevBlock
@@ -142,17 +163,18 @@ def TraverseEntireForward(strand, startSearchBase):
     """
     Traverse entire strand forward, returns end base.
     If start search base doesn't have adjacent strands, i.e. [-1,-1,-1,-1],
-    return [-1,-1]. If no breakpoint is found, will exit.
+    return [-1,-1]. If no breakpoint is found, raises SequenceDesignError.
     """
 
     currentBase = startSearchBase
     currentBlock = strand[currentBase[0]][currentBase[1]]
 
     # If current block is empty, return empty base
-    if currentBlock == [-1, -1, -1, -1]:
+    if IsEmptyBlock(currentBlock):
         return [-1, -1]
 
     nextBase, nextBlock = ForwardTraverse(strand, currentBase)
+    steps = 0
 
     # Traverse scaffolds until next base is [-1,-1]
     while nextBase != [-1, -1]:
@@ -160,13 +182,15 @@ def TraverseEntireForward(strand, startSearchBase):
         currentBase = nextBase
 
         nextBase, nextBlock = ForwardTraverse(strand, currentBase)
+        steps += 1
 
-        # Catch infinite loop when strand doesnt have breakpoint
-        if nextBase == startSearchBase:
-            print("Error: Loop detected at base: " +
-                  str(startSearchBase[0]) + "[" + str(startSearchBase[1]) + "]")
-            print("Make sure staple or scaffolds at this base has a start and end base")
-            sys.exit("Scaffold or staple does not have breakpoint")
+        # Catch infinite loop when strand doesnt have breakpoint, the loop
+        # may not run through the start base, but can't be longer than all bases
+        if nextBase == startSearchBase or steps > len(strand) * len(strand[0]):
+            raise SequenceDesignError(
+                "Loop detected at base: " + str(startSearchBase[0]) + "[" + str(startSearchBase[1]) + "]\n"
+                "Make sure staple or scaffolds at this base has a start and end base\n"
+                "Scaffold or staple does not have breakpoint")
 
     endBase = currentBase
 
@@ -177,17 +201,18 @@ def TraverseEntireReverse(strand, startSearchBase):
     """
     Traverse entire strand in reverse, returns start base.
     If start search base doesn't have adjacent strands, i.e. [-1,-1,-1,-1],
-    return [-1,-1]. If no breakpoint is found, will exit.
+    return [-1,-1]. If no breakpoint is found, raises SequenceDesignError.
     """
 
     currentBase = startSearchBase
     currentBlock = strand[currentBase[0]][currentBase[1]]
 
     # If current block is empty, return empty base
-    if currentBlock == [-1, -1, -1, -1]:
+    if IsEmptyBlock(currentBlock):
         return [-1, -1]
 
     prevBase, prevBlock = ReverseTraverse(strand, currentBase)
+    steps = 0
 
     # ForwardTraverse scaffolds until previous base is [-1,-1]
     while prevBase != [-1, -1]:
@@ -195,122 +220,150 @@ def TraverseEntireReverse(strand, startSearchBase):
         currentBase = prevBase
 
         prevBase, prevBlock = ReverseTraverse(strand, currentBase)
+        steps += 1
 
-        # Catch infinite loop when strand doesnt have breakpoint
-        if prevBase == startSearchBase:
-            print("Error: Loop detected at base: " +
-                  str(startSearchBase[0]) + "[" + str(startSearchBase[1]) + "]")
-            print("Make sure staple or scaffolds at this base has a start and end")
-            sys.exit("Scaffold or staple does not have breakpoint")
+        # Catch infinite loop when strand doesnt have breakpoint, the loop
+        # may not run through the start base, but can't be longer than all bases
+        if prevBase == startSearchBase or steps > len(strand) * len(strand[0]):
+            raise SequenceDesignError(
+                "Loop detected at base: " + str(startSearchBase[0]) + "[" + str(startSearchBase[1]) + "]\n"
+                "Make sure staple or scaffolds at this base has a start and end\n"
+                "Scaffold or staple does not have breakpoint")
 
     startBase = currentBase
 
     return startBase
 
 
-def FindStartStaples(strand, numStrands, lengthStrands):
+def FindStrands(strand, numStrands, lengthStrands, counters=None):
     """
-    Returns all start and end bases of given strand.
+    Finds all strands of the given strand grid in a single pass over its cells.
+    Returns the start bases (5' ends, i.e. the previous base is [-1,-1]) and the
+    circular strands, each given by its first base in helix/index order.
+    Start bases are ordered by the first base of their strand in helix/index
+    order, which decides the order OrderStartBases returns them in.
+    Compact strands are found vectorized, see lattice.StrandStarts.
+    The cells scanned and the steps of the strand walks are added to the
+    cellsVisited and traversalSteps counters, if given.
     """
 
-    print("Finding staples...")
+    if IsCompact(strand):
+        from lattice import StrandStarts
+
+        startBases, circularBases = StrandStarts(strand)
+        Count(counters, 'cellsVisited', strand.shape[0] * strand.shape[1])
+        return startBases.tolist(), circularBases.tolist()
 
+    # Strand id of every base, -1 if not visited (yet)
+    strandId = [[-1] * lengthStrands for _ in range(numStrands)]
     startBases = []
-    # Check all strands
+    circularBases = []
+
+    # Lowest flat index (helix * lengthStrands + index) of every strand with a 5' end
+    firstCells = []
+    cellsVisited = 0
+    traversalSteps = 0
+
+    # Walk every strand forward from its 5' end, marking its bases
     for i in range(numStrands):
-        # Check all bases in each strand
+        cellsVisited += lengthStrands
         for j in range(lengthStrands):
+            currentBlock = strand[i][j]
+            if IsEmptyBlock(currentBlock) or currentBlock[0] != -1:
+                continue
+
+            currentId = len(startBases)
+            startBases.append([i, j])
+            currentBase = [i, j]
+            firstCell = i * lengthStrands + j
 
-            startSearchBase = [i, j]
-            startBase = TraverseEntireReverse(strand, startSearchBase)
+            # Stop at the 3' end, or when running into an already marked base
+            while currentBase != [-1, -1] and strandId[currentBase[0]][currentBase[1]] == -1:
+                strandId[currentBase[0]][currentBase[1]] = currentId
+                firstCell = min(firstCell, currentBase[0] * lengthStrands + currentBase[1])
+                currentBase, currentBlock = ForwardTraverse(strand, currentBase)
+                traversalSteps += 1
 
-            if startBase != [-1, -1]:
-                startBases.append(startBase)
+            firstCells.append(firstCell)
+
+    # Bases that are still unmarked belong to strands without a 5' end
+    for i in range(numStrands):
+        cellsVisited += lengthStrands
+        for j in range(lengthStrands):
+            if strandId[i][j] != -1 or IsEmptyBlock(strand[i][j]):
+                continue
 
-    # Extracts only unique start bases
-    startBases = [list(x) for x in set(tuple(x)
-                                       for x in startBases)]
+            currentId = len(startBases) + len(circularBases)
+            circularBases.append([i, j])
+            currentBase = [i, j]
 
-    return startBases
+            while currentBase != [-1, -1] and strandId[currentBase[0]][currentBase[1]] == -1:
+                strandId[currentBase[0]][currentBase[1]] = currentId
+                currentBase, currentBlock = ForwardTraverse(strand, currentBase)
+                traversalSteps += 1
 
+    Count(counters, 'cellsVisited', cellsVisited)
+    Count(counters, 'traversalSteps', traversalSteps)
 
-def TraverseEntireReverseCheck(strand, startSearchBase, lookUpScaffold):
+    # Order strands by their first base, found while marking them
+    order = sorted(range(len(startBases)), key=firstCells.__getitem__)
+
+    return [startBases[k] for k in order], circularBases
+
+
+def FindStartStaples(strand, numStrands, lengthStrands, counters=None):
     """
-    Traverse entire strand in reverse, returns start base.
-    If start search base doesn't have adjacent strands, i.e. [-1,-1,-1,-1],
-    return [-1,-1]. If no breakpoint is found, will exit.
-    Will return [-1,-1] if currentBase has already been checked through
-    look up scaffold.
+    Returns all start bases of given strand. Raises SequenceDesignError if a
+    staple doesn't have a start and end base. Work is counted in counters if
+    given, see FindStrands.
     """
 
-    currentBase = startSearchBase
-    currentBlock = strand[currentBase[0]][currentBase[1]]
+    logger.info("Finding staples...")
 
-    # If current block is empty, return empty base
-    if currentBlock == [-1, -1, -1, -1]:
-        return [-1, -1]
+    startBases, circularBases = FindStrands(strand, numStrands, lengthStrands, counters)
 
-    # Set mark that it has been checked
-    lookUpScaffold[currentBase[0]][currentBase[1]] = '0'
+    # Catch staples without breakpoint
+    if circularBases != []:
+        raise SequenceDesignError(
+            "Loop detected at base: " + str(circularBases[0][0]) + "[" + str(circularBases[0][1]) + "]\n"
+            "Make sure staple or scaffolds at this base has a start and end\n"
+            "Scaffold or staple does not have breakpoint")
 
-    # Traverse backwards
-    prevBase, prevBlock = ReverseTraverse(strand, currentBase)
+    return OrderStartBases(startBases)
 
-    # If already checked before, return early
-    if lookUpScaffold[prevBase[0]][prevBase[1]] == '0':
-        return [-1, -1]
 
-    # ForwardTraverse scaffolds until previous base is [-1,-1]
-    while prevBase != [-1, -1]:
-        currentBlock = prevBlock
-        currentBase = prevBase
-        # Set mark that it has been checked
-        lookUpScaffold[currentBase[0]][currentBase[1]] = '0'
+def FindStartScaffolds(strand, numStrands, lengthStrands, counters=None):
+    """
+    Returns all start bases of given strand. Scaffolds without a start and end
+    base can't be assigned a sequence and are skipped. Work is counted in
+    counters if given, see FindStrands.
+    """
 
-        # Traverse backwards
-        prevBase, prevBlock = ReverseTraverse(strand, currentBase)
+    logger.info("Finding scaffolds...")
 
-        # If already checked before, return early
-        if lookUpScaffold[prevBase[0]][prevBase[1]] == '0':
-            return [-1, -1]
+    startBases, circularBases = FindStrands(strand, numStrands, lengthStrands, counters)
 
-        # Catch infinite loop when strand doesnt have breakpoint
-        if prevBase == startSearchBase:
-            print("Error: Loop detected at base: " +
-                  str(startSearchBase[0]) + "[" + str(startSearchBase[1]) + "]")
-            print("Make sure staple or scaffolds at this base has a start and end")
-            sys.exit("Scaffold or staple does not have breakpoint")
+    WarnCircularScaffolds(circularBases)
 
-    startBase = currentBase
-
-    return startBase
+    return OrderStartBases(startBases)
 
 
-def FindStartScaffolds(strand, numStrands, lengthStrands, lookUpScaffold):
+def OrderStartBases(startBases):
     """
-    Returns all start and end bases of given strand.
+    Returns start bases in the order in which they have always been output.
     """
 
-    print("Finding scaffolds...")
-
-    startBases = []
-    # Check all strands
-    for i in range(numStrands):
-        # Check all bases in each strand
-        for j in range(lengthStrands):
+    return [list(x) for x in set(tuple(x) for x in startBases)]
 
-            startSearchBase = [i, j]
-            startBase = TraverseEntireReverseCheck(
-                strand, startSearchBase, lookUpScaffold)
 
-            if startBase != [-1, -1]:
-                startBases.append(startBase)
-
-    # Extracts only unique start bases
-    startBases = [list(x) for x in set(tuple(x)
-                                       for x in startBases)]
+def WarnCircularScaffolds(circularBases):
+    """
+    Warns about scaffolds without a breakpoint, given by one of their bases.
+    """
 
-    return startBases
+    for circularBase in circularBases:
+        logger.warning("Warning: scaffold at " + str(circularBase[0]) + "[" + str(circularBase[1]) + "]" +
+                       " does not have a breakpoint and is not sequenced")
 
 
 def CheckMultipleBase(startBase):
@@ -324,13 +377,23 @@ def CheckMultipleBase(startBase):
     return any(isinstance(el, list) for el in startBase)
 
 
-def FindLength(strand, startSearchBase, skip, loop):
+def FindLength(strand, startSearchBase, skip, loop, counters=None):
     """
-    Returns length of sequences for the start bases provided.
+    Returns length of sequences for the start bases provided. A loop base
+    holds 1 + loop letters, a skip none. For compact designs lengths are
+    summed over the domains of every strand, see PathLengths. Otherwise the
+    steps of the strand walks are added to the traversalSteps counter, if
+    counters are given.
     """
 
+    if IsCompact(strand):
+        if not CheckMultipleBase(startSearchBase):
+            startSearchBase = [startSearchBase]
+        return PathLengths(strand, startSearchBase, skip, loop)[0].tolist()
+
     maxRange = len(startSearchBase)
     length = [None] * len(startSearchBase)
+    traversalSteps = 0
 
     # To avoid i.e. [0,50] and [[3, 82], [0, 45]] both having length 2
     if len(startSearchBase) == 2:
@@ -347,16 +410,17 @@ def FindLength(strand, startSearchBase, skip, loop):
             currentBase = startSearchBase
 
         currentBlock = strand[currentBase[0]][currentBase[1]]
-        currentSkip = skip[currentBase[0]][currentBase[1]]
-        currentLoop = loop[currentBase[0]][currentBase[1]]
+        currentSkip = int(skip[currentBase[0]][currentBase[1]])
+        currentLoop = int(loop[currentBase[0]][currentBase[1]])
 
         length[i] = 0
 
         # If current block is empty, return empty base
-        if currentBlock == [-1, -1, -1, -1]:
+        if IsEmptyBlock(currentBlock):
             break
 
         nextBase, nextBlock = ForwardTraverse(strand, currentBase)
+        traversalSteps += 1
 
         # If there is no skip and no loop
         if currentSkip == 0 and currentLoop == 0:
@@ -364,16 +428,17 @@ def FindLength(strand, startSearchBase, skip, loop):
 
         # If there is no skip, but there is a loop
         elif currentSkip == 0 and currentLoop != 0:
-            length[i] = length[i] + currentLoop
+            length[i] = length[i] + 1 + currentLoop
 
         # Traverse strand until next base is [-1,-1]
         while nextBase != [-1, -1]:
             currentBlock = nextBlock
             currentBase = nextBase
-            currentSkip = skip[currentBase[0]][currentBase[1]]
-            currentLoop = loop[currentBase[0]][currentBase[1]]
+            currentSkip = int(skip[currentBase[0]][currentBase[1]])
+            currentLoop = int(loop[currentBase[0]][currentBase[1]])
 
             nextBase, nextBlock = ForwardTraverse(strand, currentBase)
+            traversalSteps += 1
 
             # If there is no skip and no loop
             if currentSkip == 0 and currentLoop == 0:
@@ -381,67 +446,70 @@ def FindLength(strand, startSearchBase, skip, loop):
 
             # If there is no skip, but there is a loop
             elif currentSkip == 0 and currentLoop != 0:
-                length[i] = length[i] + currentLoop
+                length[i] = length[i] + 1 + currentLoop
+
+    Count(counters, 'traversalSteps', traversalSteps)
 
     return length
 
 
-def FindSingleScaffold(scaffold, startBase, inputSequence, lookUpScaffold, skip, loop):
+def PathLengths(strand, startBases, skip, loop):
     """
-    Appends base letter from inputSequence to each base in scaffold.
-    Returns sequence containing bases and base letters.
+    Returns length of the strands of a compact design starting at startBases,
+    computed from per helix prefix sums of letters over their domains,
+    together with the paths (see lattice.StrandPaths), DomainTable and
+    prefix sums.
     """
 
-    finalSequence = []
-    cnt = 0
-    currentBase = startBase
+    from lattice import LetterPrefixSums, StrandPaths
 
-    # Traverse scaffold until nextBase is [-1,-1]
-    while True:
+    paths = StrandPaths(strand, startBases)
+    table = DomainTable(paths[0], paths[1], strand.shape[1], True)
+    prefix = LetterPrefixSums(skip, loop)
 
-        currentSkip = skip[currentBase[0]][currentBase[1]]
-        currentLoop = loop[currentBase[0]][currentBase[1]]
+    return table.StrandLengths(prefix), paths, table, prefix
 
-        # If there is no skip and no loop
-        if currentSkip == 0 and currentLoop == 0:
 
-            # Append sequence
-            currentBase.append(inputSequence[cnt])
-            finalSequence.append(currentBase)
-            lookUpScaffold[currentBase[0]][currentBase[1]] = inputSequence[cnt]
+def FindSingleScaffold(scaffold, startBase, inputSequence, lookUpScaffold, skip, loop, counters=None):
+    """
+    Assigns the letters of inputSequence to the bases of the scaffold
+    starting at startBase and fills them in the look up scaffold. Returns
+    the scaffold as Strand, its domains built while traversing. The steps
+    of the walk are added to the traversalSteps counter, if given.
+    """
 
-            cnt += 1
+    strand = DomainBuilder(True)
+    cnt = 0
+    traversalSteps = 0
+    currentBase = startBase
 
-        # If there is no skip, but there is a loop
-        elif currentSkip == 0 and currentLoop != 0:
+    # Traverse scaffold until nextBase is [-1,-1]
+    while True:
 
-            loopSequence = [inputSequence[cnt]]
-            cnt += 1
+        currentSkip = int(skip[currentBase[0]][currentBase[1]])
+        currentLoop = int(loop[currentBase[0]][currentBase[1]])
 
-            # Find sequence for the whole loop
-            for i in range(currentLoop):
-                loopSequence.append(inputSequence[cnt])
-                cnt += 1
-            loopSequence = ''.join(loopSequence)
+        # If there is no skip, a single letter or the letters of the whole loop
+        if currentSkip == 0:
+            numLetters = 1 + max(currentLoop, 0)
+            letters = inputSequence[cnt:cnt + numLetters]
+            cnt += numLetters
 
-            # Append sequence
-            currentBase.append(loopSequence)
-            finalSequence.append(currentBase)
-            lookUpScaffold[currentBase[0]][currentBase[1]] = loopSequence
+            strand.Add(currentBase[0], currentBase[1], letters)
+            lookUpScaffold[currentBase[0]][currentBase[1]] = letters
 
-        # If there is a skip
+        # If there is a skip, 'X' indicates it in the look up scaffold
         elif currentSkip == -1:
-
-            # Append 'X' to indicate skip
-            currentBase.append('X')
-            finalSequence.append(currentBase)
+            strand.Add(currentBase[0], currentBase[1], '')
             lookUpScaffold[currentBase[0]][currentBase[1]] = 'X'
 
         else:
-            print("There is a skip and loop in the same index!")
-            sys.exit("Not a valid skip/loop array in json file!")
+            raise SequenceDesignError(
+                "There is a skip and loop in the same index!\n"
+                "Not a valid skip/loop array in json file!")
 
-        nextBase, nextBlock = ForwardTraverse(scaffold, currentBase)
+        nextBase, _ = ForwardTraverse(scaffold, currentBase)
+        traversalSteps += 1
 
         # Break if end of scaffold is reached
         if nextBase == [-1, -1]:
@@ -449,55 +517,98 @@ def FindSingleScaffold(scaffold, startBase, inputSequence, lookUpScaffold, skip,
 
         # Traverse to next base
         currentBase = nextBase
-        currentBlock = nextBlock
-    return finalSequence
+
+    Count(counters, 'traversalSteps', traversalSteps)
+
+    return strand.Strand()
 
 
-def FindScaffoldSequences(scaffolds, scaffoldStartBase, rawScaffoldSequence, lookUpScaffold, skip, loop):
+def FindScaffoldSequences(scaffolds, scaffoldStartBase, rawScaffoldSequence, lookUpScaffold, skip, loop, rng=random, scaffoldPool=None):
     """
     Returns all scaffolds sequences, assigns the rawScaffoldSequence to the
-    longest scaffold. The other scaffolds get pseudorandomly generated sequences.
+    longest scaffold. The other scaffolds get pseudorandomly generated sequences,
+    drawn from rng (the random module or a random.Random instance). If a
+    scaffoldPool is given, generated sequences are looked up in and added to it.
     """
 
-    print("Generating scaffold sequences...")
+    logger.info("Generating scaffold sequences...")
 
     length = FindLength(scaffolds, scaffoldStartBase, skip, loop)
 
-    # Exit if no scaffold is found
+    inputSequences = ScaffoldInputSequences(length, rawScaffoldSequence, rng, scaffoldPool)
+
+    return AssignScaffoldSequences(scaffolds, scaffoldStartBase, inputSequences, lookUpScaffold, skip, loop)
+
+
+def ScaffoldInputSequences(length, rawScaffoldSequence, rng=random, scaffoldPool=None):
+    """
+    Returns the sequence for every scaffold of given length, see
+    FindScaffoldSequences.
+    """
+
+    # Stop if no scaffold is found
     if length == []:
-        sys.exit("No scaffolds found")
+        raise SequenceDesignError("No scaffolds found")
 
-    maxIndex = np.argmax(length)
+    maxIndex = length.index(max(length))
     maxRange = len(length)
-    finalSequence = [None] * maxRange
+    inputSequences = [None] * maxRange
 
-    # Exit if scaffold sequence provided is not long enough
+    # Stop if scaffold sequence provided is not long enough
     if length[maxIndex] > len(rawScaffoldSequence):
-        sys.exit(
+        raise SequenceDesignError(
             "Scaffold sequence given is not long enough.\nScaffold input length: "
             + str(len(rawScaffoldSequence)) + "\nLongest scaffold in json: "
             + str(length[maxIndex]) + "\nPlease provide a longer sequence.")
 
     for i in range(maxRange):
-        if CheckMultipleBase(scaffoldStartBase):
-            currentBase = scaffoldStartBase[i]
-        else:
-            currentBase = scaffoldStartBase
-
         # Assign input scaffold to the longest scaffold in the file
         if i == maxIndex:
-            finalSequence[i] = FindSingleScaffold(
-                scaffolds, currentBase, rawScaffoldSequence, lookUpScaffold, skip, loop)
+            inputSequences[i] = rawScaffoldSequence
 
         # Else generate pseudorandom sequence
+        elif scaffoldPool is None:
+            from scaffold_generator import sequence_creator
+            inputSequences[i], _ = sequence_creator(length[i], rng)
+        else:
+            # Same seed sequence_creator draws from rng
+            inputSequences[i], _ = scaffoldPool.Sequence(length[i], rng.getrandbits(64))
+
+    return inputSequences
+
+
+def AssignScaffoldSequences(scaffolds, scaffoldStartBase, inputSequences, lookUpScaffold, skip, loop,
+                            counters=None):
+    """
+    Assigns each input sequence to the scaffold starting at the start base
+    with the same index. Returns all scaffolds as Strands. Work is counted
+    in counters if given, see FindSingleScaffold.
+    """
+
+    finalSequence = [None] * len(inputSequences)
+
+    for i in range(len(inputSequences)):
+        if CheckMultipleBase(scaffoldStartBase):
+            currentBase = scaffoldStartBase[i]
         else:
-            randomScaffoldSequence, _ = sequence_creator(length[i])
-            finalSequence[i] = FindSingleScaffold(
-                scaffolds, currentBase, randomScaffoldSequence, lookUpScaffold, skip, loop)
+            currentBase = scaffoldStartBase
+
+        finalSequence[i] = FindSingleScaffold(
+            scaffolds, currentBase, inputSequences[i], lookUpScaffold, skip, loop, counters)
 
     return finalSequence
 
 
+def LatticeScaffoldSequences(letterLattice, scaffoldDomains, prefix, inputSequences):
+    """
+    Returns all scaffolds of a ScaffoldLetterLattice as Strands, in the order
+    of its start bases. The letters of every domain are sliced from
+    inputSequences at the offsets given by the prefix sums.
+    """
+
+    return StrandsFromOffsets(scaffoldDomains, prefix, inputSequences)
+
+
 def Complement(inputBase):
     """
     Returns the complementary base of input base. If there is a loop present, 
@@ -542,7 +653,7 @@ def SingleComplement(inputBase):
         return 'X'
 
     else:
-        sys.exit(str(inputBase) + " is not a valid base")
+        raise SequenceDesignError(str(inputBase) + " is not a valid base")
 
 
 def FindStapleBase(stapleBase, lookUpScaffold):
@@ -564,87 +675,132 @@ def FindStapleBase(stapleBase, lookUpScaffold):
     return stapleBaseLetter
 
 
-def FindStapleSequences(staples, stapleStartBases, lookUpScaffold, lookUpStaple):
+def FindStapleSequences(staples, stapleStartBases, lookUpScaffold, lookUpStaple, letterLattice=None,
+                        counters=None):
     """
-    Finds complementary scaffold base letter from look up scaffold.
-    appends it to each staple base. Returns all staple sequences.
+    Finds complementary scaffold base letter from look up scaffold for
+    each staple base, building the domains of every staple while it is
+    traversed. Returns all staples as Strands. The steps of the walks are
+    added to the traversalSteps counter, if counters are given.
+    For compact designs a ScaffoldLetterLattice can be given instead of the
+    look up scaffold, all staples are then gathered from it at once.
     """
 
-    print("Generating staple sequences...")
+    logger.info("Generating staple sequences...")
+
+    if letterLattice is not None:
+        return GatherStapleSequences(staples, stapleStartBases, lookUpStaple, letterLattice)
 
     finalSequence = [None] * len(stapleStartBases)
+    traversalSteps = 0
 
     for i in range(len(stapleStartBases)):
-
+        strand = DomainBuilder(False)
         currentBase = stapleStartBases[i]
-        currentBlock = staples[currentBase[0]][currentBase[1]]
 
-        baseLetter = FindStapleBase(currentBase, lookUpScaffold)
-        currentBase.append(baseLetter)
-        finalSequence[i] = [currentBase]
+        # ForwardTraverse staple until currentBase is [-1,-1]
+        while currentBase != [-1, -1]:
+            baseLetter = FindStapleBase(currentBase, lookUpScaffold)
+            strand.Add(currentBase[0], currentBase[1], '' if baseLetter == 'X' else baseLetter)
+            lookUpStaple[currentBase[0]][currentBase[1]] = baseLetter
 
-        lookUpStaple[currentBase[0]][currentBase[1]] = baseLetter
+            currentBase, _ = ForwardTraverse(staples, currentBase)
+            traversalSteps += 1
 
-        nextBase, nextBlock = ForwardTraverse(staples, currentBase)
+        finalSequence[i] = strand.Strand()
 
-        # ForwardTraverse scaffolds until nextBase is [-1,-1]
-        while nextBase != [-1, -1]:
+    Count(counters, 'traversalSteps', traversalSteps)
 
-            currentBase = nextBase
-            currentBlock = nextBlock
+    return finalSequence
 
-            baseLetter = FindStapleBase(currentBase, lookUpScaffold)
-            currentBase.append(baseLetter)
-            finalSequence[i].append(currentBase)
 
-            lookUpStaple[currentBase[0]][currentBase[1]] = baseLetter
+def GatherStapleSequences(staples, stapleStartBases, lookUpStaple, letterLattice):
+    """
+    Gathers the letters of all staples from the scaffold letter lattice, see
+    lattice.StapleSequenceBytes, and fills them in lookUpStaple (a
+    lattice.LookUpTable). Returns all staples as Strands.
+    """
 
-            nextBase, nextBlock = ForwardTraverse(staples, currentBase)
+    from lattice import LatticeError, StapleSequenceBytes
 
-    return finalSequence
+    lengthStrands = staples.shape[1]
+
+    try:
+        _, cells, bounds, letters, count = StapleSequenceBytes(
+            staples, stapleStartBases, letterLattice)
+    except LatticeError as error:
+        raise SequenceDesignError(str(error)) from error
+
+    text = letters.tobytes().decode('ascii')
+    lookUpStaple.Fill(cells, text, count)
+
+    return StrandsFromPaths(cells, bounds, lengthStrands, text, count, False)
 
 
 def VerifyStaples(stapleSequence):
     """
-    Checks for staples shorter than 15 or longer than 60, returns warning if found.
+    Checks for staples (Strands) shorter than 15 or longer than 60 bases,
+    returns warning if found.
     Also checks if there are staples with more than 7 consecutive A's at the edge,
     which might indicate a long staple strand which is not connected to a scaffold.
+    Returns list of all warnings.
     """
 
-    print("Verifying staples...")
+    warnings = []
+
+    logger.info("Verifying staples...")
 
     # Check for staples longer than 60 or shorter than 15
-    for i in range(len(stapleSequence)):
-        if len(stapleSequence[i]) > 60:
-            print("Warning: staple " + str(i) +
-                  " at " + str(stapleSequence[i][0][0]) + "[" + str(stapleSequence[i][0][1]) + "]" + " has length " + str(len(stapleSequence[i])) + " (>60)")
-        elif len(stapleSequence[i]) < 15:
-            print("Warning: staple " + str(i) +
-                  " at " + str(stapleSequence[i][0][0]) + "[" + str(stapleSequence[i][0][1]) + "]" + " has length " + str(len(stapleSequence[i])) + " (<15)")
+    for i, staple in enumerate(stapleSequence):
+        location = " at " + BaseText(staple.startBase)
+        if len(staple) > 60:
+            warnings.append("Warning: staple " + str(i) + location +
+                            " has length " + str(len(staple)) + " (>60)")
+        elif len(staple) < 15:
+            warnings.append("Warning: staple " + str(i) + location +
+                            " has length " + str(len(staple)) + " (<15)")
 
     # Check for 7 consecutive A's next to eachother at the staple edges
-    for i in range(len(stapleSequence)):
-        if len(stapleSequence[i]) >= 7:
-            if (stapleSequence[i][0][2] == stapleSequence[i][1][2] ==
-                    stapleSequence[i][2][2] == stapleSequence[i][3][2] ==
-                    stapleSequence[i][4][2] == stapleSequence[i][5][2] ==
-                    stapleSequence[i][6][2] == 'A'):
-                print("Warning: staple " + str(i) +
-                      " at " + str(stapleSequence[i][0][0]) + "[" + str(stapleSequence[i][0][1]) + "]" + " has 7 or more consecutive A's at the start")
-            if (stapleSequence[i][-1][2] == stapleSequence[i][-2][2] ==
-                stapleSequence[i][-3][2] == stapleSequence[i][-4][2] ==
-                stapleSequence[i][-5][2] == stapleSequence[i][-6][2] ==
-                    stapleSequence[i][-7][2] == 'A'):
-                print("Warning: staple " + str(i) +
-                      " at " + str(stapleSequence[i][0][0]) + "[" + str(stapleSequence[i][0][1]) + "]" + " has 7 or more consecutive A's at the end")
+    for i, staple in enumerate(stapleSequence):
+        if len(staple) >= 7:
+            location = " at " + BaseText(staple.startBase)
+            if staple.sequence.startswith("AAAAAAA"):
+                warnings.append("Warning: staple " + str(i) + location +
+                                " has 7 or more consecutive A's at the start")
+            if staple.sequence.endswith("AAAAAAA"):
+                warnings.append("Warning: staple " + str(i) + location +
+                                " has 7 or more consecutive A's at the end")
+
+    for warning in warnings:
+        logger.warning(warning)
+
+    return warnings
+
+
+def BaseText(base):
+    """
+    Returns base as text, i.e. [1, 6] -> 1[6]
+    """
+
+    return str(base[0]) + "[" + str(base[1]) + "]"
+
+
+def SequenceRow(sequence):
+    """
+    Returns start base, end base, sequence letters (without skips) and length
+    of a single Strand, i.e. 1[6], 0[5], GTGATGATT, 9
+    """
+
+    return BaseText(sequence.startBase), BaseText(sequence.endBase), sequence.sequence, len(sequence.sequence)
 
 
 def PrintSequence(sequence, fileName, view=1):
     """
-    Prints sequence to file, 0 = detailed view, 1 = cadnano view
+    Prints Strands to file, 0 = detailed view (one line per domain),
+    1 = cadnano view
     """
 
-    print("Outputting data to " + fileName + "...")
+    logger.info("Outputting data to " + fileName + "...")
 
     # Open file
     outputFile = open(fileName, 'w')
@@ -653,185 +809,824 @@ def PrintSequence(sequence, fileName, view=1):
     if view == 0:
         for i in range(len(sequence)):
             outputFile.write("Staple " + str(i) + ":\n")
-            for seq in sequence[i]:
-                outputFile.write(str(seq) + "\n")
+            for domain in sequence[i].domains:
+                outputFile.write(BaseText([domain.helix, domain.start]) + " - " +
+                                 BaseText([domain.helix, domain.end]) + ": " + domain.sequence + "\n")
             outputFile.write("\n")
 
     # Print in cadnano style view
     elif view == 1:
         outputFile.write("Start,End,Sequence,Length\n")
         for i in range(len(sequence)):
-            currentSequence = sequence[i]
-            outputFile.write(str(currentSequence[0][0]) + "[" + str(currentSequence[0][1]) + "]," +
-                             str(currentSequence[-1][0]) + "[" + str(currentSequence[-1][1]) + "],")
-            cnt = 0
-            for j in range(len(currentSequence)):
-                if currentSequence[j][2] != 'X':
-                    outputFile.write(str(currentSequence[j][2]))
-                    cnt += len(currentSequence[j][2])
-            outputFile.write("," + str(cnt) + "\n")
+            start, end, letters, cnt = SequenceRow(sequence[i])
+            outputFile.write(start + "," + end + "," + letters + "," + str(cnt) + "\n")
     else:
-        sys.exit("Not a valid print mode.")
+        raise ValueError("Not a valid print mode.")
 
     # Close file
     outputFile.close()
 
 
-def PrintVisualizer(numStrands, lengthStrands, lookUpScaffold, lookUpStaple, fileName, loop):
+def RenderRow(letters, loopIndices, reverseLoops):
+    """
+    Returns a single row of the visualizer: letters of every base, '-' for
+    empty bases. Loops at loopIndices are shown as their first letter followed
+    by the rest between curly brackets, reversed first if reverseLoops is set.
+    """
+
+    cells = [letter or '-' for letter in letters]
+
+    for j in loopIndices:
+        if letters[j] != '':
+            loopLetters = letters[j][::-1] if reverseLoops else letters[j]
+            cells[j] = loopLetters[0] + "{" + loopLetters[1:] + "}"
+
+    return ''.join(cells)
+
+
+def LoopIndices(loopRow, first, stop):
+    """
+    Returns the indices of the loops of a helix from first to stop
+    (exclusive), relative to first. loopRow is a list, a compact array row
+    or 0 for missing helices.
+    """
+
+    if isinstance(loopRow, list):
+        return [index for index, value in enumerate(loopRow[first:stop]) if value]
+    if hasattr(loopRow, 'nonzero'):
+        return loopRow[first:stop].nonzero()[0].tolist()
+    return []
+
+
+def PrintVisualizer(numStrands, lengthStrands, lookUpScaffold, lookUpStaple, fileName, loop,
+                    helices=None, indices=None):
     """
     Print visual representation of the sequences in cadnano style format.
+    Even helices show the scaffold row first, odd helices the staple row.
+    Only helices and indices in the (start, stop) windows helices and
+    indices are rendered if given, i.e. helices=(10, 20). Every helix is built as one
+    string and written with buffered I/O. The look up tables are lists of
+    helix rows or, for compact designs, lattice.LookUpTable.
     """
 
-    print("Outputting data to " + fileName + "...")
-    outputFile = open(fileName, 'w')
+    logger.info("Outputting data to " + fileName + "...")
 
-    for i in range(numStrands):
-        # Even strands
-        if i % 2 == 0:
-            outputFile.write("Scaffold " + "{:<5}".format(str(i)) + "|")
-            for j in range(lengthStrands):
-                if lookUpScaffold[i][j] == '':
-                    outputFile.write("-")
-                else:
-                    # Check for loop, place sequence between curly brackets
-                    if loop[i][j] == 0:
-                        outputFile.write(lookUpScaffold[i][j])
-                    else:
-                        outputFile.write(lookUpScaffold[i][j][0])
-                        outputFile.write("{")
-                        outputFile.write(lookUpScaffold[i][j][1:])
-                        outputFile.write("}")
-
-            outputFile.write("|\n")
-            outputFile.write("Staple " + "{:<7}".format(str(i)) + "|")
-
-            for j in range(lengthStrands):
-                if lookUpStaple[i][j] == '':
-                    outputFile.write("-")
-                else:
-                    # Check for loop, invert loop sequence if found
-                    if loop[i][j] == 0:
-                        outputFile.write(lookUpStaple[i][j])
-                    else:
-                        reverseLoop = lookUpStaple[i][j][::-1]
-
-                        outputFile.write(reverseLoop[0])
-                        outputFile.write("{")
-                        outputFile.write(reverseLoop[1:])
-                        outputFile.write("}")
-
-            outputFile.write("|\n\n")
-        # Odd strands
-        else:
-            outputFile.write("Staple " + "{:<7}".format(str(i)) + "|")
-
-            for j in range(lengthStrands):
-                if lookUpStaple[i][j] == '':
-                    outputFile.write("-")
-                else:
-                    # Check for loop, place sequence between curly brackets
-                    if loop[i][j] == 0:
-                        outputFile.write(lookUpStaple[i][j])
-                    else:
-                        outputFile.write(lookUpStaple[i][j][0])
-                        outputFile.write("{")
-                        outputFile.write(lookUpStaple[i][j][1:])
-                        outputFile.write("}")
-
-            outputFile.write("|\n")
-            outputFile.write("Scaffold " + "{:<5}".format(str(i)) + "|")
-
-            for j in range(lengthStrands):
-                if lookUpScaffold[i][j] == '':
-                    outputFile.write("-")
-                else:
-                    # Check for loop, invert loop sequence if found
-                    if loop[i][j] == 0:
-                        outputFile.write(lookUpScaffold[i][j])
-                    else:
-                        reverseLoop = lookUpScaffold[i][j][::-1]
-                        outputFile.write(reverseLoop[0])
-                        outputFile.write("{")
-                        outputFile.write(reverseLoop[1:])
-                        outputFile.write("}")
-
-            outputFile.write("|\n\n")
+    firstHelix, stopHelix = helices or (0, numStrands)
+    first, stop = indices or (0, lengthStrands)
+    first, stop = max(first, 0), min(stop, lengthStrands)
 
-    outputFile.close()
+    with open(fileName, 'w', buffering=1 << 20) as outputFile:
+        for i in range(max(firstHelix, 0), min(stopHelix, numStrands)):
+            loopIndices = LoopIndices(loop[i], first, stop)
+
+            scaffoldRow = "Scaffold " + "{:<5}".format(str(i)) + "|"
+            stapleRow = "Staple " + "{:<7}".format(str(i)) + "|"
+
+            # Loops of the second row are shown reversed
+            if i % 2 == 0:
+                rows = (scaffoldRow + RenderRow(lookUpScaffold[i][first:stop], loopIndices, False),
+                        stapleRow + RenderRow(lookUpStaple[i][first:stop], loopIndices, True))
+            else:
+                rows = (stapleRow + RenderRow(lookUpStaple[i][first:stop], loopIndices, False),
+                        scaffoldRow + RenderRow(lookUpScaffold[i][first:stop], loopIndices, True))
 
+            outputFile.write(rows[0] + "|\n" + rows[1] + "|\n\n")
 
-def OutputFiles(scaffoldSequence, stapleSequence, numStrands, lengthStrands, lookUpScaffold, lookUpStaple, fileName, loop):
+
+def OutputFiles(scaffoldSequence, stapleSequence, numStrands, lengthStrands, lookUpScaffold, lookUpStaple, fileName, loop, outputDirectory='',
+                helices=None, indices=None, instrumentation=None):
     """
-    Output files to folder with same name of input json file.
+    Output files to folder with same name of input json file,
+    inside outputDirectory. The visualizer can be limited to a window of
+    helices and indices, see PrintVisualizer. Every writer is recorded as a
+    stage of instrumentation if given.
     """
 
-    directoryName = fileName
+    directoryName = os.path.join(outputDirectory, fileName)
     scaffoldsFileName = "scaffolds_" + fileName + ".txt"
     staplesFileName = "staples_" + fileName + ".txt"
     visualizerFileName = "visualized_sequence_" + fileName + ".txt"
 
     # Sort scaffolds from longest to shortest for printing
-    scaffoldSequence.sort(key = len, reverse=True)
+    scaffoldSequence.sort(key=len, reverse=True)
 
     os.makedirs(directoryName, exist_ok=True)
 
     # Print scaffold file
-    PrintSequence(scaffoldSequence, os.path.join(
-        directoryName, scaffoldsFileName))
+    with Stage(instrumentation, "PrintSequence scaffolds") as counters:
+        PrintSequence(scaffoldSequence, os.path.join(
+            directoryName, scaffoldsFileName))
+        counters['basesWritten'] = sum(len(sequence.sequence) for sequence in scaffoldSequence)
+        counters['bytesWritten'] = os.path.getsize(os.path.join(directoryName, scaffoldsFileName))
 
     # Print staple file
-    PrintSequence(stapleSequence, os.path.join(directoryName, staplesFileName))
+    with Stage(instrumentation, "PrintSequence staples") as counters:
+        PrintSequence(stapleSequence, os.path.join(directoryName, staplesFileName))
+        counters['basesWritten'] = sum(len(sequence.sequence) for sequence in stapleSequence)
+        counters['bytesWritten'] = os.path.getsize(os.path.join(directoryName, staplesFileName))
 
     # Print visualizer file
-    PrintVisualizer(numStrands, lengthStrands, lookUpScaffold,
-                    lookUpStaple, os.path.join(directoryName, visualizerFileName), loop)
+    with Stage(instrumentation, "PrintVisualizer") as counters:
+        PrintVisualizer(numStrands, lengthStrands, lookUpScaffold,
+                        lookUpStaple, os.path.join(directoryName, visualizerFileName), loop,
+                        helices, indices)
+        counters['bytesWritten'] = os.path.getsize(os.path.join(directoryName, visualizerFileName))
 
 
-def main():
+class DesignResult:
     """
-    Main program loop
+    Sequenced design, returned by SequenceDesign.Run. Scaffold and staple
+    sequences are Strands (see domains), scaffolds sorted from longest to
+    shortest. scaffoldRotation holds offset, reverse, score and baselineScore
+    of the scaffold rotation search, if it was run. design holds the lattice
+    of compact designs for incremental runs (see incremental.DesignArrays).
+    """
+
+    def __init__(self, fileName, numStrands, lengthStrands, scaffoldSequence, stapleSequence,
+                 lookUpScaffold, lookUpStaple, loop, warnings, instrumentation=None, scaffoldRotation=None,
+                 skip=None, design=None):
+        self.fileName = fileName
+        self.numStrands = numStrands
+        self.lengthStrands = lengthStrands
+        self.scaffoldSequence = scaffoldSequence
+        self.stapleSequence = stapleSequence
+        self.lookUpScaffold = lookUpScaffold
+        self.lookUpStaple = lookUpStaple
+        self.loop = loop
+        self.warnings = warnings
+        self.instrumentation = instrumentation
+        self.scaffoldRotation = scaffoldRotation
+        self.skip = skip
+        self.design = design
+
+    @property
+    def scaffolds(self):
+        """
+        Scaffolds as (start, end, sequence, length) rows, as in scaffolds.txt.
+        """
+        return [SequenceRow(sequence) for sequence in self.scaffoldSequence]
+
+    @property
+    def staples(self):
+        """
+        Staples as (start, end, sequence, length) rows, as in staples.txt.
+        """
+        return [SequenceRow(sequence) for sequence in self.stapleSequence]
+
+    def StapleReport(self):
+        """
+        Quality table of all staples as dict of column arrays, see
+        staple_report.StapleReport.
+        """
+        from staple_report import StapleReport
+        return StapleReport(self, self.skip)
+
+    def KmerReport(self, k):
+        """
+        Off-target, hairpin and repeat tables of the k-mers of all scaffolds
+        and staples, see kmer_index.KmerReport.
+        """
+        from kmer_index import KmerReport
+        try:
+            return KmerReport(self, k)
+        except ValueError as error:
+            raise SequenceDesignError(str(error)) from error
+
+    def ThermoReport(self, conditions=Conditions(), minAnchorTm=MIN_ANCHOR_TM):
+        """
+        Nearest-neighbour energies and melting temperatures of all staple
+        domains, see thermodynamics.ThermoReport.
+        """
+        from thermodynamics import ThermoReport
+        try:
+            return ThermoReport(self, conditions, minAnchorTm)
+        except ValueError as error:
+            raise SequenceDesignError(str(error)) from error
+
+    def WriteFiles(self, outputDirectory='', helices=None, indices=None, bundle=False, report=None,
+                   kmerLength=None, thermoConditions=None, minAnchorTm=MIN_ANCHOR_TM):
+        """
+        Writes the scaffold, staple and visualizer files to a folder named
+        after the design inside outputDirectory. helices and indices limit the
+        visualizer to a (start, stop) window. If bundle is set, a binary
+        result bundle (see result_bundle) is written next to them, if report
+        is 'csv' or 'npz' a staple quality report (see staple_report), and
+        if kmerLength is given the k-mer tables of that k (see kmer_index).
+        If thermoConditions (thermodynamics.Conditions) are given, the domain
+        and staple tables of ThermoReport are written and staples without a
+        domain melting above minAnchorTm are logged.
+        Writers are recorded in the instrumentation of the run, if any.
+        """
+        OutputFiles(self.scaffoldSequence, self.stapleSequence, self.numStrands,
+                    self.lengthStrands, self.lookUpScaffold, self.lookUpStaple,
+                    self.fileName, self.loop, outputDirectory, helices, indices,
+                    self.instrumentation)
+
+        if bundle:
+            from result_bundle import WriteBundle
+            bundleFileName = os.path.join(outputDirectory, self.fileName, "result_" + self.fileName + ".npz")
+            logger.info("Outputting data to " + bundleFileName + "...")
+            with Stage(self.instrumentation, "WriteBundle") as counters:
+                try:
+                    WriteBundle(self, bundleFileName)
+                except ValueError as error:
+                    raise SequenceDesignError("Can't write result bundle: " + str(error)) from error
+                counters['bytesWritten'] = os.path.getsize(bundleFileName)
+
+        if report is not None:
+            from staple_report import WriteReport
+            with Stage(self.instrumentation, "StapleReport") as counters:
+                reportFileName = WriteReport(self.StapleReport(), os.path.join(outputDirectory, self.fileName),
+                                             self.fileName, report)
+                counters['staples'] = len(self.stapleSequence)
+                counters['bytesWritten'] = os.path.getsize(reportFileName)
+            logger.info("Staple report written to " + reportFileName)
+
+        if kmerLength is not None:
+            from kmer_index import LogKmerReport, WriteKmerReport
+            with Stage(self.instrumentation, "KmerReport") as counters:
+                kmerReport = self.KmerReport(kmerLength)
+                fileNames = WriteKmerReport(kmerReport, os.path.join(outputDirectory, self.fileName), self.fileName)
+                counters['staples'] = len(self.stapleSequence)
+                counters['repeatedKmers'] = len(kmerReport['repeats']['Kmer'])
+            LogKmerReport(kmerReport, kmerLength)
+            logger.info("k-mer report written to " + ", ".join(fileNames))
+
+        if thermoConditions is not None:
+            from thermodynamics import WeakAnchorWarnings, WriteThermoReport
+            with Stage(self.instrumentation, "ThermoReport") as counters:
+                thermoReport = self.ThermoReport(thermoConditions, minAnchorTm)
+                fileNames = WriteThermoReport(thermoReport, os.path.join(outputDirectory, self.fileName),
+                                              self.fileName)
+                counters['domains'] = len(thermoReport['domains']['Staple'])
+                counters['weakAnchors'] = int(thermoReport['staples']['WeakAnchor'].sum())
+            for warning in WeakAnchorWarnings(thermoReport, self.stapleSequence, minAnchorTm):
+                logger.warning(warning)
+            logger.info("Thermodynamics written to " + ", ".join(fileNames))
+
+
+class SequenceDesign:
+    """
+    Reusable sequencing engine. Run sequences a design, raising
+    SequenceDesignError instead of exiting, so many designs can be sequenced
+    in the same process. Every run uses its own random generator seeded with
+    seed, so results don't depend on earlier runs. Generated scaffolds are
+    taken from scaffoldPool (a ScaffoldPool) if given. Parsed designs and their
+    strands are cached in designCache (a DesignCache) if given, which always
+    uses the compact model. If instrumentation (an Instrumentation) is given,
+    wall time, memory and counters of every stage are recorded in it.
+    If rotateScaffold is set, the scaffold sequence of the longest scaffold
+    is rotated to the circular offset (of the sequence or, with rotateReverse,
+    also its reverse complement) giving the best staples, scored on workers
+    processes, see rotation. Rotation uses the compact model.
     """
 
-    # Set random seed
-    random.seed(0)
+    def __init__(self, compact=False, jsonBackend=None, seed=0, scaffoldPool=None, designCache=None,
+                 instrumentation=None, rotateScaffold=False, rotateReverse=False, workers=None):
+        self.compact = compact or rotateScaffold
+        self.jsonBackend = jsonBackend
+        self.seed = seed
+        self.scaffoldPool = scaffoldPool
+        self.designCache = designCache
+        self.instrumentation = instrumentation
+        self.rotateScaffold = rotateScaffold
+        self.rotateReverse = rotateReverse
+        self.workers = workers
+
+    def Stage(self, name):
+        """
+        Returns context recording stage name, see instrumentation.Stage.
+        """
+
+        return Stage(self.instrumentation, name)
+
+    def ParseArrays(self, design, compact):
+        """
+        Parses and validates design. Returns the data of ParseJson.
+        """
+
+        with self.Stage("ParseJson") as counters:
+            numStrands, lengthStrands, scaffolds, staples, fileName, skip, loop = ParseJson(
+                design, compact, self.jsonBackend)
+            counters['helices'] = numStrands
+            counters['cells'] = numStrands * lengthStrands
+
+        # Report all structural problems at once, before any strand is walked
+        with self.Stage("ValidateDesign") as counters:
+            validate = ValidateDesign if IsCompact(scaffolds) else ValidateLists
+            errors, warnings = validate(numStrands, lengthStrands, scaffolds, staples, skip, loop)
+            counters['errors'] = len(errors)
+            counters['warnings'] = len(warnings)
+
+        for warning in warnings:
+            logger.warning(warning)
+        if errors:
+            raise SequenceDesignError("\n".join(errors))
+
+        return numStrands, lengthStrands, scaffolds, staples, fileName, skip, loop
+
+    def ParseDesign(self, design, compact):
+        """
+        Parses design and finds its staples and scaffolds. Returns the data of
+        ParseJson, staple and scaffold start bases and circular scaffolds.
+        """
+
+        numStrands, lengthStrands, scaffolds, staples, fileName, skip, loop = self.ParseArrays(design, compact)
+
+        stapleStartBases, scaffoldStartBase, circularScaffolds = self.FindDesignStrands(
+            scaffolds, staples, numStrands, lengthStrands)
+
+        return (numStrands, lengthStrands, scaffolds, staples, fileName, skip, loop,
+                stapleStartBases, scaffoldStartBase, circularScaffolds)
+
+    def FindDesignStrands(self, scaffolds, staples, numStrands, lengthStrands):
+        """
+        Returns staple and scaffold start bases and circular scaffolds.
+        """
+
+        with self.Stage("FindStrands") as counters:
+            stapleStartBases = FindStartStaples(staples, numStrands, lengthStrands, counters)
+
+            logger.info("Finding scaffolds...")
+            scaffoldStartBase, circularScaffolds = FindStrands(scaffolds, numStrands, lengthStrands, counters)
+            scaffoldStartBase = OrderStartBases(scaffoldStartBase)
+
+            counters['strandsFound'] = len(stapleStartBases) + len(scaffoldStartBase)
+            counters['circularScaffolds'] = len(circularScaffolds)
+
+        return stapleStartBases, scaffoldStartBase, circularScaffolds
+
+    def LoadDesign(self, design):
+        """
+        Parses design and finds its staples and scaffolds, or loads them from
+        the design cache. Returns number of strands, length of strands,
+        scaffolds, staples, name, skip, loop, staple and scaffold start bases.
+        """
+
+        if self.designCache is None:
+            (numStrands, lengthStrands, scaffolds, staples, fileName, skip, loop,
+             stapleStartBases, scaffoldStartBase, circularScaffolds) = self.ParseDesign(design, self.compact)
+            WarnCircularScaffolds(circularScaffolds)
+            return (numStrands, lengthStrands, scaffolds, staples, fileName, skip, loop,
+                    stapleStartBases, scaffoldStartBase)
+
+        from design_cache import DesignHash, StartBaseArray, StartBaseList
+
+        try:
+            designHash = DesignHash(design)
+        except OSError as error:
+            raise SequenceDesignError("Not a valid cadnano json file: " + str(error)) from error
+
+        arrays = self.designCache.Load(designHash)
+
+        if arrays is None:
+            (numStrands, lengthStrands, scaffolds, staples, fileName, skip, loop,
+             stapleStartBases, scaffoldStartBase, circularScaffolds) = self.ParseDesign(design, True)
+            WarnCircularScaffolds(circularScaffolds)
+
+            with self.Stage("DesignCache store"):
+                self.designCache.Store(designHash, {
+                    'scaffolds': scaffolds, 'staples': staples, 'skip': skip, 'loop': loop,
+                    'stapleStartBases': StartBaseArray(stapleStartBases),
+                    'scaffoldStartBases': StartBaseArray(scaffoldStartBase),
+                    'circularScaffolds': StartBaseArray(circularScaffolds),
+                })
+
+        else:
+            logger.info("Loading cached design " + designHash + "...")
+            with self.Stage("DesignCache load") as counters:
+                fileName = DesignName(design)
+                scaffolds, staples = arrays['scaffolds'], arrays['staples']
+                skip, loop = arrays['skip'], arrays['loop']
+                numStrands, lengthStrands = scaffolds.shape[0], scaffolds.shape[1]
+                stapleStartBases = StartBaseList(arrays['stapleStartBases'])
+                scaffoldStartBase = StartBaseList(arrays['scaffoldStartBases'])
+                counters['cells'] = numStrands * lengthStrands
+                counters['strandsFound'] = len(stapleStartBases) + len(scaffoldStartBase)
+            WarnCircularScaffolds(StartBaseList(arrays['circularScaffolds']))
+
+        return (numStrands, lengthStrands, scaffolds, staples, fileName, skip, loop,
+                stapleStartBases, scaffoldStartBase)
+
+    def Run(self, design, scaffoldSequence, fileName=None):
+        """
+        Sequences design (path to json file, its bytes or the decoded dict)
+        with scaffoldSequence assigned to the longest scaffold.
+        Returns DesignResult, named fileName if given.
+        """
+
+        # Load json data, find staples and scaffolds
+        return self.Sequence(self.LoadDesign(design), scaffoldSequence, fileName)
+
+    def Sequence(self, loadedDesign, scaffoldSequence, fileName=None):
+        """
+        Sequences a design returned by LoadDesign, which can be sequenced
+        again with other scaffolds. Returns DesignResult, see Run.
+        """
+
+        rng = random.Random(self.seed)
+
+        (numStrands, lengthStrands, scaffolds, staples, designName, skip, loop,
+         stapleStartBases, scaffoldStartBase) = loadedDesign
+
+        # Lattice kept with the results, so the next run can be incremental
+        designArrays = None
+        if IsCompact(scaffolds):
+            from incremental import DesignArrays, ScaffoldKey
+            from lattice import LatticeError, LookUpTable, ScaffoldLetterLattice, ScaffoldLookUpTable
+            from rotation import BestRotation, RotateSequence, RotationIndex
+
+            designArrays = DesignArrays(scaffolds, staples, skip, loop, scaffoldStartBase, ScaffoldKey(
+                scaffoldSequence, self.seed, self.rotateScaffold, self.rotateReverse))
+
+        # Initialize look up tables, compact designs keep offsets into the letters instead
+        if IsCompact(scaffolds):
+            lookUpScaffold = None
+            lookUpStaple = LookUpTable(numStrands, lengthStrands)
+        else:
+            lookUpScaffold = CreateLookUpTable(numStrands, lengthStrands)
+            lookUpStaple = CreateLookUpTable(numStrands, lengthStrands)
+
+        # Returns scaffolds sequence
+        logger.info("Generating scaffold sequences...")
+        with self.Stage("FindLength") as counters:
+            if IsCompact(scaffolds):
+                length, paths, scaffoldDomains, prefix = PathLengths(scaffolds, scaffoldStartBase, skip, loop)
+                length = length.tolist()
+                counters['domains'] = len(scaffoldDomains.helix)
+            else:
+                length = FindLength(scaffolds, scaffoldStartBase, skip, loop, counters)
+            counters['scaffolds'] = len(length)
+            counters['letters'] = int(sum(length))
+
+        # Scaffold file is checked before any letter is assigned
+        inputSequences = ScaffoldInputSequences(
+            length, scaffoldSequence, rng, self.scaffoldPool)
+
+        # Scaffold letters of compact designs, to gather the staples from
+        letterLattice = None
+        if IsCompact(scaffolds):
+            try:
+                letterLattice = ScaffoldLetterLattice(
+                    scaffolds, skip, loop, scaffoldStartBase, inputSequences, paths)
+            except LatticeError as error:
+                raise SequenceDesignError(str(error)) from error
+
+        # Rotate the longest scaffold to the offset giving the best staples
+        scaffoldRotation = None
+        if letterLattice is not None and self.rotateScaffold:
+            with self.Stage("RotateScaffold") as counters:
+                mainIndex = length.index(max(length))
+                rotationIndex = RotationIndex(letterLattice, staples, stapleStartBases, mainIndex)
+                offset, reverse, score, baselineScore = BestRotation(
+                    rotationIndex, inputSequences[mainIndex], self.rotateReverse, self.workers)
+
+                inputSequences[mainIndex] = RotateSequence(inputSequences[mainIndex], offset, reverse)
+                letterLattice = ScaffoldLetterLattice(
+                    scaffolds, skip, loop, scaffoldStartBase, inputSequences, paths)
+
+                scaffoldRotation = {'offset': offset, 'reverse': reverse,
+                                    'score': score, 'baselineScore': baselineScore}
+                counters['offsets'] = len(inputSequences[mainIndex]) * (2 if self.rotateReverse else 1)
+                counters['lettersScored'] = counters['offsets'] * len(rotationIndex.fixed)
+
+            logger.info("Rotated scaffold by " + str(offset) + " bases" +
+                        (" (reverse complement)" if reverse else "") +
+                        ", staple penalty " + "{:g}".format(baselineScore) + " -> " + "{:g}".format(score))
+
+        with self.Stage("AssignScaffolds") as counters:
+            if letterLattice is not None:
+                scaffoldSequence = LatticeScaffoldSequences(letterLattice, scaffoldDomains, prefix, inputSequences)
+                lookUpScaffold = ScaffoldLookUpTable(letterLattice, numStrands, lengthStrands)
+            else:
+                scaffoldSequence = AssignScaffoldSequences(
+                    scaffolds, scaffoldStartBase, inputSequences, lookUpScaffold, skip, loop, counters)
+
+            counters['strands'] = len(scaffoldSequence)
+            counters['basesAssigned'] = sum(len(sequence.sequence) for sequence in scaffoldSequence)
+
+        # Returns staple sequences
+        with self.Stage("AssignStaples") as counters:
+            stapleSequence = FindStapleSequences(
+                staples, stapleStartBases, lookUpScaffold, lookUpStaple, letterLattice, counters)
+            counters['strands'] = len(stapleSequence)
+            counters['basesAssigned'] = sum(len(sequence.sequence) for sequence in stapleSequence)
+
+        # Verifying staples
+        with self.Stage("VerifyStaples") as counters:
+            warnings = VerifyStaples(stapleSequence)
+            counters['staples'] = len(stapleSequence)
+            counters['warnings'] = len(warnings)
+
+        # Sort scaffolds from longest to shortest
+        scaffoldSequence.sort(key=len, reverse=True)
+
+        return DesignResult(fileName or designName, numStrands, lengthStrands, scaffoldSequence,
+                            stapleSequence, lookUpScaffold, lookUpStaple, loop, warnings,
+                            self.instrumentation, scaffoldRotation, skip, designArrays)
+
+    def Resequence(self, design, scaffoldSequence, previous, fileName=None):
+        """
+        Sequences an edited design against the result bundle of a previous
+        run (see result_bundle), which stores the lattice of compact designs.
+        Scaffolds keep the letters of the previous run and only staples with
+        a changed base (pointer, skip or loop) are traversed and sequenced
+        again, the others are taken from the bundle. If the scaffolds changed,
+        or the bundle has no lattice, the design is sequenced from scratch.
+        Returns DesignResult and the staple changes and number of unchanged
+        staples, see incremental.StapleChanges.
+        """
+
+        import numpy as np
+        from lattice import LatticeError, LookUpTable, ScaffoldLetterLattice, ScaffoldLookUpTable
+        from incremental import (ChangedStaples, DesignArrays, PreviousStapleIndex, ReusedStapleCells,
+                                 ScaffoldChange, ScaffoldKey, StapleChanges)
+
+        numStrands, lengthStrands, scaffolds, staples, designName, skip, loop = self.ParseArrays(design, True)
+
+        scaffoldKey = ScaffoldKey(scaffoldSequence, self.seed, self.rotateScaffold, self.rotateReverse)
+        reason = ScaffoldChange(previous, scaffolds, skip, loop, scaffoldKey)
+
+        if reason is not None:
+            logger.info("Sequencing from scratch, " + reason)
+            stapleStartBases, scaffoldStartBase, circularScaffolds = self.FindDesignStrands(
+                scaffolds, staples, numStrands, lengthStrands)
+            WarnCircularScaffolds(circularScaffolds)
+            result = self.Sequence((numStrands, lengthStrands, scaffolds, staples, designName, skip, loop,
+                                    stapleStartBases, scaffoldStartBase), scaffoldSequence, fileName)
+            return result, StapleChanges(previous, result.stapleSequence)
+
+        lookUpStaple = LookUpTable(numStrands, lengthStrands)
+
+        # Scaffolds are unchanged, their start bases and letters are those of the previous run
+        with self.Stage("FindStrands") as counters:
+            scaffoldStartBase = previous.designScaffoldStartBases.tolist()
+            stapleStartBases = FindStartStaples(staples, numStrands, lengthStrands, counters)
+            starts = np.array(stapleStartBases, dtype=np.int64).reshape(-1, 2)
+            counters['strandsFound'] = len(stapleStartBases) + len(scaffoldStartBase)
+
+        with self.Stage("DiffDesign") as counters:
+            changed = ChangedStaples(previous, staples, skip, loop, starts)
+            previousIndex = PreviousStapleIndex(previous, starts, lengthStrands)
+            reused = ~changed & (previousIndex >= 0)
+            counters['changedStaples'] = int(np.count_nonzero(~reused))
+
+        logger.info("Sequencing " + str(int(np.count_nonzero(~reused))) + " of " + str(len(starts)) +
+                    " staples again...")
+
+        with self.Stage("AssignScaffolds") as counters:
+            previousSequences = dict(zip((tuple(base) for base in previous.scaffoldsCoordinates[:, :2].tolist()),
+                                         previous.Sequences('scaffolds')))
+            inputSequences = [previousSequences[tuple(base)] for base in scaffoldStartBase]
+
+            _, paths, scaffoldDomains, prefix = PathLengths(scaffolds, scaffoldStartBase, skip, loop)
+            try:
+                letterLattice = ScaffoldLetterLattice(
+                    scaffolds, skip, loop, scaffoldStartBase, inputSequences, paths)
+            except LatticeError as error:
+                raise SequenceDesignError(str(error)) from error
+            scaffoldSequence = LatticeScaffoldSequences(letterLattice, scaffoldDomains, prefix, inputSequences)
+            lookUpScaffold = ScaffoldLookUpTable(letterLattice, numStrands, lengthStrands)
+            counters['strands'] = len(scaffoldSequence)
+
+        with self.Stage("AssignStaples") as counters:
+            stapleSequence = [None] * len(starts)
+
+            changedIndices = np.flatnonzero(~reused).tolist()
+            if changedIndices:
+                logger.info("Generating staple sequences...")
+                gathered = GatherStapleSequences(staples, [stapleStartBases[i] for i in changedIndices],
+                                                 lookUpStaple, letterLattice)
+                for i, strand in zip(changedIndices, gathered):
+                    stapleSequence[i] = strand
+
+            reusedIndices = np.flatnonzero(reused)
+            strands = previous.Strands('staples', previousIndex[reusedIndices].tolist())
+            cells, text, counts = ReusedStapleCells(previous, previousIndex[reusedIndices], strands,
+                                                    letterLattice, lengthStrands)
+            lookUpStaple.Fill(cells, text, counts)
+            for i, strand in zip(reusedIndices.tolist(), strands):
+                stapleSequence[i] = strand
+
+            counters['strands'] = len(changedIndices)
+            counters['reusedStrands'] = len(strands)
+
+        with self.Stage("VerifyStaples") as counters:
+            warnings = VerifyStaples(stapleSequence)
+            counters['staples'] = len(stapleSequence)
+            counters['warnings'] = len(warnings)
+
+        scaffoldSequence.sort(key=len, reverse=True)
+
+        result = DesignResult(fileName or designName, numStrands, lengthStrands, scaffoldSequence,
+                              stapleSequence, lookUpScaffold, lookUpStaple, loop, warnings,
+                              self.instrumentation, None, skip,
+                              DesignArrays(scaffolds, staples, skip, loop, scaffoldStartBase, scaffoldKey))
+
+        return result, StapleChanges(previous, stapleSequence, reused)
+
+
+def ParseRange(text):
+    """
+    Parses START:STOP window of the visualizer, either may be left out.
+    """
 
-    # Load json data
-    numStrands, lengthStrands, scaffolds, staples, fileName, skip, loop = ParseJson()
+    try:
+        start, stop = text.split(":")
+        return int(start or 0), int(stop) if stop else sys.maxsize
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected START:STOP, got " + repr(text))
 
-    # Initialize look up table for scaffold
-    lookUpScaffold = CreateLookUpTable(numStrands, lengthStrands)
-    lookUpStaple = CreateLookUpTable(numStrands, lengthStrands)
+
+def ArgumentParser(prog="seq_designer.py",
+                   description="Sequence scaffold and staple strands of a cadnano design."):
+    """
+    Returns parser of the command line arguments, shared with seq_client.py.
+    """
+
+    parser = argparse.ArgumentParser(prog=prog, description=description)
+    parser.add_argument("json", help="cadnano json file")
+    parser.add_argument("scaffold", help="scaffold sequence file")
+    parser.add_argument("--compact", action="store_true",
+                        help="load design into compact NumPy arrays")
+    parser.add_argument("--json-backend", default=None,
+                        help="json backend: stream, ijson, orjson or json")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't use the design cache (~/.cache/seq_designer/designs)")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="clear the design cache before running")
+    parser.add_argument("--scaffold-pool", nargs="?", const="", default=None, metavar="DIR",
+                        help="reuse generated scaffolds stored in DIR (default: ~/.cache/seq_designer/scaffolds)")
+    parser.add_argument("--helices", type=ParseRange, default=None, metavar="START:STOP",
+                        help="only visualize helices START to STOP (exclusive)")
+    parser.add_argument("--indices", type=ParseRange, default=None, metavar="START:STOP",
+                        help="only visualize indices START to STOP (exclusive)")
+    parser.add_argument("--bundle", action="store_true",
+                        help="also write a binary result bundle (result_<name>.npz)")
+    parser.add_argument("--staple-report", choices=("csv", "npz"), default=None,
+                        help="also write a staple quality table (staple_report_<name>.csv or .npz)")
+    parser.add_argument("--kmer-report", nargs="?", type=int, const=DEFAULT_K, default=None, metavar="K",
+                        help="also write off-target, hairpin and repeat tables of k-mers (default K: " +
+                             str(DEFAULT_K) + ")")
+    parser.add_argument("--thermo-report", action="store_true",
+                        help="also write nearest-neighbour Tm and free energy of every staple domain")
+    parser.add_argument("--sodium", type=float, default=Conditions().sodium, metavar="M",
+                        help="Na+ concentration in mol/l for --thermo-report (default: %(default)g)")
+    parser.add_argument("--magnesium", type=float, default=Conditions().magnesium, metavar="M",
+                        help="Mg2+ concentration in mol/l for --thermo-report (default: %(default)g)")
+    parser.add_argument("--strand-concentration", type=float, default=Conditions().concentration, metavar="M",
+                        help="staple concentration in mol/l for --thermo-report (default: %(default)g)")
+    parser.add_argument("--min-anchor-tm", type=float, default=MIN_ANCHOR_TM, metavar="C",
+                        help="warn about staples without a domain melting above C (default: %(default)g)")
+    parser.add_argument("--incremental", nargs="?", const="", default=None, metavar="BUNDLE",
+                        help="only sequence staples changed since the run that wrote BUNDLE again "
+                             "(default: <name>/result_<name>.npz), implies --compact and --bundle")
+    parser.add_argument("--rotate", action="store_true",
+                        help="rotate the scaffold sequence to the offset giving the best staples")
+    parser.add_argument("--rotate-reverse", action="store_true",
+                        help="like --rotate, also trying the reverse complement of the scaffold")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes scoring scaffold rotations (default: number of cores)")
+    parser.add_argument("--stats", default=None, metavar="FILE",
+                        help="write wall time, memory and counters of every stage to json FILE")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="with --stats, also trace peak memory of every stage with tracemalloc (slow)")
+    parser.add_argument("--profile", default=None, metavar="FILE",
+                        help="profile the run with cProfile, stats are dumped to FILE")
+
+    return parser
+
+
+def ParseArguments(argv=None):
+    """
+    Parses command line arguments.
+    """
+
+    return ArgumentParser().parse_args(argv)
+
+
+def UseListModel(args, design):
+    """
+    Returns whether design (path to json file) is small enough to be
+    sequenced with the list model without NumPy, see SMALL_DESIGN_BYTES.
+    Options needing the compact model or NumPy anyway always use it.
+    """
+
+    if not isinstance(design, (str, os.PathLike)):
+        return False
+    if (args.compact or args.bundle or args.incremental is not None or args.rotate or args.rotate_reverse
+            or args.staple_report or args.kmer_report is not None or args.thermo_report):
+        return False
+
+    try:
+        return os.path.getsize(design) < SMALL_DESIGN_BYTES
+    except OSError:
+        return False
+
+
+def RunDesign(args, design=None, scaffoldSequence=None, designCache=None, outputDirectory='', fileName=None):
+    """
+    Runs seq_designer.py with parsed arguments and writes all outputs into
+    outputDirectory. design and scaffoldSequence default to the files given
+    in args, designCache (see design_cache) to the one chosen by args, and
+    the design is named fileName if given. Returns DesignResult.
+    """
 
     # Load raw scaffold sequence
-    rawScaffoldSequence = RawScaffoldSequence()
+    if scaffoldSequence is None:
+        scaffoldSequence = RawScaffoldSequence(args.scaffold)
+    if design is None:
+        design = args.json
+    name = fileName or DesignName(design)
+
+    # Pool of generated scaffolds
+    scaffoldPool = None
+    if args.scaffold_pool is not None:
+        from scaffold_pool import ScaffoldPool
+        scaffoldPool = ScaffoldPool(args.scaffold_pool or None)
+
+    # Cache of parsed designs, small designs are parsed faster than NumPy is imported
+    if designCache is None and (args.clear_cache or not (args.no_cache or UseListModel(args, design))):
+        from design_cache import DesignCache
+        designCache = DesignCache()
+    if designCache is not None and args.clear_cache:
+        designCache.Clear()
+    if args.no_cache:
+        designCache = None
+
+    # Conditions of the thermodynamics report
+    thermoConditions = None
+    if args.thermo_report:
+        thermoConditions = Conditions(args.sodium, args.magnesium, args.strand_concentration)
+
+    # Stage records
+    instrumentation = None
+    if args.stats is not None:
+        instrumentation = Instrumentation(traceMemory=args.trace_memory)
+
+    # Sequence design, seeded with 0
+    engine = SequenceDesign(args.compact, args.json_backend, seed=0,
+                            scaffoldPool=scaffoldPool, designCache=designCache,
+                            instrumentation=instrumentation,
+                            rotateScaffold=args.rotate or args.rotate_reverse,
+                            rotateReverse=args.rotate_reverse, workers=args.workers)
+
+    # Bundle of the previous run, incremental runs write the next one
+    previous = None
+    bundle = args.bundle
+    if args.incremental is not None:
+        engine.compact = True
+        bundle = True
+        bundlePath = args.incremental or os.path.join(outputDirectory, name, "result_" + name + ".npz")
+        if os.path.exists(bundlePath):
+            from result_bundle import LoadBundle
+            previous = LoadBundle(bundlePath)
+        else:
+            logger.info("No previous run at " + bundlePath + ", sequencing from scratch")
+
+    with Profile(args.profile):
+        if previous is not None:
+            result, (changes, unchanged) = engine.Resequence(design, scaffoldSequence, previous, fileName)
+        else:
+            result = engine.Run(design, scaffoldSequence, fileName)
 
-    # Find staples
-    stapleStartBases = FindStartStaples(
-        staples, numStrands, lengthStrands)
+        # IO
+        result.WriteFiles(outputDirectory, helices=args.helices, indices=args.indices, bundle=bundle,
+                          report=args.staple_report, kmerLength=args.kmer_report,
+                          thermoConditions=thermoConditions, minAnchorTm=args.min_anchor_tm)
 
-    # Find scaffolds
-    scaffoldStartBase = FindStartScaffolds(
-        scaffolds, numStrands, lengthStrands, lookUpScaffold)
+    if previous is not None:
+        from incremental import LogChanges, WriteChangeReport
+        changeFileName = os.path.join(outputDirectory, result.fileName, "changes_" + result.fileName + ".csv")
+        WriteChangeReport(changes, changeFileName)
+        LogChanges(changes, unchanged)
+        logger.info("Changes written to " + changeFileName)
 
-    # Returns scaffolds sequence
-    scaffoldSequence = FindScaffoldSequences(
-        scaffolds, scaffoldStartBase, rawScaffoldSequence, lookUpScaffold, skip, loop)
+    if instrumentation is not None:
+        instrumentation.WriteJson(args.stats)
+
+    return result
+
+
+def main(argv=None):
+    """
+    Main program loop
+    """
 
-    # Returns staple sequences
-    stapleSequence = FindStapleSequences(
-        staples, stapleStartBases, lookUpScaffold, lookUpStaple)
+    args = ParseArguments(argv)
 
-    # Verifying staples
-    VerifyStaples(stapleSequence)
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
 
-    # IO
-    OutputFiles(scaffoldSequence, stapleSequence, numStrands,
-                lengthStrands, lookUpScaffold, lookUpStaple, fileName, loop)
+    try:
+        RunDesign(args)
+    except SequenceDesignError as error:
+        sys.exit(str(error))
 
-    print("Done!")
+    logger.info("Done!")
 
 
-time_start = time.time()
-main()
-time_elapsed = (time.time() - time_start)
-print("Time elapsed: " + str(time_elapsed) + " seconds")
+if __name__ == "__main__":
+    time_start = time.time()
+    main()
+    time_elapsed = (time.time() - time_start)
+    print("Time elapsed: " + str(time_elapsed) + " seconds")
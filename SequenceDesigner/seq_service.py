@@ -0,0 +1,348 @@
+import os
+import sys
+import json
+import time
+import base64
+import logging
+import argparse
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from seq_designer import SequenceDesignError, RawScaffoldSequence, RunDesign
+from design_cache import DesignCache
+
+
+logger = logging.getLogger("seq_designer")
+
+# Address of the service, see seq_client.py
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Entries kept by every worker process
+DESIGN_CACHE_SIZE = 32
+SCAFFOLD_CACHE_SIZE = 8
+
+# Scaffold files looked up by name, next to this file
+SCAFFOLD_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scaffold_files")
+
+# Caches of this (worker) process, set once by SetCaches
+workerState = {}
+
+
+class LRUCache:
+    """
+    Dict keeping the maxSize most recently used entries.
+    """
+
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def Get(self, key):
+        """
+        Returns the entry of key, or None if it isn't cached.
+        """
+
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def Put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def Clear(self):
+        self.entries.clear()
+
+
+class MemoryDesignCache:
+    """
+    Design cache (see design_cache.DesignCache) holding the arrays of the
+    most recently used designs in memory, in front of the on-disk cache.
+    """
+
+    def __init__(self, maxSize, diskCache=None):
+        self.designs = LRUCache(maxSize)
+        self.diskCache = diskCache
+
+    def Load(self, designHash):
+        arrays = self.designs.Get(designHash)
+        if arrays is None and self.diskCache is not None:
+            arrays = self.diskCache.Load(designHash)
+            if arrays is not None:
+                self.designs.Put(designHash, arrays)
+        return arrays
+
+    def Store(self, designHash, arrays):
+        self.designs.Put(designHash, arrays)
+        if self.diskCache is not None:
+            self.diskCache.Store(designHash, arrays)
+
+    def Clear(self):
+        self.designs.Clear()
+        if self.diskCache is not None:
+            self.diskCache.Clear()
+
+
+def SetCaches(designCacheSize, scaffoldCacheSize, diskCache):
+    """
+    Creates the design and scaffold caches of a worker process. Its log
+    goes to the requests only, see SequenceRequest.
+    """
+
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    workerState['designs'] = MemoryDesignCache(designCacheSize, DesignCache() if diskCache else None)
+    workerState['scaffolds'] = LRUCache(scaffoldCacheSize)
+
+
+def ScaffoldPath(scaffold, scaffoldDirectory=SCAFFOLD_DIRECTORY):
+    """
+    Returns path of a scaffold file, given as path or as name of a file in
+    scaffoldDirectory.
+    """
+
+    if os.path.isfile(scaffold) or os.path.dirname(scaffold):
+        return scaffold
+    return os.path.join(scaffoldDirectory, scaffold)
+
+
+def CachedScaffold(path):
+    """
+    Returns scaffold sequence of a file, read again once the file changed.
+    """
+
+    try:
+        status = os.stat(path)
+    except OSError as error:
+        raise SequenceDesignError("Can't read scaffold file: " + str(error)) from error
+
+    key = (os.path.abspath(path), status.st_mtime_ns, status.st_size)
+    scaffoldSequence = workerState['scaffolds'].Get(key)
+    if scaffoldSequence is None:
+        scaffoldSequence = RawScaffoldSequence(path)
+        workerState['scaffolds'].Put(key, scaffoldSequence)
+    return scaffoldSequence
+
+
+class LogRecords(logging.Handler):
+    """
+    Collects the level and message of every record logged during a request,
+    with paths relative to the output directory of the request.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.outputDirectory = None
+
+    def emit(self, record):
+        message = record.getMessage()
+        if self.outputDirectory is not None:
+            message = message.replace(self.outputDirectory + os.sep, '')
+        self.records.append((record.levelno, message))
+
+
+def Encode(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def Decode(text):
+    return base64.b64decode(text.encode('ascii'))
+
+
+def SequenceRequest(request):
+    """
+    Sequences a request of seq_client.py in a worker process: the cadnano
+    json (text), its name, the scaffold (path or name) and the parsed
+    arguments of seq_designer.py. All outputs are written to a temporary
+    directory and returned in-band. Returns the response: the files (base64,
+    by path relative to the output directory), the scaffold and staple
+    tables, the warnings and the log, or the error.
+    """
+
+    handler = LogRecords()
+    logger.addHandler(handler)
+    response = {}
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="seq_service") as directory:
+            outputDirectory = os.path.join(directory, "output")
+            handler.outputDirectory = outputDirectory
+            args = argparse.Namespace(**request['args'])
+            name = request['name']
+
+            # Previous bundle of incremental runs is sent by the client
+            if args.incremental is not None:
+                args.incremental = ""
+                if request.get('bundle') is not None:
+                    os.makedirs(os.path.join(outputDirectory, name), exist_ok=True)
+                    with open(os.path.join(outputDirectory, name, "result_" + name + ".npz"), 'wb') as file:
+                        file.write(Decode(request['bundle']))
+
+            # Stats and profile are sent back as well
+            if args.stats is not None:
+                args.stats = os.path.join(directory, "stats.json")
+            if args.profile is not None:
+                args.profile = os.path.join(directory, "profile.prof")
+
+            # Rotations are scored serially, requests are served in parallel already
+            if args.workers is None:
+                args.workers = 1
+
+            scaffoldSequence = CachedScaffold(ScaffoldPath(args.scaffold))
+            result = RunDesign(args, request['design'].encode(), scaffoldSequence,
+                               workerState['designs'], outputDirectory, name)
+
+            files = {}
+            for fileDirectory, _, fileNames in os.walk(outputDirectory):
+                for fileName in fileNames:
+                    path = os.path.join(fileDirectory, fileName)
+                    with open(path, 'rb') as file:
+                        files[os.path.relpath(path, outputDirectory)] = Encode(file.read())
+
+            for key in ('stats', 'profile'):
+                if getattr(args, key) is not None:
+                    with open(getattr(args, key), 'rb') as file:
+                        response[key] = Encode(file.read())
+
+        response['files'] = files
+        response['scaffolds'] = result.scaffolds
+        response['staples'] = result.staples
+        response['warnings'] = result.warnings
+
+    except SequenceDesignError as error:
+        response['error'] = str(error)
+
+    finally:
+        logger.removeHandler(handler)
+
+    response['log'] = handler.records
+    response['cache'] = {'designHits': workerState['designs'].designs.hits,
+                         'designMisses': workerState['designs'].designs.misses}
+
+    return response
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    Serves POST /sequence (json request, see SequenceRequest) and GET /status.
+    """
+
+    def SendJson(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/status":
+            self.SendJson(404, {'error': "unknown path " + self.path})
+            return
+        self.SendJson(200, {'workers': self.server.workers, 'requests': self.server.requests,
+                            'uptime': time.time() - self.server.started})
+
+    def do_POST(self):
+        if self.path != "/sequence":
+            self.SendJson(404, {'error': "unknown path " + self.path})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError as error:
+            self.SendJson(400, {'error': "Not a valid request: " + str(error)})
+            return
+
+        timeStart = time.perf_counter()
+        try:
+            response = self.server.executor.submit(SequenceRequest, request).result()
+        except Exception as error:
+            self.SendJson(500, {'error': "Request failed: " + repr(error)})
+            return
+
+        with self.server.lock:
+            self.server.requests += 1
+        logger.info(request.get('name', '?') + ": " + ("error" if 'error' in response else "ok") +
+                    " in " + "{:.3f}".format(time.perf_counter() - timeStart) + " s")
+        self.SendJson(200, response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def Serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, designCacheSize=DESIGN_CACHE_SIZE,
+          scaffoldCacheSize=SCAFFOLD_CACHE_SIZE, diskCache=True):
+    """
+    Serves requests on host:port until interrupted, sequencing them on a
+    pool of worker processes (all cores if workers is None).
+    """
+
+    workers = workers or os.cpu_count()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=SetCaches,
+                             initargs=(designCacheSize, scaffoldCacheSize, diskCache)) as executor:
+        server = ThreadingHTTPServer((host, port), ServiceHandler)
+        server.executor = executor
+        server.workers = workers
+        server.requests = 0
+        server.started = time.time()
+        server.lock = threading.Lock()
+
+        logger.info("Serving on http://" + host + ":" + str(server.server_address[1]) +
+                    " with " + str(server.workers) + " workers")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+def ParseArguments(argv=None):
+    """
+    Parses command line arguments.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="seq_service.py", description="Serve seq_designer.py to seq_client.py from warm worker processes.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes (default: number of cores)")
+    parser.add_argument("--design-cache-size", type=int, default=DESIGN_CACHE_SIZE, metavar="N",
+                        help="designs kept in memory by every worker (default: %(default)s)")
+    parser.add_argument("--scaffold-cache-size", type=int, default=SCAFFOLD_CACHE_SIZE, metavar="N",
+                        help="scaffold files kept in memory by every worker (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't use the design cache (~/.cache/seq_designer/designs) behind the memory cache")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the service.
+    """
+
+    args = ParseArguments(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+
+    Serve(args.host, args.port, args.workers, args.design_cache_size, args.scaffold_cache_size,
+          not args.no_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import numpy as np
+
+
+BASES = "ACGT"
+
+# Base letters as ascii codes, in order of BASES
+BASE_CODES = np.frombuffer(BASES.encode('ascii'), dtype=np.uint8)
+
+# Padding of batches, shorter sequences are filled up with it
+PAD = 0
+
+
+def encode_sequences(sequences):
+    """
+    Encodes a list of sequences (str or bytes) as a uint8 batch of ascii codes,
+    one row per sequence, padded with PAD. Returns batch and lengths.
+    """
+
+    sequences = [seq.encode('ascii') if isinstance(seq, str) else bytes(seq)
+                 for seq in sequences]
+    lengths = np.fromiter((len(seq) for seq in sequences), dtype=np.int64, count=len(sequences))
+
+    width = int(lengths.max()) if len(sequences) > 0 else 0
+    batch = np.full((len(sequences), width), PAD, dtype=np.uint8)
+
+    # Scatter all letters at once, using the row and column of every letter
+    letters = np.frombuffer(b''.join(sequences), dtype=np.uint8)
+    rows = np.repeat(np.arange(len(sequences)), lengths)
+    columns = np.arange(len(letters)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    batch[rows, columns] = letters
+
+    return batch, lengths
+
+
+def batch_lengths(batch):
+    """
+    Returns lengths of the sequences in batch, the number of non padding codes.
+    """
+
+    return np.count_nonzero(batch != PAD, axis=1)
+
+
+def gc_fraction(batch, lengths=None):
+    """
+    Returns GC fraction of every sequence in batch, 0 for empty sequences.
+    """
+
+    if lengths is None:
+        lengths = batch_lengths(batch)
+
+    gc_count = np.count_nonzero((batch == ord('G')) | (batch == ord('C')), axis=1)
+
+    return gc_count / np.maximum(lengths, 1)
+
+
+def run_lengths(mask):
+    """
+    Returns for every position the length of the run of true values of mask
+    (along the last axis) ending at that position, 0 where mask is false.
+    """
+
+    count = np.cumsum(mask, axis=-1, dtype=np.int64)
+
+    # Count at the last false position before (or at) every position
+    reset = np.maximum.accumulate(np.where(mask, 0, count), axis=-1)
+
+    return count - reset
+
+
+def longest_runs(batch, bases=BASES):
+    """
+    Returns (number of sequences, number of bases) array with the longest run
+    of every base in every sequence of batch.
+    """
+
+    runs = np.zeros((len(batch), len(bases)), dtype=np.int64)
+
+    if batch.shape[-1] == 0:
+        return runs
+
+    for i, base in enumerate(bases):
+        runs[:, i] = run_lengths(batch == ord(base)).max(axis=-1)
+
+    return runs
+
+
+def longest_run(batch, base):
+    """
+    Returns longest run of a single base in every sequence of batch.
+    """
+
+    return longest_runs(batch, base)[:, 0]
+
+
+def windowed_gc(batch, window, lengths=None):
+    """
+    Returns (number of sequences, width - window + 1) array with the GC fraction
+    of every window of given size. Windows extending past the end of a
+    sequence are nan.
+    """
+
+    if window < 1:
+        raise ValueError("window must be at least 1, got " + str(window))
+
+    if lengths is None:
+        lengths = batch_lengths(batch)
+
+    width = batch.shape[-1]
+    if window > width:
+        return np.full((len(batch), 0), np.nan)
+
+    is_gc = (batch == ord('G')) | (batch == ord('C'))
+    count = np.zeros((len(batch), width + 1), dtype=np.int64)
+    np.cumsum(is_gc, axis=1, out=count[:, 1:])
+
+    fraction = (count[:, window:] - count[:, :-window]) / window
+
+    # Windows starting at or after length - window + 1 run past the end
+    starts = np.arange(width - window + 1)
+    fraction[starts[None, :] > (lengths[:, None] - window)] = np.nan
+
+    return fraction
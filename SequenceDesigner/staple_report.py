@@ -0,0 +1,181 @@
+import os
+import numpy as np
+from rotation import MAX_HOMOPOLYMER
+from seq_stats import BASES, run_lengths
+from validation import CompactArray
+
+
+# Columns of the staple quality report, in order
+COLUMNS = ('Staple', 'StartHelix', 'StartIndex', 'EndHelix', 'EndIndex', 'Length', 'Domains', 'GC',
+           'LongestA', 'LongestC', 'LongestG', 'LongestT', 'PolyNRuns', 'UnpairedA',
+           'Skips', 'Loops', 'LoopBases')
+
+# Runs of a single base longer than MAX_HOMOPOLYMER are counted as poly-N runs
+POLY_N_LENGTH = MAX_HOMOPOLYMER + 1
+
+
+def DomainArrays(strands):
+    """
+    Returns strand number, helix, lowest and highest index of every domain
+    of a list of Strands.
+    """
+
+    table = np.array([(i, domain.helix, min(domain.start, domain.end), max(domain.start, domain.end))
+                      for i, strand in enumerate(strands) for domain in strand.domains],
+                     dtype=np.int64).reshape(-1, 4)
+
+    return table[:, 0], table[:, 1], table[:, 2], table[:, 3]
+
+
+def HelixPrefixSums(values):
+    """
+    Returns (H, L+1) cumulative sums of (H, L) values along every helix, so
+    a domain from lo to hi sums to prefix[h, hi+1] - prefix[h, lo].
+    """
+
+    prefix = np.zeros((values.shape[0], values.shape[1] + 1), dtype=np.int64)
+    np.cumsum(values, axis=1, out=prefix[:, 1:])
+    return prefix
+
+
+def DomainSums(prefix, strand, helix, lo, hi, numStrands):
+    """
+    Returns per strand sums of the values summed in prefix over its domains.
+    """
+
+    return np.bincount(strand, weights=prefix[helix, hi + 1] - prefix[helix, lo],
+                       minlength=numStrands).astype(np.int64)
+
+
+def ScaffoldCoverage(scaffoldSequence, numStrands, lengthStrands):
+    """
+    Returns (H, L) boolean array of the bases covered by a scaffold.
+    """
+
+    _, helix, lo, hi = DomainArrays(scaffoldSequence)
+
+    # Difference array: +1 at the start of every domain, -1 after its end
+    change = np.zeros((numStrands, lengthStrands + 1), dtype=np.int64)
+    np.add.at(change, (helix, lo), 1)
+    np.add.at(change, (helix, hi + 1), -1)
+
+    return np.cumsum(change, axis=1)[:, :-1] > 0
+
+
+def SequenceColumns(sequences):
+    """
+    Returns length, GC fraction, longest homopolymer of every base and number
+    of poly-N runs of every sequence, from a single pass over all letters.
+    """
+
+    lengths = np.fromiter((len(sequence) for sequence in sequences), dtype=np.int64, count=len(sequences))
+    letters = np.frombuffer(''.join(sequences).encode('ascii'), dtype=np.uint8)
+    owner = np.repeat(np.arange(len(sequences)), lengths)
+    starts = np.cumsum(lengths) - lengths
+
+    columns = {'Length': lengths}
+
+    isGC = (letters == ord('G')) | (letters == ord('C'))
+    columns['GC'] = np.bincount(owner, weights=isGC, minlength=len(sequences)) / np.maximum(lengths, 1)
+
+    # Homopolymer length ending at every letter, runs don't continue into the next sequence
+    same = letters[1:] == letters[:-1]
+    same[starts[(starts > 0) & (starts < len(letters))] - 1] = False
+    run = np.ones(len(letters), dtype=np.int64)
+    run[1:] += run_lengths(same)
+
+    nonEmpty = lengths > 0
+    for base in BASES:
+        longest = np.zeros(len(sequences), dtype=np.int64)
+        if len(letters) > 0:
+            baseRun = np.where(letters == ord(base), run, 0)
+            longest[nonEmpty] = np.maximum.reduceat(baseRun, starts[nonEmpty])
+        columns['Longest' + base] = longest
+
+    # Every run reaching POLY_N_LENGTH passes it exactly once
+    columns['PolyNRuns'] = np.bincount(owner[run == POLY_N_LENGTH], minlength=len(sequences))
+
+    return columns
+
+
+def StapleReport(result, skip):
+    """
+    Returns quality table of the staples of a DesignResult as dict of
+    column arrays (see COLUMNS), one row per staple in the order of
+    staples.txt. UnpairedA counts staple bases without a scaffold, which
+    are filled with 'A'. Skips, Loops and LoopBases count the skips, loop
+    bases and letters inserted by loops on every staple. skip is the skip
+    data of the design (list or compact model).
+    """
+
+    staples = result.stapleSequence
+    numStrands, lengthStrands = result.numStrands, result.lengthStrands
+
+    skip = skip if getattr(skip, 'ndim', 0) == 2 else CompactArray(skip, numStrands, lengthStrands, 0, "skip", [])
+    loop = result.loop
+    loop = loop if getattr(loop, 'ndim', 0) == 2 else CompactArray(loop, numStrands, lengthStrands, 0, "loop", [])
+
+    strand, helix, lo, hi = DomainArrays(staples)
+
+    report = {
+        'Staple': np.arange(len(staples)),
+    }
+    coordinates = np.array([staple.startBase + staple.endBase for staple in staples],
+                           dtype=np.int64).reshape(-1, 4)
+    report['StartHelix'], report['StartIndex'], report['EndHelix'], report['EndIndex'] = coordinates.T
+
+    report.update(SequenceColumns([staple.sequence for staple in staples]))
+    report['Domains'] = np.bincount(strand, minlength=len(staples))
+
+    # Skip and loop values the sequencer ignores are left out, as in the sequences
+    isSkip = skip == -1
+    isLoop = (skip == 0) & (loop > 0)
+    covered = ScaffoldCoverage(result.scaffoldSequence, numStrands, lengthStrands)
+
+    for column, values in (('UnpairedA', ~covered), ('Skips', isSkip), ('Loops', isLoop),
+                           ('LoopBases', np.where(isLoop, loop, 0))):
+        report[column] = DomainSums(HelixPrefixSums(values), strand, helix, lo, hi, len(staples))
+
+    return {column: report[column] for column in COLUMNS}
+
+
+def WriteReportCsv(report, fileName):
+    """
+    Writes a staple report as csv table.
+    """
+
+    rows = [report[column].tolist() if column != 'GC' else
+            ["{:.4f}".format(gc) for gc in report[column].tolist()] for column in COLUMNS]
+
+    with open(fileName, 'w') as file:
+        file.write(",".join(COLUMNS) + "\n")
+        file.writelines(",".join(map(str, row)) + "\n" for row in zip(*rows))
+
+
+def WriteReportNpz(report, fileName):
+    """
+    Writes a staple report as .npz file with one array per column.
+    """
+
+    with open(fileName, 'wb') as file:
+        np.savez(file, **report)
+
+
+# Writer and file extension of every report format
+REPORT_FORMATS = {
+    'csv': (WriteReportCsv, '.csv'),
+    'npz': (WriteReportNpz, '.npz'),
+}
+
+
+def WriteReport(report, outputDirectory, name, reportFormat='csv'):
+    """
+    Writes a staple report as staple_report_<name>.csv or .npz into
+    outputDirectory. Returns the file name.
+    """
+
+    writer, extension = REPORT_FORMATS[reportFormat]
+    fileName = os.path.join(outputDirectory, "staple_report_" + name + extension)
+    writer(report, fileName)
+
+    return fileName
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+
+# Modules of the designer live next to this folder, not in a package
+DESIGNER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DESIGNER_DIR)
+
+
+@pytest.fixture
+def designerDir():
+    return DESIGNER_DIR
+
+
+@pytest.fixture
+def jsonFile():
+    return lambda name: os.path.join(DESIGNER_DIR, "json_files", name + ".json")
+
+
+@pytest.fixture
+def m13():
+    from seq_designer import RawScaffoldSequence
+    return RawScaffoldSequence(os.path.join(DESIGNER_DIR, "scaffold_files", "M13mp18"))
@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+
+from result_bundle import LoadBundle, PackSequence, UnpackSequence, WriteBundle
+from seq_designer import SequenceDesign
+
+
+@pytest.fixture(params=[False, True], ids=["list", "compact"])
+def result(request, jsonFile, m13):
+    return SequenceDesign(compact=request.param, seed=0).Run(jsonFile("Sphere"), m13)
+
+
+def test_round_trip(result, tmp_path):
+    path = os.path.join(str(tmp_path), "result.npz")
+    WriteBundle(result, path)
+    bundle = LoadBundle(path)
+
+    assert (bundle.numStrands, bundle.lengthStrands) == (result.numStrands, result.lengthStrands)
+    for kind, strands in (('scaffolds', result.scaffoldSequence), ('staples', result.stapleSequence)):
+        assert bundle.Count(kind) == len(strands)
+        assert bundle.Sequences(kind) == [strand.sequence for strand in strands]
+        assert bundle.Strands(kind) == strands
+        assert [strand.sequence for strand in bundle.Strands(kind)] == [strand.sequence for strand in strands]
+
+        coordinates = [strand.startBase + strand.endBase for strand in strands]
+        assert getattr(bundle, kind + 'Coordinates').tolist() == coordinates
+
+        for i in (0, len(strands) - 1):
+            assert bundle.Sequence(kind, i) == strands[i].sequence
+            assert bundle.Strand(kind, i) == strands[i]
+            assert bundle.Strand(kind, i).sequence == strands[i].sequence
+
+    indices = [3, 0, 7]
+    assert bundle.Strands('staples', indices) == [result.stapleSequence[i] for i in indices]
+
+    # Only compact runs keep the lattice for incremental runs
+    assert bundle.HasDesign() == (result.design is not None)
+
+
+@pytest.mark.parametrize("letters", [b"", b"A", b"ACGT", b"TTGCA" * 13])
+def test_pack_sequence(letters):
+    packed = PackSequence(letters)
+
+    for start, stop in ((0, len(letters)), (1, len(letters)), (0, len(letters) // 2), (5, 9)):
+        assert UnpackSequence(packed, start, stop) == letters[start:stop].decode('ascii')
+
+
+def test_pack_invalid_letter():
+    with pytest.raises(ValueError):
+        PackSequence(b"ACGTX")
+
+
+def test_version_mismatch(result, tmp_path):
+    path = os.path.join(str(tmp_path), "result.npz")
+    WriteBundle(result, path)
+
+    with np.load(path) as data:
+        arrays = dict(data)
+    arrays['version'] = arrays['version'] + 1
+    np.savez(path, **arrays)
+
+    with pytest.raises(ValueError):
+        LoadBundle(path)
@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from seq_designer import SequenceDesign
+
+
+OUTPUTS = ("scaffolds_", "staples_", "visualized_sequence_")
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["list", "compact"])
+@pytest.mark.parametrize("name", ["Sphere", "Cuboctahedron_1.5"])
+def test_shipped_outputs(name, compact, designerDir, jsonFile, m13, tmp_path):
+    result = SequenceDesign(compact=compact, seed=0).Run(jsonFile(name), m13)
+    result.WriteFiles(str(tmp_path))
+
+    for output in OUTPUTS:
+        fileName = output + name + ".txt"
+        with open(os.path.join(designerDir, name, fileName)) as expected, \
+                open(os.path.join(str(tmp_path), name, fileName)) as written:
+            assert written.read() == expected.read(), fileName
+
+
+@pytest.mark.parametrize("name", ["small_onebreak_loop", "small_onebreak_deletion", "tube_twobreak"])
+def test_list_and_compact_agree(name, jsonFile, m13):
+    listResult = SequenceDesign(compact=False, seed=0).Run(jsonFile(name), m13)
+    compactResult = SequenceDesign(compact=True, seed=0).Run(jsonFile(name), m13)
+
+    assert compactResult.scaffolds == listResult.scaffolds
+    assert compactResult.staples == listResult.staples
+    assert compactResult.stapleSequence == listResult.stapleSequence
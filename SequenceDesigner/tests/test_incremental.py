@@ -0,0 +1,75 @@
+import json
+import os
+import random
+
+import pytest
+
+from incremental import StapleChanges
+from result_bundle import LoadBundle, WriteBundle
+from seq_designer import SequenceDesign
+
+
+def RemoveBonds(design, count, seed):
+    """
+    Returns a copy of design with count staple bonds between neighbouring
+    bases of a helix removed, splitting those staples.
+    """
+
+    design = json.loads(json.dumps(design))
+    rng = random.Random(seed)
+
+    bonds = [(vstrand, index) for vstrand in design['vstrands']
+             for index, base in enumerate(vstrand['stap'])
+             if base[2] == vstrand['num'] and base[3] == index + 1]
+    for vstrand, index in rng.sample(bonds, count):
+        vstrand['stap'][index][2:] = [-1, -1]
+        vstrand['stap'][index + 1][:2] = [-1, -1]
+
+    return design
+
+
+def Outputs(result, directory):
+    result.WriteFiles(directory)
+    outputs = {}
+    for output in ("scaffolds_", "staples_", "visualized_sequence_"):
+        with open(os.path.join(directory, result.fileName, output + result.fileName + ".txt")) as file:
+            outputs[output] = file.read()
+    return outputs
+
+
+@pytest.fixture
+def sphere(jsonFile):
+    with open(jsonFile("Sphere")) as file:
+        return json.load(file)
+
+
+@pytest.fixture
+def previous(sphere, m13, tmp_path):
+    path = os.path.join(str(tmp_path), "result.npz")
+    WriteBundle(SequenceDesign(compact=True, seed=0).Run(sphere, m13, "Sphere"), path)
+    return LoadBundle(path)
+
+
+@pytest.mark.parametrize("count", [0, 3, 20])
+def test_equals_full_run(count, sphere, previous, m13, tmp_path):
+    edited = RemoveBonds(sphere, count, count)
+
+    full = SequenceDesign(compact=True, seed=0).Run(edited, m13, "Sphere")
+    incremental, (changes, unchanged) = SequenceDesign(seed=0).Resequence(edited, m13, previous, "Sphere")
+
+    assert incremental.scaffolds == full.scaffolds
+    assert incremental.staples == full.staples
+    assert incremental.stapleSequence == full.stapleSequence
+    assert Outputs(incremental, str(tmp_path / "incremental")) == Outputs(full, str(tmp_path / "full"))
+
+    # Changes found from the reused staples are those of comparing every staple
+    assert (changes, unchanged) == StapleChanges(previous, full.stapleSequence)
+    assert (len(changes) == 0) == (count == 0)
+
+
+def test_changed_scaffold_sequenced_from_scratch(sphere, previous, m13):
+    incremental, _ = SequenceDesign(seed=1).Resequence(sphere, m13, previous, "Sphere")
+    full = SequenceDesign(compact=True, seed=1).Run(sphere, m13, "Sphere")
+
+    assert incremental.scaffolds == full.scaffolds
+    assert incremental.staples == full.staples
@@ -0,0 +1,140 @@
+import random
+from collections import Counter
+
+import pytest
+
+from kmer_index import (KmerIndex, KmerReport, KmerText, HairpinStems, OffTargetMatches, PackKmers,
+                        RepeatedKmers, ScaffoldOverlaps, MAX_K)
+from seq_designer import SequenceDesign
+
+
+COMPLEMENT = str.maketrans("ACGT", "TGCA")
+
+
+def ReverseComplement(sequence):
+    return sequence.translate(COMPLEMENT)[::-1]
+
+
+def Windows(sequence, k):
+    """
+    Returns offset and k-mer of every window without other letters than ACGT.
+    """
+
+    return [(i, sequence[i:i + k]) for i in range(len(sequence) - k + 1)
+            if set(sequence[i:i + k]) <= set("ACGT")]
+
+
+def BruteForceStaples(scaffolds, staples, k, minLoop):
+    scaffoldCount = Counter(kmer for scaffold in scaffolds for _, kmer in Windows(scaffold, k))
+    stapleKmers = [set(kmer for _, kmer in Windows(staple, k)) for staple in staples]
+
+    rows = {column: [] for column in ('Kmers', 'OffTargetKmers', 'MaxScaffoldSites', 'StapleMatchKmers',
+                                       'PartnerStaple', 'HairpinStems', 'LongestStem')}
+    for s, staple in enumerate(staples):
+        windows = Windows(staple, k)
+        sites = [scaffoldCount[ReverseComplement(kmer)] for _, kmer in windows]
+        partners = [[t for t in range(len(staples)) if t != s and ReverseComplement(kmer) in stapleKmers[t]]
+                    for _, kmer in windows]
+
+        rows['Kmers'].append(len(windows))
+        rows['OffTargetKmers'].append(sum(site > 1 for site in sites))
+        rows['MaxScaffoldSites'].append(max(sites, default=0))
+        rows['StapleMatchKmers'].append(sum(bool(partner) for partner in partners))
+        rows['PartnerStaple'].append(min((min(partner) for partner in partners if partner), default=-1))
+
+        # Pairs of a k-mer and its reverse complement further along, one stem per diagonal run
+        pairs = {(a, b) for a, kmer in windows for b, other in windows
+                 if b >= a + k + minLoop and other == ReverseComplement(kmer)}
+        stems = []
+        for a, b in pairs:
+            if (a - 1, b + 1) not in pairs:
+                run = 1
+                while (a + run, b - run) in pairs:
+                    run += 1
+                stems.append(k + run - 1)
+        rows['HairpinStems'].append(len(stems))
+        rows['LongestStem'].append(max(stems, default=0))
+
+    return rows
+
+
+def BruteForceScaffolds(scaffolds, k):
+    kmers = [set(kmer for _, kmer in Windows(scaffold, k)) for scaffold in scaffolds]
+
+    rows = []
+    for i in range(len(scaffolds)):
+        for j in range(i, len(scaffolds)):
+            rows.append((i, j, 0 if i == j else len(kmers[i] & kmers[j]),
+                         sum(ReverseComplement(kmer) in kmers[j] for kmer in kmers[i])))
+    return rows
+
+
+def BruteForceRepeats(scaffolds, staples, k, threshold):
+    scaffoldCount = Counter(kmer for scaffold in scaffolds for _, kmer in Windows(scaffold, k))
+    stapleCount = Counter(kmer for staple in staples for _, kmer in Windows(staple, k))
+    total = scaffoldCount + stapleCount
+
+    repeated = sorted((kmer for kmer, count in total.items() if count >= threshold),
+                      key=lambda kmer: (-total[kmer], kmer))
+    return [(kmer, total[kmer], scaffoldCount[kmer], stapleCount[kmer]) for kmer in repeated]
+
+
+def AssertTables(scaffolds, staples, k, minLoop=3, threshold=4):
+    index = KmerIndex(scaffolds, staples, k)
+
+    staplesTable = OffTargetMatches(index)
+    staplesTable.update(HairpinStems(index, minLoop))
+    for column, values in BruteForceStaples(scaffolds, staples, k, minLoop).items():
+        assert staplesTable[column].tolist() == values, column
+
+    scaffoldTable = ScaffoldOverlaps(index)
+    assert list(zip(*(scaffoldTable[column].tolist() for column in
+                      ('ScaffoldA', 'ScaffoldB', 'SharedKmers', 'ComplementaryKmers')))) == \
+        BruteForceScaffolds(scaffolds, k)
+
+    repeats = RepeatedKmers(index, threshold)
+    assert list(zip(repeats['Kmer'].tolist(), repeats['Count'].tolist(), repeats['ScaffoldCount'].tolist(),
+                    repeats['StapleCount'].tolist())) == BruteForceRepeats(scaffolds, staples, k, threshold)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("k", [2, 4, 5])
+def test_random_sequences(seed, k):
+    # Few letters of a small alphabet, so matches, stems and repeats are common
+    rng = random.Random(seed)
+
+    def Sequence(length):
+        return ''.join(rng.choice("AACGTTN" if seed % 2 else "ACGT") for _ in range(length))
+
+    scaffolds = [Sequence(rng.randrange(40, 80)) for _ in range(3)]
+    staples = [Sequence(rng.randrange(0, 30)) for _ in range(12)]
+
+    AssertTables(scaffolds, staples, k)
+
+
+@pytest.mark.parametrize("k", [6, 8])
+def test_design_report(k, jsonFile, m13):
+    result = SequenceDesign(compact=True, seed=0).Run(jsonFile("Sphere"), m13)
+    scaffolds = [strand.sequence for strand in result.scaffoldSequence]
+    staples = [strand.sequence for strand in result.stapleSequence]
+
+    AssertTables(scaffolds, staples, k)
+
+    report = KmerReport(result, k)
+    assert report['staples']['Staple'].tolist() == list(range(len(staples)))
+    assert report['staples']['Kmers'].sum() == sum(max(len(staple) - k + 1, 0) for staple in staples)
+
+
+def test_pack_kmers():
+    kmers, reverse, owner, offset = PackKmers(["ACGTA", "GGNCC", "T"], 3)
+
+    assert KmerText(kmers, 3) == ["ACG", "CGT", "GTA"]
+    assert KmerText(reverse, 3) == ["CGT", "ACG", "TAC"]
+    assert owner.tolist() == [0, 0, 0]
+    assert offset.tolist() == [0, 1, 2]
+
+
+@pytest.mark.parametrize("k", [0, MAX_K + 1])
+def test_k_out_of_range(k):
+    with pytest.raises(ValueError):
+        PackKmers(["ACGT"], k)
@@ -0,0 +1,132 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from cadnano_loader import (IterVstrandsJson, IterVstrandsStream, JSON_BACKENDS, LoadJson, LoadVstrands,
+                            RegisterJsonBackend, ScanNumStrands)
+from seq_designer import ParseJson
+from validation import CompactArray
+
+
+DESIGNS = ["Sphere", "small_onebreak_loop", "nozerostrand_withbreak"]
+
+
+def AsArrays(loaded):
+    """
+    Returns loaded data of either model as compact arrays.
+    """
+
+    numStrands, lengthStrands, scaffolds, staples, skip, loop = loaded
+    return (numStrands, lengthStrands,
+            CompactArray(scaffolds, numStrands, lengthStrands, 4, "scaffold", []),
+            CompactArray(staples, numStrands, lengthStrands, 4, "staple", []),
+            CompactArray(skip, numStrands, lengthStrands, 0, "skip", []),
+            CompactArray(loop, numStrands, lengthStrands, 0, "loop", []))
+
+
+def AssertSame(loaded, expected):
+    for a, b in zip(AsArrays(loaded), AsArrays(expected)):
+        assert np.array_equal(a, b)
+
+
+@pytest.mark.parametrize("name", DESIGNS)
+@pytest.mark.parametrize("compact", [False, True], ids=["list", "compact"])
+def test_backends_agree(name, compact, jsonFile):
+    expected = LoadJson(jsonFile(name), compact, 'json')
+
+    for backend in ('stream', 'json'):
+        AssertSame(LoadJson(jsonFile(name), compact, backend), expected)
+
+
+@pytest.mark.parametrize("backend", ['ijson', 'orjson'])
+def test_optional_backends_agree(backend, jsonFile):
+    pytest.importorskip(backend)
+
+    for compact in (False, True):
+        AssertSame(LoadJson(jsonFile("Sphere"), compact, backend), LoadJson(jsonFile("Sphere"), compact, 'json'))
+
+
+def test_registered_backend(jsonFile):
+    calls = []
+
+    def IterVstrandsCounted(file):
+        calls.append(file)
+        yield from IterVstrandsJson(file)
+
+    RegisterJsonBackend('counted', IterVstrandsCounted)
+    try:
+        AssertSame(LoadJson(jsonFile("Sphere"), True, 'counted'), LoadJson(jsonFile("Sphere"), True, 'json'))
+    finally:
+        del JSON_BACKENDS['counted']
+    assert len(calls) == 1
+
+
+def test_unknown_backend(jsonFile):
+    with pytest.raises(ValueError):
+        LoadJson(jsonFile("Sphere"), False, 'nope')
+
+
+@pytest.mark.parametrize("name", DESIGNS)
+def test_list_and_compact_agree(name, jsonFile):
+    compact = LoadJson(jsonFile(name), True, 'stream')
+    assert compact[2].dtype == np.int32 and compact[4].dtype == np.int16
+    AssertSame(compact, LoadJson(jsonFile(name), False, 'stream'))
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["list", "compact"])
+def test_path_bytes_and_dict_agree(compact, jsonFile):
+    path = jsonFile("Sphere")
+    with open(path, 'rb') as file:
+        content = file.read()
+
+    expected = ParseJson(path, compact)
+    for design in (content, json.loads(content)):
+        parsed = ParseJson(design, compact)
+        AssertSame(parsed[:4] + parsed[5:], expected[:4] + expected[5:])
+
+
+@pytest.mark.parametrize("chunkSize", [1, 7, 64, 1 << 20])
+def test_stream_chunks(chunkSize, jsonFile):
+    with open(jsonFile("small_onebreak_loop"), 'rb') as file:
+        content = file.read()
+
+    assert list(IterVstrandsStream(io.BytesIO(content), chunkSize)) == json.loads(content)['vstrands']
+
+
+@pytest.mark.parametrize("chunkSize", [1, 5, 13, 64, 1 << 20])
+def test_scan_num_strands(chunkSize, jsonFile):
+    for name in DESIGNS:
+        with open(jsonFile(name), 'rb') as file:
+            content = file.read()
+        expected = max(vstrand['num'] for vstrand in json.loads(content)['vstrands']) + 1
+
+        assert ScanNumStrands(io.BytesIO(content), chunkSize) == expected
+
+
+def test_scan_num_strands_split_number():
+    # A number cut at the end of a chunk is only counted once complete
+    content = b'{"vstrands": [{"num": 1234}]}'
+    for chunkSize in range(1, len(content) + 1):
+        assert ScanNumStrands(io.BytesIO(content), chunkSize) == 1235
+    assert ScanNumStrands(io.BytesIO(b'{"vstrands": []}')) is None
+
+
+def test_compact_capacity(jsonFile):
+    # A helix count that is too low makes the arrays grow, too high is cut off
+    with open(jsonFile("Sphere")) as file:
+        vstrands = json.load(file)['vstrands']
+    expected = LoadVstrands(vstrands, True)
+
+    for numStrands in (1, expected[0] + 10):
+        loaded = LoadVstrands(iter(vstrands), True, numStrands)
+        assert loaded[0] == expected[0]
+        AssertSame(loaded, expected)
+    AssertSame(LoadVstrands(iter(vstrands), True), expected)
+
+
+def test_no_vstrands():
+    for compact in (False, True):
+        with pytest.raises(ValueError):
+            LoadVstrands([], compact)
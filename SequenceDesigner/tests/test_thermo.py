@@ -0,0 +1,107 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from report_defaults import Conditions
+from seq_designer import SequenceDesign
+from thermodynamics import DomainEnergies, NEAREST_NEIGHBOURS, R, TERMINAL, ThermoReport
+
+
+def BruteForceEnergies(domain, conditions):
+    """
+    Returns enthalpy, entropy, free energy and melting temperature of a
+    single domain, summed pair by pair.
+    """
+
+    if len(domain) < 2:
+        return (math.nan,) * 4
+
+    enthalpy = sum(NEAREST_NEIGHBOURS[domain[i:i + 2]][0] for i in range(len(domain) - 1))
+    entropy = sum(NEAREST_NEIGHBOURS[domain[i:i + 2]][1] for i in range(len(domain) - 1))
+    for terminal in (domain[0], domain[-1]):
+        enthalpy += TERMINAL[terminal][0]
+        entropy += TERMINAL[terminal][1]
+
+    sodium = conditions.sodium + 0.12 * math.sqrt(conditions.magnesium * 1000)
+    entropy += 0.368 * (len(domain) - 1) * math.log(sodium)
+
+    freeEnergy = enthalpy - (conditions.temperature + 273.15) * entropy / 1000
+    meltingTemperature = 1000 * enthalpy / (entropy + R * math.log(conditions.concentration / 4)) - 273.15
+
+    return enthalpy, entropy, freeEnergy, meltingTemperature
+
+
+def Bounds(domains):
+    return np.cumsum([0] + [len(domain) for domain in domains])
+
+
+@pytest.mark.parametrize("conditions", [Conditions(), Conditions(0.05, 0.0, 250e-9, 25.0)])
+@pytest.mark.parametrize("seed", range(4))
+def test_domain_energies(seed, conditions):
+    rng = random.Random(seed)
+    domains = [''.join(rng.choice("ACGT") for _ in range(rng.randrange(0, 25))) for _ in range(30)]
+    letters = np.frombuffer(''.join(domains).encode('ascii'), dtype=np.uint8)
+
+    energies = DomainEnergies(letters, Bounds(domains), conditions)
+
+    for i, domain in enumerate(domains):
+        expected = BruteForceEnergies(domain, conditions)
+        np.testing.assert_allclose([values[i] for values in energies], expected, rtol=1e-9)
+
+
+def test_domain_energies_rows():
+    # One row per candidate sequence of the same domains
+    rng = random.Random(0)
+    rows = [''.join(rng.choice("ACGT") for _ in range(40)) for _ in range(5)]
+    bounds = np.array([0, 7, 8, 21, 40])
+    letters = np.frombuffer(''.join(rows).encode('ascii'), dtype=np.uint8).reshape(5, 40)
+
+    energies = DomainEnergies(letters, bounds)
+
+    for r, row in enumerate(rows):
+        single = DomainEnergies(letters[r], bounds)
+        for values, expected in zip(energies, single):
+            np.testing.assert_array_equal(values[r], expected)
+
+
+def test_invalid_letters():
+    with pytest.raises(ValueError):
+        DomainEnergies(np.frombuffer(b"ACGN", dtype=np.uint8), np.array([0, 4]))
+    with pytest.raises(ValueError):
+        DomainEnergies(np.frombuffer(b"ACGT", dtype=np.uint8), np.array([0, 4]), Conditions(0.0, 0.0))
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["list", "compact"])
+def test_report(compact, jsonFile, m13):
+    result = SequenceDesign(compact=compact, seed=0).Run(jsonFile("Sphere"), m13)
+    report = ThermoReport(result, Conditions(), 45.0)
+    domains, staples = report['domains'], report['staples']
+
+    # Segments hold every letter of every staple, in order
+    for s, staple in enumerate(result.stapleSequence):
+        rows = np.flatnonzero(domains['Staple'] == s)
+        assert domains['Length'][rows].sum() == len(staple.sequence)
+        assert domains['Domain'][rows].max() == len(staple.domains) - 1
+
+    # Energies of binding segments only
+    binding = domains['Binding'] == 1
+    assert np.all(domains['Length'][binding] >= 2)
+    assert np.all(np.isnan(domains['Tm'][~binding]))
+    assert not np.any(np.isnan(domains['Tm'][binding]))
+
+    # Staple table from the domain table, one staple at a time
+    for s in range(len(result.stapleSequence)):
+        rows = np.flatnonzero((domains['Staple'] == s) & binding)
+        if len(rows) == 0:
+            assert np.isnan(staples['AnchorTm'][s]) and staples['WeakAnchor'][s] == 1
+            continue
+
+        anchor = rows[np.argmax(domains['Tm'][rows])]
+        assert staples['AnchorTm'][s] == domains['Tm'][anchor]
+        assert staples['AnchorDeltaG'][s] == domains['DeltaG'][anchor]
+        assert staples['MinTm'][s] == domains['Tm'][rows].min()
+        assert staples['TotalDeltaG'][s] == pytest.approx(domains['DeltaG'][rows].sum())
+        assert staples['BindingDomains'][s] == len(set(domains['Domain'][rows].tolist()))
+        assert staples['WeakAnchor'][s] == int(domains['Tm'][anchor] < 45.0)
@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+
+from validation import MAX_REPORTED, ValidateDesign, ValidateLists
+
+
+LENGTH = 8
+
+
+def Path(bases):
+    """
+    Returns strand data of two helices holding a single strand through
+    bases, a list of (helix, index) in 5' to 3' order.
+    """
+
+    strand = [[[-1, -1, -1, -1] for _ in range(LENGTH)] for _ in range(2)]
+    for i, (helix, index) in enumerate(bases):
+        if i > 0:
+            strand[helix][index][:2] = bases[i - 1]
+        if i < len(bases) - 1:
+            strand[helix][index][2:] = bases[i + 1]
+    return strand
+
+
+def Design():
+    """
+    Returns scaffolds, staples, skip and loop of a valid design: a scaffold
+    up helix 0 and down helix 1, and a staple the other way around.
+    """
+
+    up0 = [(0, i) for i in range(LENGTH)]
+    down1 = [(1, i) for i in reversed(range(LENGTH))]
+    up1 = [(1, i) for i in range(LENGTH)]
+    down0 = [(0, i) for i in reversed(range(LENGTH))]
+
+    return Path(up0 + down1), Path(up1 + down0), [[0] * LENGTH for _ in range(2)], [[0] * LENGTH for _ in range(2)]
+
+
+def Validate(scaffolds, staples, skip, loop):
+    """
+    Validates with both models, which must agree. Returns errors and warnings.
+    """
+
+    listResult = ValidateLists(2, LENGTH, scaffolds, staples, skip, loop)
+    arrayResult = ValidateDesign(2, LENGTH, np.array(scaffolds, dtype=np.int32), np.array(staples, dtype=np.int32),
+                                 np.array(skip, dtype=np.int16), np.array(loop, dtype=np.int16))
+    assert listResult == arrayResult
+
+    return listResult
+
+
+def test_valid():
+    assert Validate(*Design()) == ([], [])
+
+
+def test_pointer_out_of_range():
+    scaffolds, staples, skip, loop = Design()
+    scaffolds[0][3][2:] = [5, 4]
+    staples[1][2][:2] = [1, LENGTH]
+
+    errors, _ = Validate(scaffolds, staples, skip, loop)
+    assert "Error: scaffold at 0[3] has next base out of range" in errors
+    assert "Error: staple at 1[2] has previous base out of range" in errors
+
+
+def test_pointers_disagree():
+    scaffolds, staples, skip, loop = Design()
+    scaffolds[0][3][2:] = [0, 5]
+
+    errors, _ = Validate(scaffolds, staples, skip, loop)
+    assert "Error: scaffold at 0[3] and its next base don't point to each other" in errors
+
+
+def test_pointer_into_empty_base():
+    scaffolds, staples, skip, loop = Design()
+    staples[0][0] = [-1, -1, -1, -1]
+
+    errors, _ = Validate(scaffolds, staples, skip, loop)
+    assert "Error: staple at 0[1] and its next base don't point to each other" in errors
+
+
+def test_missing_helix():
+    scaffolds, staples, skip, loop = Design()
+    listErrors, _ = ValidateLists(2, LENGTH, [scaffolds[0], 0], [staples[0], 0], [skip[0], 0], [loop[0], 0])
+    arrayErrors, _ = ValidateDesign(2, LENGTH, [scaffolds[0], 0], [staples[0], 0], [skip[0], 0], [loop[0], 0])
+
+    assert listErrors == arrayErrors
+    assert "Error: scaffold at 0[7] has next base on an empty or missing helix" in listErrors
+
+
+def test_staple_without_breakpoint():
+    scaffolds, staples, skip, loop = Design()
+    staples[1][0][:2] = [0, 0]
+    staples[0][0][2:] = [1, 0]
+
+    errors, _ = Validate(scaffolds, staples, skip, loop)
+    assert errors == ["Error: staple at 0[0] does not have a breakpoint"]
+
+
+def test_no_scaffold():
+    _, staples, skip, loop = Design()
+    empty = [[[-1, -1, -1, -1] for _ in range(LENGTH)] for _ in range(2)]
+
+    errors, _ = Validate(empty, staples, skip, loop)
+    assert errors == ["No scaffolds found"]
+
+
+def test_no_staples():
+    scaffolds, _, skip, loop = Design()
+    empty = [[[-1, -1, -1, -1] for _ in range(LENGTH)] for _ in range(2)]
+
+    assert Validate(scaffolds, empty, skip, loop) == ([], ["Warning: no staples found"])
+
+
+def test_skip_and_loop():
+    scaffolds, staples, skip, loop = Design()
+    skip[0][1] = 2
+    loop[1][2] = -1
+    skip[1][3], loop[1][3] = -1, 2
+
+    errors, warnings = Validate(scaffolds, staples, skip, loop)
+    assert errors == ["Error: base 0[1] has an invalid skip value, there is a skip and loop in the same index"]
+    assert warnings == ["Warning: base 1[2] has a negative loop, it is ignored",
+                        "Warning: base 1[3] has both a skip and a loop, the loop is ignored"]
+
+
+def test_staple_skip():
+    scaffolds, staples, skip, loop = Design()
+    empty = [[-1, -1, -1, -1] for _ in range(LENGTH)]
+    skip[1][5] = 3
+
+    _, warnings = Validate([scaffolds[0], empty], staples, skip, loop)
+    assert "Warning: staple base 1[5] has an invalid skip value, it is ignored" in warnings
+
+
+def test_reported_bases_are_limited():
+    scaffolds, staples, skip, loop = Design()
+    for index in range(LENGTH):
+        loop[0][index] = loop[1][index] = -1
+
+    _, warnings = Validate(scaffolds, staples, skip, loop)
+    assert len(warnings) == MAX_REPORTED + 1
+    assert warnings[-1] == "... and " + str(2 * LENGTH - MAX_REPORTED) + " more like the above"
+
+
+@pytest.mark.parametrize("name", ["no_scaffold", "small_nobreak", "tube_nobreak", "Sphere"])
+def test_designs(name, jsonFile):
+    from cadnano_loader import LoadJson
+
+    listResult = ValidateLists(*LoadJson(jsonFile(name), False, 'json'))
+    assert ValidateDesign(*LoadJson(jsonFile(name), True, 'json')) == listResult
+    assert (len(listResult[0]) == 0) == (name in ("small_nobreak", "tube_nobreak", "Sphere"))
@@ -0,0 +1,277 @@
+import os
+import logging
+import numpy as np
+from result_bundle import BASE_CODE, BASES
+from report_defaults import MIN_ANCHOR_TM, Conditions
+from lattice import LetterPrefixSums
+from staple_report import DomainArrays, ScaffoldCoverage
+from validation import CompactArray
+
+
+logger = logging.getLogger("seq_designer")
+
+# Unified nearest-neighbour parameters (SantaLucia 1998) of every 5'-3' dinucleotide
+# of a duplex: enthalpy in kcal/mol and entropy in cal/(K mol)
+NEAREST_NEIGHBOURS = {
+    'AA': (-7.9, -22.2), 'TT': (-7.9, -22.2),
+    'AT': (-7.2, -20.4),
+    'TA': (-7.2, -21.3),
+    'CA': (-8.5, -22.7), 'TG': (-8.5, -22.7),
+    'GT': (-8.4, -22.4), 'AC': (-8.4, -22.4),
+    'CT': (-7.8, -21.0), 'AG': (-7.8, -21.0),
+    'GA': (-8.2, -22.2), 'TC': (-8.2, -22.2),
+    'CG': (-10.6, -27.2),
+    'GC': (-9.8, -24.4),
+    'GG': (-8.0, -19.9), 'CC': (-8.0, -19.9),
+}
+
+# Initiation at a terminal G·C or A·T pair, enthalpy and entropy as above
+TERMINAL = {'G': (0.1, -2.8), 'C': (0.1, -2.8), 'A': (2.3, 4.1), 'T': (2.3, 4.1)}
+
+# Gas constant in cal/(K mol)
+R = 1.987
+
+# Dinucleotide look up tables, indexed by 4 * code of the first base + code of the second
+STACK_ENTHALPY = np.zeros(16)
+STACK_ENTROPY = np.zeros(16)
+for dinucleotide, (enthalpy, entropy) in NEAREST_NEIGHBOURS.items():
+    stack = 4 * BASE_CODE[ord(dinucleotide[0])] + BASE_CODE[ord(dinucleotide[1])]
+    STACK_ENTHALPY[stack], STACK_ENTROPY[stack] = enthalpy, entropy
+
+TERMINAL_ENTHALPY = np.array([TERMINAL[chr(base)][0] for base in BASES])
+TERMINAL_ENTROPY = np.array([TERMINAL[chr(base)][1] for base in BASES])
+
+DOMAIN_COLUMNS = ('Staple', 'Domain', 'Helix', 'Start', 'End', 'Length', 'Binding',
+                  'DeltaH', 'DeltaS', 'DeltaG', 'Tm')
+STAPLE_COLUMNS = ('Staple', 'BindingDomains', 'AnchorTm', 'AnchorDeltaG', 'MinTm', 'TotalDeltaG',
+                  'WeakAnchor')
+
+
+def SodiumEquivalent(conditions):
+    """
+    Returns monovalent salt concentration equivalent to the sodium and
+    magnesium of conditions (von Ahsen et al. 2001), in mol/l.
+    """
+
+    # 120 * sqrt([Mg]) with both in mM
+    sodium = conditions.sodium + 120 * np.sqrt(conditions.magnesium * 1000) / 1000
+    if sodium <= 0 or conditions.concentration <= 0:
+        raise ValueError("salt and strand concentration must be positive")
+    return sodium
+
+
+def DomainEnergies(letters, bounds, conditions=Conditions()):
+    """
+    Returns nearest-neighbour enthalpy (kcal/mol), entropy (cal/(K mol)),
+    free energy at conditions.temperature (kcal/mol) and melting temperature
+    (°C) of every domain, each the duplex of the domain letters with their
+    complement. letters are ascii codes of all domains one after the other,
+    or one such row per candidate sequence; bounds gives the letters of
+    every domain. Domains shorter than 2 letters have no melting temperature
+    (nan).
+    """
+
+    letters = np.asarray(letters)
+    codes = BASE_CODE[letters]
+    if np.any(codes == 255):
+        raise ValueError("domains must consist of A, C, G and T")
+    codes = codes.astype(np.int64)
+
+    starts, ends = bounds[:-1], bounds[1:]
+    lengths = ends - starts
+    longEnough = lengths >= 2
+
+    numLetters = letters.shape[-1]
+    if numLetters == 0:
+        empty = np.full(letters.shape[:-1] + (len(lengths),), np.nan)
+        return empty, empty.copy(), empty.copy(), empty.copy()
+
+    # Stacks of neighbouring letters, not across the end of a domain
+    stacks = codes[..., :-1] * 4 + codes[..., 1:]
+    inDomain = np.ones(stacks.shape[-1], dtype=bool)
+    inDomain[starts[1:][(starts[1:] > 0) & (starts[1:] <= stacks.shape[-1])] - 1] = False
+
+    # Stacks from start to end - 2 of every domain, from cumulative sums over all stacks
+    first = np.minimum(starts, numLetters - 1)
+    last = np.clip(ends - 1, first, numLetters - 1)
+
+    energies = []
+    for table, terminal in ((STACK_ENTHALPY, TERMINAL_ENTHALPY), (STACK_ENTROPY, TERMINAL_ENTROPY)):
+        cumulative = np.zeros(letters.shape[:-1] + (numLetters,))
+        np.cumsum(np.where(inDomain, table[stacks], 0), axis=-1, out=cumulative[..., 1:])
+
+        # Plus initiation at both terminal pairs
+        energy = (cumulative[..., last] - cumulative[..., first] +
+                  terminal[codes[..., first]] + terminal[codes[..., last]])
+        energies.append(np.where(longEnough, energy, np.nan))
+
+    enthalpy, entropy = energies
+
+    # Salt correction of the entropy, per phosphate (SantaLucia 1998)
+    entropy = entropy + 0.368 * (lengths - 1) * np.log(SodiumEquivalent(conditions))
+
+    freeEnergy = enthalpy - (conditions.temperature + 273.15) * entropy / 1000
+    meltingTemperature = 1000 * enthalpy / (entropy + R * np.log(conditions.concentration / 4)) - 273.15
+
+    return enthalpy, entropy, freeEnergy, meltingTemperature
+
+
+def PairedSegments(result):
+    """
+    Splits every staple domain of a DesignResult where its bases change
+    between paired to a scaffold and unpaired. Returns staple, domain
+    number, helix, start and end index (in 5' to 3' order) and pairing of
+    every segment, and the letter bounds of the segments in the concatenated
+    domain sequences. Paired bases have the letters of their skip and loop,
+    unpaired bases the single 'A' filled in by the sequencer.
+    """
+
+    staples = result.stapleSequence
+    numStrands, lengthStrands = result.numStrands, result.lengthStrands
+    domains = [domain for staple in staples for domain in staple.domains]
+
+    strand, helix, _, _ = DomainArrays(staples)
+    start = np.array([domain.start for domain in domains], dtype=np.int64)
+    direction = np.array([domain.direction for domain in domains], dtype=np.int64)
+    numBases = np.array([abs(domain.end - domain.start) + 1 for domain in domains], dtype=np.int64)
+
+    # Every base of every domain, in 5' to 3' order
+    domainOfBase = np.repeat(np.arange(len(domains)), numBases)
+    firstBase = np.cumsum(numBases) - numBases
+    index = start[domainOfBase] + direction[domainOfBase] * (np.arange(len(domainOfBase)) - firstBase[domainOfBase])
+    baseHelix = helix[domainOfBase]
+
+    skip, loop = result.skip, result.loop
+    skip = skip if getattr(skip, 'ndim', 0) == 2 else CompactArray(skip, numStrands, lengthStrands, 0, "skip", [])
+    loop = loop if getattr(loop, 'ndim', 0) == 2 else CompactArray(loop, numStrands, lengthStrands, 0, "loop", [])
+    letters = LetterPrefixSums(skip, loop)
+
+    paired = ScaffoldCoverage(result.scaffoldSequence, numStrands, lengthStrands)[baseHelix, index]
+    counts = np.where(paired, letters[baseHelix, index + 1] - letters[baseHelix, index], 1)
+
+    # A segment starts with every domain and wherever pairing changes
+    newSegment = np.ones(len(domainOfBase), dtype=bool)
+    newSegment[1:] = (domainOfBase[1:] != domainOfBase[:-1]) | (paired[1:] != paired[:-1])
+    lastBase = np.ones(len(domainOfBase), dtype=bool)
+    lastBase[:-1] = newSegment[1:]
+    first, last = np.flatnonzero(newSegment), np.flatnonzero(lastBase)
+
+    bounds = np.zeros(len(first) + 1, dtype=np.int64)
+    if len(first) > 0:
+        np.cumsum(np.add.reduceat(counts, first), out=bounds[1:])
+
+    domainCounts = np.bincount(strand, minlength=len(staples))
+    domainNumber = np.arange(len(domains)) - np.repeat(np.cumsum(domainCounts) - domainCounts, domainCounts)
+    segmentDomain = domainOfBase[first]
+
+    return (strand[segmentDomain], domainNumber[segmentDomain], baseHelix[first], index[first], index[last],
+            paired[first], bounds)
+
+
+def ThermoReport(result, conditions=Conditions(), minAnchorTm=MIN_ANCHOR_TM):
+    """
+    Splits the staples of a DesignResult into their domains, crossovers
+    being domain boundaries, and the domains into segments paired and not
+    paired to a scaffold (see PairedSegments). Energies (see DomainEnergies)
+    are computed for the paired segments, the 'A' filled in at unpaired
+    bases doesn't bind. Returns dict of a domain and a staple table (dicts
+    of column arrays, see DOMAIN_COLUMNS and STAPLE_COLUMNS), one domain row
+    per segment. The anchor is the binding segment with the highest melting
+    temperature, staples whose anchor melts below minAnchorTm are flagged as
+    weak.
+    """
+
+    staples = result.stapleSequence
+    numStaples = len(staples)
+
+    strand, domainNumber, helix, start, end, paired, bounds = PairedSegments(result)
+    letters = np.frombuffer(''.join(domain.sequence for staple in staples for domain in staple.domains)
+                            .encode('ascii'), dtype=np.uint8)
+
+    lengths = np.diff(bounds)
+    binding = paired & (lengths >= 2)
+
+    enthalpy, entropy, freeEnergy, meltingTemperature = (
+        np.where(binding, values, np.nan) for values in DomainEnergies(letters, bounds, conditions))
+
+    domainTable = {
+        'Staple': strand, 'Domain': domainNumber,
+        'Helix': helix, 'Start': start, 'End': end,
+        'Length': lengths, 'Binding': binding.astype(np.int64),
+        'DeltaH': enthalpy, 'DeltaS': entropy, 'DeltaG': freeEnergy, 'Tm': meltingTemperature,
+    }
+
+    # Anchor of every staple, the last binding segment of the staple when sorted by Tm
+    segments = np.flatnonzero(binding)
+    segments = segments[np.lexsort((meltingTemperature[segments], strand[segments]))]
+    anchor = np.full(numStaples, -1, dtype=np.int64)
+    anchor[strand[segments]] = segments
+    none = anchor < 0
+
+    minTm = np.full(numStaples, np.inf)
+    np.minimum.at(minTm, strand[binding], meltingTemperature[binding])
+
+    # Domains with at least one binding segment
+    bindingDomains = np.zeros(numStaples, dtype=np.int64)
+    domainKeys = np.unique(np.stack([strand[binding], domainNumber[binding]], axis=1), axis=0)
+    np.add.at(bindingDomains, domainKeys[:, 0], 1)
+
+    # Staples without anchor index the nan appended to every column
+    anchorTm = np.append(meltingTemperature, np.nan)[anchor]
+
+    stapleTable = {
+        'Staple': np.arange(numStaples),
+        'BindingDomains': bindingDomains,
+        'AnchorTm': anchorTm,
+        'AnchorDeltaG': np.append(freeEnergy, np.nan)[anchor],
+        'MinTm': np.where(none, np.nan, minTm),
+        'TotalDeltaG': np.bincount(strand[binding], weights=freeEnergy[binding], minlength=numStaples),
+        'WeakAnchor': (none | ~(anchorTm >= minAnchorTm)).astype(np.int64),
+    }
+
+    return {'domains': domainTable, 'staples': stapleTable}
+
+
+def WeakAnchorWarnings(report, stapleSequence, minAnchorTm=MIN_ANCHOR_TM):
+    """
+    Returns a warning for every staple flagged as weak in a ThermoReport.
+    """
+
+    staples = report['staples']
+    warnings = []
+    for i in np.flatnonzero(staples['WeakAnchor']).tolist():
+        base = stapleSequence[i].startBase
+        location = " at " + str(base[0]) + "[" + str(base[1]) + "]"
+        if staples['BindingDomains'][i] == 0:
+            warnings.append("Warning: staple " + str(i) + location + " has no binding domain")
+        else:
+            warnings.append("Warning: staple " + str(i) + location + " has no domain melting above " +
+                            "{:g}".format(minAnchorTm) + " C (strongest " +
+                            "{:.1f}".format(staples['AnchorTm'][i]) + " C)")
+    return warnings
+
+
+def WriteThermoReport(report, outputDirectory, name):
+    """
+    Writes the domain and staple tables of a ThermoReport as
+    thermo_domains_<name>.csv and thermo_staples_<name>.csv into
+    outputDirectory. Returns the file names.
+    """
+
+    fileNames = []
+    for table, columns in (('domains', DOMAIN_COLUMNS), ('staples', STAPLE_COLUMNS)):
+        rows = []
+        for column in columns:
+            values = report[table][column]
+            if values.dtype.kind == 'f':
+                rows.append(["{:.3f}".format(value) for value in values.tolist()])
+            else:
+                rows.append(values.tolist())
+
+        fileName = os.path.join(outputDirectory, "thermo_" + table + "_" + name + ".csv")
+        with open(fileName, 'w') as file:
+            file.write(",".join(columns) + "\n")
+            file.writelines(",".join(map(str, row)) + "\n" for row in zip(*rows))
+        fileNames.append(fileName)
+
+    return fileNames
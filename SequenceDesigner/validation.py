@@ -0,0 +1,423 @@
+# Number of bases listed per kind of problem, the rest is counted
+MAX_REPORTED = 10
+
+# Strand data of a base that isn't part of a strand
+EMPTY_BASE = [-1, -1, -1, -1]
+
+
+def BaseText(cell, lengthStrands):
+    """
+    Returns flat index of a base as text, i.e. 1[6]
+    """
+
+    return str(cell // lengthStrands) + "[" + str(cell % lengthStrands) + "]"
+
+
+def Report(messages, cells, lengthStrands, text):
+    """
+    Appends text for the first MAX_REPORTED bases (flat indices) to messages,
+    {} is replaced by the base. The remaining bases are counted.
+    """
+
+    cells = cells.tolist() if hasattr(cells, 'tolist') else list(cells)
+    for cell in cells[:MAX_REPORTED]:
+        messages.append(text.format(BaseText(cell, lengthStrands)))
+    if len(cells) > MAX_REPORTED:
+        messages.append("... and " + str(len(cells) - MAX_REPORTED) + " more like the above")
+
+
+def CompactArray(data, numStrands, lengthStrands, width, name, errors):
+    """
+    Returns strand (width 4) or skip/loop (width 0) data of the list model as
+    compact array, helices given as a plain 0 (missing helices) are filled
+    with -1 or 0. Helices of a different length are reported and left empty.
+    """
+
+    import numpy as np
+
+    shape = (numStrands, lengthStrands, width) if width else (numStrands, lengthStrands)
+    array = np.full(shape, -1 if width else 0, dtype=np.int64)
+
+    for i in range(numStrands):
+        if np.isscalar(data[i]):
+            continue
+        row = np.asarray(data[i], dtype=np.int64)
+        if row.shape != shape[1:]:
+            errors.append("Error: " + name + " of helix " + str(i) + " has shape " + str(row.shape) +
+                          ", expected " + str(shape[1:]))
+            continue
+        array[i] = row
+
+    return array
+
+
+def ReportPointers(problems, name, lengthStrands, errors):
+    """
+    Reports the pointer problems found by the Pointers walk of a model,
+    given as bases (flat indices) by side ('previous' or 'next') and kind:
+    'invalid' (out of range), 'missing' (into an empty or missing helix) and
+    'disagree' (not pointing back).
+    """
+
+    for side in ("previous", "next"):
+        Report(errors, problems[side, 'invalid'], lengthStrands,
+               "Error: " + name + " at {} has " + side + " base out of range")
+        Report(errors, problems[side, 'missing'], lengthStrands,
+               "Error: " + name + " at {} has " + side + " base on an empty or missing helix")
+
+    for side in ("next", "previous"):
+        Report(errors, problems[side, 'disagree'], lengthStrands,
+               "Error: " + name + " at {} and its " + side + " base don't point to each other")
+
+
+def ReportSkipLoop(problems, lengthStrands, errors, warnings):
+    """
+    Reports the skip and loop problems found by the SkipLoop check of a
+    model. Invalid skips (not 0 or -1) on scaffold bases are errors, on
+    other bases warnings, as are negative loops and loops on skips.
+    """
+
+    Report(errors, problems['scaffoldSkip'], lengthStrands,
+           "Error: base {} has an invalid skip value, there is a skip and loop in the same index")
+    Report(warnings, problems['stapleSkip'], lengthStrands,
+           "Warning: staple base {} has an invalid skip value, it is ignored")
+    Report(warnings, problems['negativeLoop'], lengthStrands,
+           "Warning: base {} has a negative loop, it is ignored")
+    Report(warnings, problems['skipAndLoop'], lengthStrands,
+           "Warning: base {} has both a skip and a loop, the loop is ignored")
+
+
+def CheckModel(model, lengthStrands, scaffolds, staples, skip, loop, errors):
+    """
+    Checks the flattened strand, skip and loop data of a design with the
+    pointer walk of its model (ArrayModel or ListModel) and adds the
+    problems to errors. Returns errors and warnings.
+    """
+
+    warnings = []
+
+    scaffoldBases = model.Bases(scaffolds)
+    stapleBases = model.Bases(staples)
+
+    if not model.Any(scaffoldBases):
+        errors.append("No scaffolds found")
+    if not model.Any(stapleBases):
+        warnings.append("Warning: no staples found")
+
+    _, _, problems = model.Pointers(scaffolds, scaffoldBases)
+    ReportPointers(problems, "scaffold", lengthStrands, errors)
+    _, stapleReverse, problems = model.Pointers(staples, stapleBases)
+    ReportPointers(problems, "staple", lengthStrands, errors)
+
+    Report(errors, model.CycleBases(stapleReverse, stapleBases), lengthStrands,
+           "Error: staple at {} does not have a breakpoint")
+
+    ReportSkipLoop(model.SkipLoop(skip, loop, scaffoldBases, stapleBases), lengthStrands, errors, warnings)
+
+    return errors, warnings
+
+
+class ArrayModel:
+    """
+    Pointer walk of compact arrays, in O(cells) vectorized steps. Strands
+    are (numStrands * lengthStrands, 4) arrays, skip and loop flat arrays.
+    """
+
+    def __init__(self, numStrands, lengthStrands):
+        self.numStrands = numStrands
+        self.lengthStrands = lengthStrands
+
+    def Bases(self, strand):
+        return (strand != -1).any(axis=1)
+
+    def Any(self, bases):
+        return bool(bases.any())
+
+    def Pointers(self, strand, bases):
+        """
+        Returns next and previous base of every base as flat index, -1 for
+        empty and invalid pointers, and the problems found, see
+        ReportPointers.
+        """
+
+        import numpy as np
+
+        numStrands, lengthStrands = self.numStrands, self.lengthStrands
+        cells = np.arange(len(strand))
+        helixEmpty = ~bases.reshape(numStrands, lengthStrands).any(axis=1)
+
+        problems = {}
+        pointers = []
+        for side, helixColumn, indexColumn in (("previous", 0, 1), ("next", 2, 3)):
+            helix, index = strand[:, helixColumn], strand[:, indexColumn]
+            empty = (helix == -1) & (index == -1)
+            invalid = ~empty & ((helix < 0) | (helix >= numStrands) | (index < 0) | (index >= lengthStrands))
+            problems[side, 'invalid'] = np.flatnonzero(invalid)
+
+            pointer = np.where(empty | invalid, -1, helix * lengthStrands + index)
+
+            # Pointers into helices without any base, i.e. missing from the json file
+            missing = np.flatnonzero((pointer >= 0) & helixEmpty[np.maximum(pointer, 0) // lengthStrands])
+            problems[side, 'missing'] = missing
+            pointer[missing] = -1
+
+            pointers.append(pointer)
+
+        prev, next = pointers
+
+        # Next base must point back, and the other way around
+        for side, pointer, back in (("next", next, prev), ("previous", prev, next)):
+            problems[side, 'disagree'] = np.flatnonzero((pointer >= 0) & (back[np.maximum(pointer, 0)] != cells))
+
+        return next, prev, problems
+
+    def CycleBases(self, prev, bases):
+        """
+        Returns one base (the lowest flat index) of every strand without a
+        5' end, found by propagating the minimum index along the previous
+        base pointers by pointer jumping.
+        """
+
+        import numpy as np
+        from lattice import RankBases
+
+        root, _ = RankBases(prev, bases)
+        onCycle = bases & (root < 0)
+        if not onCycle.any():
+            return np.zeros(0, dtype=np.int64)
+
+        cells = np.arange(len(prev))
+        jump = np.where(onCycle & (prev >= 0), prev, cells)
+        label = np.where(onCycle, cells, len(prev))
+
+        for _ in range(max(int(len(prev)).bit_length(), 1) + 1):
+            label = np.minimum(label, label[jump])
+            jump = jump[jump]
+
+        return np.unique(label[onCycle])
+
+    def SkipLoop(self, skip, loop, scaffoldBases, stapleBases):
+        """
+        Returns the skip and loop problems, see ReportSkipLoop.
+        """
+
+        import numpy as np
+
+        strandBases = scaffoldBases | stapleBases
+        invalidSkip = (skip != 0) & (skip != -1)
+
+        return {
+            'scaffoldSkip': np.flatnonzero(invalidSkip & scaffoldBases),
+            'stapleSkip': np.flatnonzero(invalidSkip & strandBases & ~scaffoldBases),
+            'negativeLoop': np.flatnonzero((loop < 0) & strandBases),
+            'skipAndLoop': np.flatnonzero((skip == -1) & (loop > 0) & strandBases),
+        }
+
+
+class ListModel:
+    """
+    Pointer walk of the list model in pure Python, so small designs are
+    validated without importing NumPy. Strands, skip and loop are flat lists
+    of bases, see FlatList.
+    """
+
+    def __init__(self, numStrands, lengthStrands):
+        self.numStrands = numStrands
+        self.lengthStrands = lengthStrands
+
+    def Bases(self, strand):
+        return [cell != EMPTY_BASE for cell in strand]
+
+    def Any(self, bases):
+        return any(bases)
+
+    def Pointers(self, strand, bases):
+        """
+        Same as ArrayModel.Pointers, walking the bases one by one.
+        """
+
+        numStrands, lengthStrands = self.numStrands, self.lengthStrands
+        helixEmpty = [not any(bases[h * lengthStrands:(h + 1) * lengthStrands]) for h in range(numStrands)]
+        strandCells = [cell for cell, isBase in enumerate(bases) if isBase]
+
+        problems = {}
+        pointers = []
+        for side, helixColumn, indexColumn in (("previous", 0, 1), ("next", 2, 3)):
+            pointer = [-1] * len(strand)
+            invalid = []
+            missing = []
+            for cell in strandCells:
+                helix, index = strand[cell][helixColumn], strand[cell][indexColumn]
+                if helix == -1 and index == -1:
+                    continue
+                if helix < 0 or helix >= numStrands or index < 0 or index >= lengthStrands:
+                    invalid.append(cell)
+                elif helixEmpty[helix]:
+                    missing.append(cell)
+                else:
+                    pointer[cell] = helix * lengthStrands + index
+
+            problems[side, 'invalid'] = invalid
+            problems[side, 'missing'] = missing
+            pointers.append(pointer)
+
+        prev, next = pointers
+
+        for side, pointer, back in (("next", next, prev), ("previous", prev, next)):
+            problems[side, 'disagree'] = [cell for cell in strandCells
+                                          if pointer[cell] >= 0 and back[pointer[cell]] != cell]
+
+        return next, prev, problems
+
+    def CycleBases(self, prev, bases):
+        """
+        Same as ArrayModel.CycleBases: the lowest base of every strand
+        without a 5' end, found by walking the previous base pointers once.
+        """
+
+        # Whether every base reaches a 5' end, see lattice.RankBases
+        rooted = [None] * len(prev)
+        for start, isBase in enumerate(bases):
+            if not isBase or rooted[start] is not None:
+                continue
+            path = []
+            seen = set()
+            cell = start
+            while rooted[cell] is None and cell not in seen and prev[cell] >= 0:
+                seen.add(cell)
+                path.append(cell)
+                cell = prev[cell]
+            if rooted[cell] is not None:
+                result = rooted[cell]
+            elif cell in seen:
+                result = False
+            else:
+                result = bases[cell]
+                path.append(cell)
+            for cell in path:
+                rooted[cell] = result
+
+        onCycle = [isBase and not rooted[cell] for cell, isBase in enumerate(bases)]
+
+        # Lowest base on cycle reachable from every base on cycle
+        label = {}
+        for start in (cell for cell, isCycle in enumerate(onCycle) if isCycle):
+            if start in label:
+                continue
+            path = []
+            seen = set()
+            cell = start
+            while cell not in label and cell not in seen:
+                seen.add(cell)
+                path.append(cell)
+                if not onCycle[cell] or prev[cell] < 0:
+                    break
+                cell = prev[cell]
+
+            if cell in label:
+                lowest = label[cell]
+            elif cell == path[-1] and (not onCycle[cell] or prev[cell] < 0):
+                lowest = cell if onCycle[cell] else len(prev)
+                label[cell] = lowest
+                path.pop()
+            else:
+                cycle = path[path.index(cell):]
+                lowest = min(cycle)
+                for member in cycle:
+                    label[member] = lowest
+                del path[path.index(cell):]
+
+            for member in reversed(path):
+                lowest = min(member, lowest)
+                label[member] = lowest
+
+        return sorted({label[cell] for cell, isCycle in enumerate(onCycle) if isCycle})
+
+    def SkipLoop(self, skip, loop, scaffoldBases, stapleBases):
+        """
+        Same as ArrayModel.SkipLoop.
+        """
+
+        strandBases = [isScaffold or isStaple for isScaffold, isStaple in zip(scaffoldBases, stapleBases)]
+        invalidSkip = [value != 0 and value != -1 for value in skip]
+
+        return {
+            'scaffoldSkip': [cell for cell, invalid in enumerate(invalidSkip) if invalid and scaffoldBases[cell]],
+            'stapleSkip': [cell for cell, invalid in enumerate(invalidSkip)
+                           if invalid and strandBases[cell] and not scaffoldBases[cell]],
+            'negativeLoop': [cell for cell, value in enumerate(loop) if value < 0 and strandBases[cell]],
+            'skipAndLoop': [cell for cell, value in enumerate(loop)
+                            if skip[cell] == -1 and value > 0 and strandBases[cell]],
+        }
+
+
+def FlatList(data, numStrands, lengthStrands, width):
+    """
+    Returns strand (width 4) or skip/loop (width 0) data of the list model as
+    a flat list of bases, missing helices filled as in CompactArray. Returns
+    None if a helix isn't a list of lengthStrands bases of ints, those are
+    left to ValidateDesign.
+    """
+
+    empty = EMPTY_BASE if width else 0
+    flat = []
+
+    for i in range(numStrands):
+        row = data[i]
+        if isinstance(row, (int, float, str)):
+            flat.extend([empty] * lengthStrands)
+            continue
+        if not isinstance(row, list) or len(row) != lengthStrands:
+            return None
+        if width:
+            if any(type(cell) is not list or len(cell) != 4 for cell in row):
+                return None
+            if {type(value) for cell in row for value in cell} - {int}:
+                return None
+        elif {type(value) for value in row} - {int}:
+            return None
+        flat.extend(row)
+
+    return flat
+
+
+def ValidateDesign(numStrands, lengthStrands, scaffolds, staples, skip, loop):
+    """
+    Checks a parsed design (list or compact model) before sequencing, in
+    O(cells) vectorized steps: pointers in range and agreeing in both
+    directions, no pointers into empty or missing helices, no staples without
+    a breakpoint, legal skip and loop values and at least one scaffold.
+    Returns lists of all errors and warnings found. Scaffolds without a
+    breakpoint are left to FindStrands, which warns about them.
+    """
+
+    import numpy as np
+
+    errors = []
+
+    if isinstance(scaffolds, np.ndarray) and scaffolds.ndim == 3:
+        skip, loop = np.asarray(skip), np.asarray(loop)
+    else:
+        scaffolds = CompactArray(scaffolds, numStrands, lengthStrands, 4, "scaffold", errors)
+        staples = CompactArray(staples, numStrands, lengthStrands, 4, "staple", errors)
+        skip = CompactArray(skip, numStrands, lengthStrands, 0, "skip", errors)
+        loop = CompactArray(loop, numStrands, lengthStrands, 0, "loop", errors)
+
+    return CheckModel(ArrayModel(numStrands, lengthStrands), lengthStrands,
+                      scaffolds.reshape(-1, 4).astype(np.int64), staples.reshape(-1, 4).astype(np.int64),
+                      skip.reshape(-1), loop.reshape(-1), errors)
+
+
+def ValidateLists(numStrands, lengthStrands, scaffolds, staples, skip, loop):
+    """
+    Same checks as ValidateDesign for the list model, walked in pure Python
+    (see ListModel). Designs with helices that aren't lists of lengthStrands
+    bases are passed on to ValidateDesign.
+    """
+
+    flat = [FlatList(data, numStrands, lengthStrands, width)
+            for data, width in ((scaffolds, 4), (staples, 4), (skip, 0), (loop, 0))]
+    if any(data is None for data in flat):
+        return ValidateDesign(numStrands, lengthStrands, scaffolds, staples, skip, loop)
+
+    return CheckModel(ListModel(numStrands, lengthStrands), lengthStrands, *flat, [])